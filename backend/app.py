@@ -3,15 +3,32 @@ from flask_cors import CORS
 from config import Config
 from models import init_db
 
-def create_app():
+def create_app(init_database=True):
     app = Flask(__name__)
     app.config.from_object(Config)
     
+    # Datetimes in responses as UTC ISO strings ('Z' suffix)
+    from utils.json_provider import ApiJSONProvider
+    app.json = ApiJSONProvider(app)
+    
     # Initialize CORS
     CORS(app)
     
-    # Initialize database tables
-    init_db()
+    # Per-request SQL statistics (query count, DB time, N+1 and slow query logs)
+    from utils import query_stats
+    query_stats.init_app(app)
+    
+    # Request, database and cache metrics at /metrics (Prometheus text format)
+    from utils import metrics
+    metrics.init_app(app)
+    
+    # On-demand request profiling (off unless PROFILE_* is configured)
+    from utils import profiler
+    profiler.init_app(app)
+    
+    # Initialize database tables (serve.py does this once, before starting workers)
+    if init_database:
+        init_db()
     
     # Register blueprints
     from routes.auth import auth_bp
@@ -30,5 +47,6 @@ def create_app():
 
 if __name__ == '__main__':
     app = create_app()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Development server only; use serve.py in production
+    app.run(debug=Config.DEBUG, host='0.0.0.0', port=5000)
 
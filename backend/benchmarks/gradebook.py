@@ -0,0 +1,82 @@
+"""
+Gradebook engine benchmark: vectorized Gradebook vs. the nested-loop grade calculation
+Run from the backend directory: python -m benchmarks.gradebook [--students 10000] [--exams 10]
+"""
+
+import argparse
+import random
+import time
+from utils.gradebook import Gradebook
+
+def make_course(n_students, n_exams, attendance=0.9, seed=42):
+    """Synthetic course: students, exams whose weights sum to 100 and completed attempts"""
+    rng = random.Random(seed)
+    students = [{'id': i + 1} for i in range(n_students)]
+    base_weight = 100 // n_exams
+    exams = [{'id': j + 1, 'weight_percentage': base_weight} for j in range(n_exams)]
+    exams[-1]['weight_percentage'] += 100 - base_weight * n_exams
+    attempts = [
+        (student['id'], exam['id'], float(rng.choice(range(0, 101, 20))))
+        for student in students
+        for exam in exams
+        if rng.random() < attendance
+    ]
+    return students, exams, attempts
+
+def loop_grades(students, exams, attempts):
+    """Reference implementation: the dict/loop calculation the engine replaced"""
+    scores = {(student_id, exam_id): score for student_id, exam_id, score in attempts}
+    grades = {}
+    for student in students:
+        total_grade = 0
+        total_weight = 0
+        for exam in exams:
+            key = (student['id'], exam['id'])
+            if key in scores:
+                total_grade += (scores[key] * exam['weight_percentage']) / 100
+                total_weight += exam['weight_percentage']
+        if total_weight > 0:
+            grades[student['id']] = round(total_grade, 2)
+    return grades
+
+def best_of(func, repeat):
+    """Best wall time of several runs, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+def run(n_students, n_exams, repeat=5):
+    students, exams, attempts = make_course(n_students, n_exams)
+
+    loop_ms = best_of(lambda: loop_grades(students, exams, attempts), repeat)
+    build_ms = best_of(lambda: Gradebook(1, students, exams, attempts), repeat)
+    gradebook = Gradebook(1, students, exams, attempts)
+    ranks_ms = best_of(lambda: (gradebook.ranks, gradebook.projected_grades, gradebook.exam_averages()), repeat)
+
+    # Both implementations must agree before their timings mean anything
+    expected = loop_grades(students, exams, attempts)
+    for student_id, grade in expected.items():
+        assert abs(gradebook.grade_of(student_id) - grade) < 1e-9, student_id
+
+    return {
+        'students': n_students,
+        'exams': n_exams,
+        'attempts': len(attempts),
+        'loop_ms': round(loop_ms, 2),
+        'gradebook_build_ms': round(build_ms, 2),
+        'gradebook_ranks_projection_ms': round(ranks_ms, 2),
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--exams', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    result = run(args.students, args.exams, args.repeat)
+    for key, value in result.items():
+        print(f"{key:>32}: {value}")
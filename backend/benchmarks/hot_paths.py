@@ -0,0 +1,298 @@
+"""
+Hot path micro-benchmarks: exam availability checks, exam schedule index
+build and lookups, answer scoring, exam JSON serialization and course grade
+calculation on synthetic fixtures at several scales
+
+Run from the backend directory:
+    python -m benchmarks.hot_paths run [--scale 10 --scale 1000] [--output results.json]
+    python -m benchmarks.hot_paths baseline          # (re)write benchmarks/baselines/hot_paths.json
+    python -m benchmarks.hot_paths compare [CURRENT.json] [--baseline FILE] [--threshold 0.25]
+
+compare runs the suite (or reads CURRENT.json), prints the change against the
+baseline per benchmark and exits with status 1 if any benchmark got slower
+than the threshold allows. When it runs the suite itself, suspected
+regressions are measured a second time first and only count if they repeat. Timings below --min-ms (the tiny scales) are shown
+but not gated, and a slowdown only counts when it is also at least
+--min-delta-ms in absolute terms. Baselines are machine specific: regenerate
+them on the machine the comparison runs on before relying on small differences.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from utils.exam_helpers import is_exam_available, score_answers
+from utils.exam_schedule import ExamWindowIndex
+from utils.gradebook import build_gradebooks
+from utils.json_provider import ApiJSONProvider
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'hot_paths.json')
+
+# Attempts (and exams) per fixture, and courses for the grade calculation
+ATTEMPT_SCALES = (10, 1000, 100000)
+COURSE_SCALES = (10, 1000)
+
+# A timing sample repeats the benchmark until it has run at least this long,
+# so sub-millisecond benchmarks are not measured at timer resolution
+MIN_SAMPLE_MS = 20
+# Benchmarks whose single call takes longer get fewer rounds
+LONG_CALL_MS = 200
+
+# compare: baselines faster than MIN_GATED_MS are reported but never fail the
+# run, and a regression must also add at least MIN_DELTA_MS
+MIN_GATED_MS = 1.0
+MIN_DELTA_MS = 0.5
+
+STUDENTS_PER_COURSE = 30
+EXAMS_PER_COURSE = 4
+QUESTIONS_PER_ATTEMPT = 5
+
+def make_exams(n, seed=42):
+    """Exam rows as they come from the database (timezone-aware datetimes)"""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    rows = []
+    for i in range(n):
+        start = now + timedelta(minutes=rng.randint(-600, 600))
+        rows.append({
+            'id': i + 1,
+            'course_id': i % 50 + 1,
+            'exam_type': 'midterm',
+            'weight_percentage': 40,
+            'start_time': start,
+            'end_time': start + timedelta(minutes=rng.randint(10, 120)),
+            'duration_minutes': 10,
+            'created_at': now,
+            'course_name': 'Course',
+            'course_code': 'CRS101'
+        })
+    return rows
+
+def make_attempts(n, seed=42):
+    """Answer rows of n attempts and the correct answers of their questions"""
+    rng = random.Random(seed)
+    question_count = max(QUESTIONS_PER_ATTEMPT * 4, n // 10)
+    correct_answers = {question_id: rng.choice('ABCDE') for question_id in range(1, question_count + 1)}
+    attempts = [
+        [
+            {'question_id': question_id, 'selected_answer': rng.choice('ABCDEabcde')}
+            for question_id in rng.sample(range(1, question_count + 1), QUESTIONS_PER_ATTEMPT)
+        ]
+        for _ in range(n)
+    ]
+    return attempts, correct_answers
+
+def make_courses(n, seed=42):
+    """Table-wide enrollment, exam and attempt rows for n courses, shaped like load_all_gradebooks' queries"""
+    rng = random.Random(seed)
+    enrollments = []
+    exams = []
+    attempts = []
+    for course_id in range(1, n + 1):
+        course_exams = [
+            {'id': (course_id - 1) * EXAMS_PER_COURSE + j + 1, 'course_id': course_id, 'weight_percentage': 25}
+            for j in range(EXAMS_PER_COURSE)
+        ]
+        exams.extend(course_exams)
+        for k in range(STUDENTS_PER_COURSE):
+            student_id = rng.randint(1, max(n * 5, STUDENTS_PER_COURSE * 2))
+            enrollments.append({'student_id': student_id, 'course_id': course_id})
+            for exam in course_exams:
+                if rng.random() < 0.9:
+                    attempts.append({
+                        'student_id': student_id,
+                        'exam_id': exam['id'],
+                        'score': float(rng.choice(range(0, 101, 20))),
+                        'course_id': course_id
+                    })
+    # Students drawn twice for one course would violate UNIQUE(student_id, course_id)
+    enrollments = list({(e['course_id'], e['student_id']): e for e in enrollments}.values())
+    return enrollments, exams, attempts
+
+def schedule_lookup(index, now):
+    """Exams open now and exams opening within the next hour"""
+    return index.open_at(now) + index.opening_between(now, now + timedelta(hours=1))
+
+def course_grades(enrollments, exams, attempts):
+    """Every course's grades, ranks and exam averages, as the grade views need them"""
+    gradebooks = build_gradebooks(enrollments, exams, attempts)
+    for gradebook in gradebooks.values():
+        gradebook.ranks
+        gradebook.exam_averages()
+    return gradebooks
+
+def calibrate(func, min_sample_ms=MIN_SAMPLE_MS):
+    """(calls per timing sample of at least min_sample_ms, duration of one call in ms)"""
+    started = time.perf_counter()
+    func()
+    once_ms = (time.perf_counter() - started) * 1000
+    loops = max(1, int(min_sample_ms / once_ms) + 1) if once_ms < min_sample_ms else 1
+    return loops, once_ms
+
+def sample(func, loops):
+    """Wall time per call of one sample, in milliseconds"""
+    started = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return (time.perf_counter() - started) * 1000 / loops
+
+def benchmarks(attempt_scales, course_scales):
+    """(name, items, callable) for every benchmark at the requested scales"""
+    cases = []
+    json_provider = ApiJSONProvider(Flask(__name__))
+    for n in attempt_scales:
+        rows = make_exams(n)
+        attempts, correct_answers = make_attempts(n)
+        cases.append((f'is_exam_available[{n}]', n, lambda rows=rows: [is_exam_available(e) for e in rows]))
+        index = ExamWindowIndex(rows)
+        now = datetime.now(timezone.utc)
+        cases.append((f'exam_index_build[{n}]', n, lambda rows=rows: ExamWindowIndex(rows)))
+        cases.append((f'exam_index_lookup[{n}]', n, lambda index=index, now=now: schedule_lookup(index, now)))
+        cases.append((f'score_answers[{n}]', n,
+                      lambda attempts=attempts, correct=correct_answers: [score_answers(a, correct) for a in attempts]))
+        cases.append((f'exam_json[{n}]', n, lambda rows=rows: json_provider.dumps(rows)))
+    for n in course_scales:
+        enrollments, exams, attempts = make_courses(n)
+        cases.append((f'course_grades[{n}]', n,
+                      lambda enrollments=enrollments, exams=exams, attempts=attempts: course_grades(enrollments, exams, attempts)))
+    return cases
+
+def run(attempt_scales=ATTEMPT_SCALES, course_scales=COURSE_SCALES, repeat=9, only=None):
+    """Time the benchmarks (only the named ones if given) and return the results document"""
+    cases = []
+    rounds = {}
+    for name, items, func in benchmarks(attempt_scales, course_scales):
+        if only is None or name in only:
+            loops, once_ms = calibrate(func)
+            cases.append((name, items, func, loops))
+            # Fewer rounds for the slow benchmarks; the best of them is still stable
+            rounds[name] = repeat if once_ms < LONG_CALL_MS else max(3, repeat // 2)
+    best = {}
+    # Samples are taken round-robin over the whole suite, so a burst of load on
+    # the machine slows one sample of many benchmarks rather than every sample
+    # of one; like timeit, the garbage collector is paused while timing
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for round_number in range(repeat):
+            for name, items, func, loops in cases:
+                if round_number < rounds[name]:
+                    ms = sample(func, loops)
+                    best[name] = min(ms, best.get(name, ms))
+                    gc.collect()
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    results = {}
+    for name, items, _, _ in cases:
+        ms = best[name]
+        results[name] = {'items': items, 'ms': round(ms, 5), 'us_per_item': round(ms * 1000 / items, 5)}
+        print(f"{name:>30}: {ms:10.3f} ms  ({ms * 1000 / items:.3f} µs/item)")
+    return {
+        'python': platform.python_version(),
+        'machine': f'{platform.system()} {platform.machine()}',
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'results': results
+    }
+
+def regressed(base_ms, now_ms, threshold, min_ms=MIN_GATED_MS, min_delta_ms=MIN_DELTA_MS):
+    """A benchmark regresses when it is slower than the threshold allows and by at
+    least min_delta_ms; benchmarks whose baseline is under min_ms are not gated"""
+    change = now_ms / base_ms - 1 if base_ms else 0.0
+    return base_ms >= min_ms and change > threshold and now_ms - base_ms >= min_delta_ms
+
+def compare(baseline, current, threshold, min_ms=MIN_GATED_MS, min_delta_ms=MIN_DELTA_MS):
+    """Print the change of every benchmark present in both runs; return the names that regressed"""
+    regressions = []
+    print(f"\n{'benchmark':>30} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for name, base in baseline['results'].items():
+        now = current['results'].get(name)
+        if now is None:
+            continue
+        change = now['ms'] / base['ms'] - 1 if base['ms'] else 0.0
+        if regressed(base['ms'], now['ms'], threshold, min_ms, min_delta_ms):
+            regressions.append(name)
+            note = '  REGRESSION'
+        else:
+            note = '' if base['ms'] >= min_ms else '  (not gated)'
+        print(f"{name:>30} {base['ms']:>12.3f} {now['ms']:>12.3f} {change:>+7.1%}{note}")
+    return regressions
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the suite and print the timings')
+    run_parser.add_argument('--output', help='also write the results to this JSON file')
+    commands.add_parser('baseline', help='run the suite and store it as the baseline')
+    compare_parser = commands.add_parser('compare', help='compare against the baseline')
+    compare_parser.add_argument('current', nargs='?', help='results JSON to compare (default: run the suite now)')
+    compare_parser.add_argument('--baseline', default=BASELINE_PATH)
+    compare_parser.add_argument('--threshold', type=float, default=0.25,
+                                help='allowed slowdown as a fraction (default 0.25 = 25%%)')
+    compare_parser.add_argument('--min-ms', type=float, default=MIN_GATED_MS,
+                                help=f'do not gate benchmarks whose baseline is faster than this (default {MIN_GATED_MS})')
+    compare_parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA_MS,
+                                help=f'smallest absolute slowdown that counts as a regression (default {MIN_DELTA_MS})')
+    for sub in (run_parser, commands.choices['baseline'], compare_parser):
+        sub.add_argument('--scale', type=int, action='append',
+                         help='attempt scale to run (repeatable; default 10, 1000 and 100000)')
+        sub.add_argument('--course-scale', type=int, action='append',
+                         help='course scale to run (repeatable; default 10 and 1000)')
+        sub.add_argument('--repeat', type=int, default=9)
+    args = parser.parse_args(argv)
+
+    def run_suite(only=None):
+        return run(tuple(args.scale or ATTEMPT_SCALES), tuple(args.course_scale or COURSE_SCALES), args.repeat, only)
+
+    if args.command == 'run':
+        results = run_suite()
+        if args.output:
+            _write(args.output, results)
+        return 0
+
+    if args.command == 'baseline':
+        _write(BASELINE_PATH, run_suite())
+        print(f"\nBaseline written to {BASELINE_PATH}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_suite()
+        # A slowdown caused by load on the machine rarely repeats: time suspects again, keep the best
+        suspects = {
+            name for name, base in baseline['results'].items()
+            if name in current['results']
+            and regressed(base['ms'], current['results'][name]['ms'], args.threshold, args.min_ms, args.min_delta_ms)
+        }
+        if suspects:
+            print(f"\nMeasuring {len(suspects)} suspected regression(s) again")
+            for name, result in run_suite(suspects)['results'].items():
+                if result['ms'] < current['results'][name]['ms']:
+                    current['results'][name] = result
+    regressions = compare(baseline, current, args.threshold, args.min_ms, args.min_delta_ms)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than the {args.threshold:.0%} threshold")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,33 @@
+"""
+Sayaç kolonlarının (exams.question_count, courses.student_count, courses.exam_count)
+gerçek sayımlarla tutarlı olup olmadığını kontrol et
+Kullanım: python check_counters.py [--fix]
+"""
+
+import sys
+from models import find_counter_mismatches, recount_counters
+
+def check_counters(fix=False):
+    """Tutarsız sayaçları listele, --fix verilirse düzelt"""
+    mismatches = find_counter_mismatches()
+
+    if not mismatches:
+        print("Tüm sayaçlar tutarlı")
+        return 0
+
+    print(f"{len(mismatches)} tutarsız sayaç bulundu:\n")
+    for m in mismatches:
+        print(f"  {m['table']}.{m['column']} id={m['id']}: kayıtlı {m['stored']}, gerçek {m['actual']}")
+
+    if not fix:
+        print("\nDüzeltmek için: python check_counters.py --fix")
+        return 1
+
+    fixed = recount_counters()
+    print()
+    for counter, count in fixed.items():
+        print(f"  {counter}: {count} satır düzeltildi")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(check_counters(fix='--fix' in sys.argv[1:]))
@@ -10,6 +10,79 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-flask-secret-key')
     DEBUG = os.getenv('DEBUG', 'True') == 'True'
     
+    # Admin kullanıcı araması
+    SEARCH_MIN_QUERY_LENGTH = 2
+    SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '50'))
+    
+    # Bölüm başkanı istatistikleri önbellek süresi (saniye)
+    STATISTICS_CACHE_TTL = int(os.getenv('STATISTICS_CACHE_TTL', '60'))
+    
+    # Kapanmış sınavların madde analizi önbelleği (sınav sayısı)
+    ITEM_ANALYSIS_CACHE_SIZE = int(os.getenv('ITEM_ANALYSIS_CACHE_SIZE', '500'))
+    
+    # Kopya taraması: bir çiftin işaretlenmesi için gereken en az ortak yanlış cevap ve
+    # (çift sayısına göre düzeltilmiş) anlamlılık düzeyi
+    COLLUSION_MIN_IDENTICAL_WRONG = int(os.getenv('COLLUSION_MIN_IDENTICAL_WRONG', '3'))
+    COLLUSION_SIGNIFICANCE = float(os.getenv('COLLUSION_SIGNIFICANCE', '0.01'))
+    
+    # Toplu soru içe aktarmada tek seferde kabul edilen en fazla soru
+    QUESTION_IMPORT_MAX_ROWS = int(os.getenv('QUESTION_IMPORT_MAX_ROWS', '1000'))
+    
+    # Yakın kopya soru eşiği (MinHash ile tahmin edilen Jaccard benzerliği)
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.7'))
+    
+    # Soru seçimi için bellekte tutulan sınav etiket indeksi sayısı
+    QUESTION_POOL_CACHE_SIZE = int(os.getenv('QUESTION_POOL_CACHE_SIZE', '1000'))
+    # Diğer worker'larda yapılan soru değişikliklerinin en geç ne zaman görüleceği (saniye)
+    QUESTION_POOL_CACHE_TTL = int(os.getenv('QUESTION_POOL_CACHE_TTL', '60'))
+    
+    # Sınav takvimi (açık / yakında açılacak sınavlar): aralık indeksinin önbellek süresi (saniye),
+    # varsayılan ve en fazla ileriye bakış süresi (dakika)
+    EXAM_SCHEDULE_CACHE_TTL = int(os.getenv('EXAM_SCHEDULE_CACHE_TTL', '60'))
+    EXAM_SCHEDULE_HORIZON_MINUTES = int(os.getenv('EXAM_SCHEDULE_HORIZON_MINUTES', '60'))
+    EXAM_SCHEDULE_MAX_HORIZON_MINUTES = int(os.getenv('EXAM_SCHEDULE_MAX_HORIZON_MINUTES', str(7 * 24 * 60)))
+    
+    # Veri taşıma işleri (migrate_data.py): parça başına satır ve parçalar arası bekleme (saniye)
+    MIGRATION_CHUNK_SIZE = int(os.getenv('MIGRATION_CHUNK_SIZE', '1000'))
+    MIGRATION_PAUSE_SECONDS = float(os.getenv('MIGRATION_PAUSE_SECONDS', '0.1'))
+    
+    # Sorgu izleme: bu süreyi (ms) aşan sorgular loglanır; aynı sorgu bir istekte
+    # bu sayıdan fazla tekrarlanırsa istek N+1 olarak işaretlenir
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '10'))
+    # İstek başına sorgu istatistikleri X-DB-* başlıklarıyla da döner (debug modunda her zaman)
+    QUERY_STATS_HEADERS = os.getenv('QUERY_STATS_HEADERS', 'false').lower() == 'true'
+    
+    # /metrics: birden fazla worker süreci varsa her süreç ölçümlerini bu dizine yazar,
+    # /metrics hepsini toplar (boşsa yalnızca o sürecin ölçümleri)
+    METRICS_DIR = os.getenv('METRICS_DIR', '')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1.0'))
+    
+    # Profil çıkarma: seçili endpoint'lere gelen isteklerin bu oranı profillenir (0 = kapalı);
+    # PROFILE_ENDPOINTS boşsa tüm endpoint'ler (ör. department_head.get_statistics)
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_ENDPOINTS = [e.strip() for e in os.getenv('PROFILE_ENDPOINTS', '').split(',') if e.strip()]
+    # Açıksa admin kullanıcılar X-Profile başlığıyla tek bir isteği profilleyebilir
+    PROFILE_ADMIN_HEADER = os.getenv('PROFILE_ADMIN_HEADER', 'false').lower() == 'true'
+    # sampler (düşük maliyetli yığın örnekleyici) veya cprofile
+    PROFILE_METHOD = os.getenv('PROFILE_METHOD', 'sampler')
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    
+    # Üretim sunucusu (serve.py): worker süreç sayısı, worker başına thread sayısı,
+    # keep-alive ve zaman aşımı süreleri (saniye)
+    SERVER_BIND = os.getenv('SERVER_BIND', '0.0.0.0:5000')
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', str(min(2 * (os.cpu_count() or 1) + 1, 8))))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', '4'))
+    SERVER_KEEPALIVE = int(os.getenv('SERVER_KEEPALIVE', '5'))
+    SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', '60'))
+    # Kapanışta devam eden isteklerin (ör. sınav gönderimleri) bitmesi için beklenen süre
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '30'))
+    # Worker başına bağlantı havuzu boyutu; 0 ise thread sayısının iki katı
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '0'))
+    # Havuzdaki tüm bağlantılar kullanımdayken boşalan bağlantı için beklenen en uzun süre (saniye)
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    
     # Database configuration (psycopg2 kullanıyor, models.py'de tanımlı)
     # DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD environment variables'dan okunuyor
 
@@ -3,62 +3,19 @@ Mevcut sınavların zamanlarını düzelt
 Kullanıcılar 21:35 gibi zamanlar seçtiğinde bunlar UTC olarak saklanmış
 Ama aslında 21:35 Türkiye saati (UTC+3) = 18:35 UTC olmalıydı
 Bu script tüm sınavların zamanlarını 3 saat geri alır (UTC+3'ten UTC'ye çevirir)
-"""
-
-import psycopg2
-import psycopg2.extras
-from datetime import timedelta
-import os
 
-# PostgreSQL bağlantı ayarları
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': int(os.getenv('DB_PORT', '5432')),
-    'database': os.getenv('DB_NAME', 'exam_system'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', 'postgres')
-}
+Düzeltme migrate_data.py'deki fix_exam_times işi olarak parça parça çalışır ve
+kaldığı yerden devam eder. Tekrar kaydırmaya karşı koruma migration_checkpoints
+tablosundaki ilerleme kaydıdır: iş bir kez bu yolla tamamlandıktan sonra
+tekrar çalıştırmak zamanları değiştirmez. Eski tek seferlik betikle (veya
+eski fix_exam_times.sql ile) zaten düzeltilmiş bir veritabanında bu kayıt yoktur;
+orada çalıştırmak zamanları 3 saat daha geri alır, o veritabanında bu betiği
+çalıştırmayın.
+Kullanım: python fix_exam_times.py [--dry-run]
+"""
 
-def fix_exam_times():
-    """Tüm sınavların start_time ve end_time değerlerini 3 saat geri al"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    
-    try:
-        # Tüm sınavları al
-        cur.execute('SELECT id, start_time, end_time FROM exams')
-        exams = cur.fetchall()
-        
-        print(f"Toplam {len(exams)} sınav bulundu\n")
-        
-        for exam in exams:
-            exam_id = exam['id']
-            start_time = exam['start_time']
-            end_time = exam['end_time']
-            
-            # 3 saat geri al
-            new_start_time = start_time - timedelta(hours=3)
-            new_end_time = end_time - timedelta(hours=3)
-            
-            print(f"Sınav ID {exam_id}:")
-            print(f"  Eski başlangıç: {start_time}")
-            print(f"  Yeni başlangıç: {new_start_time}")
-            print(f"  Eski bitiş: {end_time}")
-            print(f"  Yeni bitiş: {new_end_time}\n")
-            
-            # Güncelle
-            cur.execute('''
-                UPDATE exams 
-                SET start_time = %s, end_time = %s 
-                WHERE id = %s
-            ''', (new_start_time, new_end_time, exam_id))
-        
-        conn.commit()
-        print("Tüm sınavlar güncellendi!")
-    finally:
-        cur.close()
-        conn.close()
+import sys
+from migrate_data import main
 
 if __name__ == '__main__':
-    fix_exam_times()
-
+    sys.exit(main(['run', 'fix_exam_times'] + sys.argv[1:]))
@@ -0,0 +1,326 @@
+"""
+Kapasite planlaması için sentetik üniversite verisi: bölümler, bölüm başkanları,
+eğitmenler, öğrenciler, dersler, sınavlar, etiketli soru havuzları, kayıtlar ve
+tamamlanmış denemeler (cevaplarıyla)
+Kullanım: python generate_data.py [--students N] [--departments N] [--courses-per-student N]
+                                  [--students-per-course N] [--questions-per-exam N]
+                                  [--attendance ORAN] [--upcoming ORAN] [--seed N] [--prefix P]
+Örnek: python generate_data.py --students 100000   (yaklaşık 900 bin deneme, 4,6 milyon cevap)
+
+- Veriler COPY ile toplu yüklenir; şifreler rol başına bir kez hash'lenir
+  (öğrenci: student123, eğitmen: inst123, bölüm başkanı: dept123).
+- Aynı --seed ve --prefix aynı veriyi üretir. Kullanıcı adları, öğrenci
+  numaraları ve ders kodları önek taşır, mevcut verilerle çakışmaz.
+- Puanlar Rasch modeliyle üretilir: öğrencinin yeteneği ile sorunun zorluğu
+  doğru cevap olasılığını belirler; yanlış cevaplar çeldiricilere eşit
+  dağılmaz.
+- Her şey tek transaction'da yüklenir; hata olursa hiçbir şey kalmaz.
+"""
+
+import argparse
+import io
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from werkzeug.security import generate_password_hash
+from models import init_db, get_db_cursor
+
+DEPARTMENTS = [
+    ('Bilgisayar Mühendisliği', 'BIL'), ('Elektrik-Elektronik Mühendisliği', 'EEM'),
+    ('Makine Mühendisliği', 'MAK'), ('İnşaat Mühendisliği', 'INS'), ('Endüstri Mühendisliği', 'END'),
+    ('Matematik', 'MAT'), ('Fizik', 'FIZ'), ('Kimya', 'KIM'), ('Moleküler Biyoloji', 'MBG'),
+    ('İktisat', 'IKT'), ('İşletme', 'ISL'), ('Psikoloji', 'PSI'), ('Tarih', 'TAR'),
+    ('Mimarlık', 'MIM'), ('Hukuk', 'HUK'), ('Tıp', 'TIP')
+]
+
+FIRST_NAMES = [
+    'Ali', 'Ayşe', 'Mehmet', 'Fatma', 'Mustafa', 'Zeynep', 'Ahmet', 'Elif', 'Emre', 'Merve',
+    'Burak', 'Selin', 'Can', 'Deniz', 'Berk', 'Ece', 'Kerem', 'İrem', 'Oğuz', 'Şule',
+    'Cem', 'Gizem', 'Hakan', 'Büşra', 'Mert', 'Özge', 'Tolga', 'Çağla', 'Yusuf', 'Sena'
+]
+LAST_NAMES = [
+    'Yılmaz', 'Kaya', 'Demir', 'Şahin', 'Çelik', 'Yıldız', 'Yıldırım', 'Öztürk', 'Aydın', 'Özdemir',
+    'Arslan', 'Doğan', 'Kılıç', 'Aslan', 'Çetin', 'Kara', 'Koç', 'Kurt', 'Özkan', 'Şimşek',
+    'Polat', 'Korkmaz', 'Acar', 'Güneş', 'Aksoy', 'Erdoğan', 'Türk', 'Bulut', 'Tekin', 'Uçar'
+]
+
+# Ders başına sınavlar: (tür, ağırlık); ağırlıkların toplamı 100
+EXAM_PLAN = [('vize', 40), ('final', 60)]
+ANSWERS_PER_ATTEMPT = 5
+TOPICS_PER_COURSE = 5
+DIFFICULTIES = ['easy', 'medium', 'hard']
+DIFFICULTY_SHARE = [0.3, 0.5, 0.2]
+# Rasch modelinde zorluk parametreleri
+DIFFICULTY_LEVEL = np.array([-1.0, 0.0, 1.2])
+# Yanlış cevapta çeldiricilerin seçilme olasılıkları (doğru şıktan sonraki sırayla)
+DISTRACTOR_WEIGHTS = [0.4, 0.3, 0.2, 0.1]
+
+# Bu kadar satır bir COPY ile yüklenir
+CHUNK_ROWS = 200000
+
+def copy_rows(cur, table, columns, lines):
+    """Satırları (COPY text formatında) CHUNK_ROWS'luk parçalar halinde yükle, satır sayısını döndür"""
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    total = 0
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_ROWS:
+            cur.copy_expert(sql, io.StringIO('\n'.join(chunk) + '\n'))
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        cur.copy_expert(sql, io.StringIO('\n'.join(chunk) + '\n'))
+        total += len(chunk)
+    return total
+
+def next_ids(cur, tables):
+    """Tabloların bir sonraki boş ID'si (ID'ler istemci tarafında atanır)"""
+    ids = {}
+    for table in tables:
+        cur.execute(f'SELECT COALESCE(MAX(id), 0) + 1 AS next_id FROM {table}')
+        ids[table] = cur.fetchone()['next_id']
+    return ids
+
+def random_names(rng, n):
+    first = rng.integers(0, len(FIRST_NAMES), n)
+    last = rng.integers(0, len(LAST_NAMES), n)
+    return [f'{FIRST_NAMES[f]} {LAST_NAMES[l]}' for f, l in zip(first, last)]
+
+def generate(students, departments, courses_per_student, students_per_course, questions_per_exam,
+             attendance, upcoming, seed, prefix):
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    tag = prefix.upper()
+
+    department_list = []
+    for d in range(departments):
+        name, code = DEPARTMENTS[d % len(DEPARTMENTS)]
+        cycle = d // len(DEPARTMENTS)
+        department_list.append((f'{name} {cycle + 1}', f'{code}{cycle + 1}') if cycle else (name, code))
+    course_count = max(departments, students * courses_per_student // students_per_course)
+    # Eğitmen başına ortalama 3 ders
+    instructor_count = max(departments, course_count // 3)
+
+    student_department = rng.integers(0, departments, students)
+    course_department = np.arange(course_count) % departments
+    instructor_department = np.arange(instructor_count) % departments
+    instructors_of = [np.flatnonzero(instructor_department == d) for d in range(departments)]
+    courses_of = [np.flatnonzero(course_department == d) for d in range(departments)]
+
+    print(f"{students} öğrenci, {instructor_count} eğitmen, {course_count} ders, "
+          f"{course_count * len(EXAM_PLAN)} sınav oluşturuluyor...")
+
+    hashes = {role: generate_password_hash(password) for role, password in
+              (('student', 'student123'), ('instructor', 'inst123'), ('department_head', 'dept123'))}
+
+    with get_db_cursor() as (conn, cur):
+        tables = ['users', 'students', 'instructors', 'department_heads', 'courses', 'exams',
+                  'questions', 'enrollments', 'exam_attempts']
+        # Yükleme sırasında başka yazma olmasın: ID aralıkları istemci tarafında ayrılıyor
+        cur.execute(f"LOCK TABLE {', '.join(tables)} IN SHARE ROW EXCLUSIVE MODE")
+        ids = next_ids(cur, tables)
+        counts = {}
+
+        def timed(label, table, columns, lines):
+            step = time.perf_counter()
+            counts[label] = copy_rows(cur, table, columns, lines)
+            print(f"  {label:<16} {counts[label]:>10} satır  {time.perf_counter() - step:6.1f} s")
+
+        # Kullanıcılar: bölüm başkanları, eğitmenler, öğrenciler (bu sırayla ardışık ID'ler)
+        head_user = ids['users']
+        instructor_user = head_user + departments
+        student_user = instructor_user + instructor_count
+        head_names = random_names(rng, departments)
+        instructor_names = random_names(rng, instructor_count)
+        student_names = random_names(rng, students)
+
+        def user_lines():
+            for d in range(departments):
+                yield f"{head_user + d}\t{prefix}dh{d:03d}\t{hashes['department_head']}\tdepartment_head\tProf. Dr. {head_names[d]}"
+            for i in range(instructor_count):
+                yield f"{instructor_user + i}\t{prefix}inst{i:05d}\t{hashes['instructor']}\tinstructor\tDr. {instructor_names[i]}"
+            for i in range(students):
+                yield f"{student_user + i}\t{prefix}s{i:07d}\t{hashes['student']}\tstudent\t{student_names[i]}"
+        timed('users', 'users', ['id', 'username', 'password_hash', 'role', 'full_name'], user_lines())
+
+        timed('department_heads', 'department_heads', ['id', 'user_id', 'department'], (
+            f"{ids['department_heads'] + d}\t{head_user + d}\t{department_list[d][0]}" for d in range(departments)
+        ))
+        timed('instructors', 'instructors', ['id', 'user_id', 'department'], (
+            f"{ids['instructors'] + i}\t{instructor_user + i}\t{department_list[instructor_department[i]][0]}"
+            for i in range(instructor_count)
+        ))
+        timed('students', 'students', ['id', 'user_id', 'student_number'], (
+            f"{ids['students'] + i}\t{student_user + i}\t{tag}{i:07d}" for i in range(students)
+        ))
+
+        # Dersler: her ders kendi bölümünden bir eğitmene
+        course_instructor = np.array([
+            rng.choice(instructors_of[course_department[k]]) for k in range(course_count)
+        ])
+        timed('courses', 'courses', ['id', 'code', 'name', 'instructor_id'], (
+            f"{ids['courses'] + k}\t{tag}-{department_list[course_department[k]][1]}{k:05d}\t"
+            f"{department_list[course_department[k]][0]} {k // departments + 1}\t"
+            f"{ids['instructors'] + course_instructor[k]}"
+            for k in range(course_count)
+        ))
+
+        # Sınavlar: dönem 15 hafta önce başladı; vize 6-9. hafta, final 14-16. hafta.
+        # Finallerin 'upcoming' kadarı henüz yapılmadı (ileri tarihli, denemesiz)
+        semester_start = now - timedelta(weeks=15)
+        exam_count = course_count * len(EXAM_PLAN)
+        exam_start = []
+        for k in range(course_count):
+            midterm = semester_start + timedelta(days=int(rng.integers(35, 63)), hours=int(rng.integers(9, 17)))
+            final = semester_start + timedelta(days=int(rng.integers(91, 105)), hours=int(rng.integers(9, 17)))
+            if rng.random() < upcoming:
+                final = now + timedelta(days=int(rng.integers(1, 14)), hours=int(rng.integers(9, 17)))
+            elif final > now:
+                final = now - timedelta(days=int(rng.integers(1, 7)))
+            exam_start.extend([midterm, final])
+        exam_window = timedelta(hours=2)
+        exam_duration = np.array([30 if exam_type == 'vize' else 45 for exam_type, _ in EXAM_PLAN] * course_count)
+        exam_is_past = np.array([start + exam_window < now for start in exam_start])
+
+        timed('exams', 'exams', ['id', 'course_id', 'exam_type', 'weight_percentage', 'start_time', 'end_time',
+                                 'duration_minutes'], (
+            f"{ids['exams'] + e}\t{ids['courses'] + e // len(EXAM_PLAN)}\t{EXAM_PLAN[e % len(EXAM_PLAN)][0]}\t"
+            f"{EXAM_PLAN[e % len(EXAM_PLAN)][1]}\t{exam_start[e].isoformat()}\t"
+            f"{(exam_start[e] + exam_window).isoformat()}\t{exam_duration[e]}"
+            for e in range(exam_count)
+        ))
+
+        # Soru havuzları: sınav e'nin soruları first_question + e * questions_per_exam'dan başlar
+        question_total = exam_count * questions_per_exam
+        question_difficulty = rng.choice(len(DIFFICULTIES), question_total, p=DIFFICULTY_SHARE)
+        question_correct = rng.integers(0, 5, question_total)
+        question_topic = rng.integers(1, TOPICS_PER_COURSE + 1, question_total)
+
+        def question_lines():
+            for q in range(question_total):
+                e, n = divmod(q, questions_per_exam)
+                yield (f"{ids['questions'] + q}\t{ids['exams'] + e}\t"
+                       f"Sınav {ids['exams'] + e}, soru {n + 1}: konu {question_topic[q]} ile ilgili hangisi doğrudur?\t"
+                       f"Seçenek A\tSeçenek B\tSeçenek C\tSeçenek D\tSeçenek E\t{'ABCDE'[question_correct[q]]}\t"
+                       f"Konu {question_topic[q]}\t{DIFFICULTIES[question_difficulty[q]]}")
+        timed('questions', 'questions', ['id', 'exam_id', 'question_text', 'option_a', 'option_b', 'option_c',
+                                         'option_d', 'option_e', 'correct_answer', 'topic', 'difficulty'],
+              question_lines())
+
+        # Kayıtlar: öğrenci başına courses_per_student ders, %80'i kendi bölümünden
+        enrollment_student = []
+        enrollment_course = []
+        for i in range(students):
+            own = courses_of[student_department[i]]
+            own_count = min(len(own), rng.binomial(courses_per_student, 0.8))
+            chosen = set(rng.choice(own, own_count, replace=False).tolist())
+            while len(chosen) < min(courses_per_student, course_count):
+                chosen.add(int(rng.integers(0, course_count)))
+            enrollment_student.extend([i] * len(chosen))
+            enrollment_course.extend(sorted(chosen))
+        enrollment_student = np.array(enrollment_student)
+        enrollment_course = np.array(enrollment_course)
+        timed('enrollments', 'enrollments', ['id', 'student_id', 'course_id'], (
+            f"{ids['enrollments'] + n}\t{ids['students'] + s}\t{ids['courses'] + c}"
+            for n, (s, c) in enumerate(zip(enrollment_student.tolist(), enrollment_course.tolist()))
+        ))
+
+        # Denemeler: geçmiş her sınava kayıtlı öğrencilerin 'attendance' kadarı girdi
+        attempt_student = np.repeat(enrollment_student, len(EXAM_PLAN))
+        attempt_exam = (np.repeat(enrollment_course, len(EXAM_PLAN)) * len(EXAM_PLAN)
+                        + np.tile(np.arange(len(EXAM_PLAN)), len(enrollment_course)))
+        took = exam_is_past[attempt_exam] & (rng.random(len(attempt_exam)) < attendance)
+        attempt_student = attempt_student[took]
+        attempt_exam = attempt_exam[took]
+        attempt_count = len(attempt_exam)
+
+        # Her deneme sınav havuzundan 5 farklı soru alır; doğruluk Rasch modeliyle:
+        # P(doğru) = 1 / (1 + exp(-(yetenek - zorluk)))
+        ability = rng.normal(0.8, 1.0, students)
+        attempt_question = np.empty((attempt_count, ANSWERS_PER_ATTEMPT), dtype=np.int64)
+        attempt_selected = np.empty((attempt_count, ANSWERS_PER_ATTEMPT), dtype=np.int64)
+        for start in range(0, attempt_count, CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, attempt_count)
+            picks = np.argsort(rng.random((end - start, questions_per_exam)), axis=1)[:, :ANSWERS_PER_ATTEMPT]
+            questions = attempt_exam[start:end, None] * questions_per_exam + picks
+            logit = ability[attempt_student[start:end], None] - DIFFICULTY_LEVEL[question_difficulty[questions]]
+            correct = rng.random(questions.shape) < 1 / (1 + np.exp(-logit))
+            distractor = 1 + rng.choice(len(DISTRACTOR_WEIGHTS), questions.shape, p=DISTRACTOR_WEIGHTS)
+            attempt_question[start:end] = questions
+            attempt_selected[start:end] = np.where(correct, question_correct[questions],
+                                                   (question_correct[questions] + distractor) % 5)
+        attempt_score = np.round(
+            (attempt_selected == question_correct[attempt_question]).sum(axis=1) * 100 / ANSWERS_PER_ATTEMPT, 2
+        )
+        # Sınav penceresi içinde bir başlangıç, süre içinde bir bitiş (dakika)
+        attempt_offset = rng.uniform(0, 120 - exam_duration[attempt_exam])
+        attempt_length = rng.uniform(0.3, 1.0, attempt_count) * exam_duration[attempt_exam]
+        exam_seconds = np.array([(start - now).total_seconds() for start in exam_start])
+
+        def attempt_lines():
+            # Zamanlar 'now'a göre saniye olarak hesaplanır (UTC, +00:00 son ekiyle)
+            starts = exam_seconds[attempt_exam] + attempt_offset * 60
+            ends = starts + attempt_length * 60
+            for a, (s, e, t0, t1, score) in enumerate(zip(attempt_student.tolist(), attempt_exam.tolist(),
+                                                          starts.tolist(), ends.tolist(), attempt_score.tolist())):
+                yield (f"{ids['exam_attempts'] + a}\t{ids['students'] + s}\t{ids['exams'] + e}\t"
+                       f"{(now + timedelta(seconds=t0)).isoformat()}\t{(now + timedelta(seconds=t1)).isoformat()}\t"
+                       f"{score}\tt")
+        timed('exam_attempts', 'exam_attempts',
+              ['id', 'student_id', 'exam_id', 'start_time', 'end_time', 'score', 'is_completed'], attempt_lines())
+
+        def answer_lines():
+            letters = np.array(list('ABCDE'))
+            for start in range(0, attempt_count, CHUNK_ROWS):
+                end = min(start + CHUNK_ROWS, attempt_count)
+                attempt_ids = np.repeat(np.arange(start, end) + ids['exam_attempts'], ANSWERS_PER_ATTEMPT)
+                question_ids = attempt_question[start:end].ravel() + ids['questions']
+                selected = letters[attempt_selected[start:end].ravel()]
+                yield from map('{}\t{}\t{}'.format, attempt_ids.tolist(), question_ids.tolist(), selected.tolist())
+        timed('answers', 'answers', ['attempt_id', 'question_id', 'selected_answer'], answer_lines())
+
+        # Seriler istemcinin atadığı ID'lerin ardından devam etsin
+        for table in tables:
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))")
+        conn.commit()
+
+    with get_db_cursor() as (conn, cur):
+        step = time.perf_counter()
+        for table in tables + ['answers']:
+            cur.execute(f'ANALYZE {table}')
+        conn.commit()
+        print(f"  ANALYZE {time.perf_counter() - step:.1f} s")
+
+    mean_score = float(attempt_score.mean()) if attempt_count else 0.0
+    print(f"\nToplam {time.perf_counter() - started:.1f} s; ortalama puan {mean_score:.1f}")
+    print(f"Giriş: {prefix}s0000000 / student123, {prefix}inst00000 / inst123, {prefix}dh000 / dept123")
+    return counts
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--departments', type=int, default=12)
+    parser.add_argument('--courses-per-student', type=int, default=5)
+    parser.add_argument('--students-per-course', type=int, default=50)
+    parser.add_argument('--questions-per-exam', type=int, default=20)
+    parser.add_argument('--attendance', type=float, default=0.92)
+    parser.add_argument('--upcoming', type=float, default=0.1, help='ileri tarihli final oranı')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--prefix', default='gen', help='kullanıcı adı / öğrenci no / ders kodu öneki (en fazla 6 karakter)')
+    args = parser.parse_args(argv)
+
+    if not args.prefix.isalnum() or len(args.prefix) > 6:
+        parser.error('--prefix en fazla 6 harf/rakam olmalıdır')
+    if args.questions_per_exam < ANSWERS_PER_ATTEMPT:
+        parser.error(f'--questions-per-exam en az {ANSWERS_PER_ATTEMPT} olmalıdır')
+
+    init_db()
+    generate(args.students, args.departments, args.courses_per_student, args.students_per_course,
+             args.questions_per_exam, args.attendance, args.upcoming, args.seed, args.prefix)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
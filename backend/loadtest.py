@@ -0,0 +1,352 @@
+"""
+Sınav günü yük testi: geçici bir öğrenci grubu ve açık bir sınav oluşturur,
+herkesi giriş yaptırır ve aynı anda /start -> cevaplama -> /submit akışını
+gerçek uygulamaya karşı eş zamanlı worker'larla çalıştırır
+Kullanım: python loadtest.py (--embedded | --allow-db-writes) [--students N] [--concurrency N]
+                             [--ramp SANİYE] [--think SANİYE] [--url URL] [--keep]
+                             [--json DOSYA] [--max-error-rate ORAN]
+
+- --url verilmezse istekler süreç içinde Flask test istemcisiyle çalışır;
+  verilirse (ör. http://127.0.0.1:5000) çalışan sunucuya HTTP ile gider.
+  Sunucu aynı veritabanını kullanmalıdır (DB_* değişkenleri).
+- --embedded: pgserver paketiyle geçici bir yerel PostgreSQL başlatılır
+  (pip install pgserver); dış servis gerekmez.
+- --allow-db-writes: test grubu DB_* ile gösterilen veritabanına yazılır;
+  yanlışlıkla gerçek veritabanına yük bindirilmesin diye açıkça istenmelidir.
+- Test verisi sonunda silinir (--keep ile saklanır).
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import numpy as np
+
+PASSWORD = 'loadtest123'
+QUESTION_COUNT = 10
+
+def start_embedded_postgres():
+    """pgserver ile geçici bir PostgreSQL başlat ve DB_* değişkenlerini ona yönlendir"""
+    try:
+        import pgserver
+    except ImportError:
+        print("--embedded için pgserver paketi gerekli: pip install pgserver")
+        sys.exit(2)
+    from psycopg2.extensions import parse_dsn
+
+    server = pgserver.get_server(tempfile.mkdtemp(prefix='exam-loadtest-'), cleanup_mode='delete')
+    dsn = parse_dsn(server.get_uri())
+    os.environ['DB_HOST'] = dsn['host']
+    os.environ['DB_USER'] = dsn['user']
+    os.environ['DB_PASSWORD'] = dsn.get('password', '')
+    os.environ['DB_NAME'] = 'exam_loadtest'
+    return server
+
+def seed_cohort(student_count):
+    """Eğitmen, ders, şu anda açık bir sınav, soruları ve kayıtlı öğrencileri oluştur"""
+    from psycopg2.extras import execute_values
+    from werkzeug.security import generate_password_hash
+    from models import get_db_cursor, Question
+
+    run = uuid.uuid4().hex[:6]
+    prefix = f'lt_{run}_'
+    # Tüm öğrenciler aynı şifreyi kullanır; hash bir kez hesaplanır
+    password_hash = generate_password_hash(PASSWORD)
+
+    with get_db_cursor() as (conn, cur):
+        cur.execute('''
+            INSERT INTO users (username, password_hash, role, full_name)
+            VALUES (%s, %s, 'instructor', 'Yük Testi Eğitmeni') RETURNING id
+        ''', (prefix + 'instructor', password_hash))
+        cur.execute('''
+            INSERT INTO instructors (user_id, department) VALUES (%s, 'Load Test') RETURNING id
+        ''', (cur.fetchone()['id'],))
+        cur.execute('''
+            INSERT INTO courses (code, name, instructor_id) VALUES (%s, 'Yük Testi', %s) RETURNING id
+        ''', (f'LT{run}'.upper(), cur.fetchone()['id']))
+        course_id = cur.fetchone()['id']
+        cur.execute('''
+            INSERT INTO exams (course_id, exam_type, weight_percentage, start_time, end_time, duration_minutes)
+            VALUES (%s, 'midterm', 40, NOW() - INTERVAL '1 minute', NOW() + INTERVAL '1 hour', 10)
+            RETURNING id
+        ''', (course_id,))
+        exam_id = cur.fetchone()['id']
+
+        usernames = [f'{prefix}s{i:05d}' for i in range(student_count)]
+        user_rows = execute_values(cur, '''
+            INSERT INTO users (username, password_hash, role, full_name) VALUES %s RETURNING id
+        ''', [(username, password_hash, 'student', f'Öğrenci {i}') for i, username in enumerate(usernames)],
+            fetch=True)
+        student_rows = execute_values(cur, '''
+            INSERT INTO students (user_id, student_number) VALUES %s RETURNING id
+        ''', [(row['id'], f'LT{run}{i:05d}'.upper()) for i, row in enumerate(user_rows)], fetch=True)
+        execute_values(cur, 'INSERT INTO enrollments (student_id, course_id) VALUES %s',
+                       [(row['id'], course_id) for row in student_rows])
+        conn.commit()
+
+    Question.bulk_create(exam_id, [
+        {
+            'question_text': f'Yük testi sorusu {i + 1}: {run}',
+            'option_a': 'A şıkkı', 'option_b': 'B şıkkı', 'option_c': 'C şıkkı',
+            'option_d': 'D şıkkı', 'option_e': 'E şıkkı',
+            'correct_answer': random.choice('ABCDE')
+        }
+        for i in range(QUESTION_COUNT)
+    ])
+    return {'prefix': prefix, 'exam_id': exam_id, 'usernames': usernames}
+
+def cleanup_cohort(prefix):
+    """Yük testi kullanıcılarını sil; ders, sınav, deneme ve cevaplar cascade ile silinir"""
+    from models import get_db_cursor, escape_like
+
+    with get_db_cursor() as (conn, cur):
+        cur.execute('DELETE FROM users WHERE username LIKE %s', (escape_like(prefix) + '%',))
+        conn.commit()
+        return cur.rowcount
+
+class InProcessClient:
+    """Flask test istemcisi (thread başına bir tane)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True), response.headers, response.get_data(as_text=True)
+
+class HttpClient:
+    """Keep-alive HTTP istemcisi (thread başına bir bağlantı)"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        payload = json.dumps(body) if body is not None else None
+        for retry in (False, True):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                text = response.read().decode('utf-8')
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # Sunucu keep-alive bağlantısını kapatmış olabilir; bir kez yeniden bağlan
+                conn.close()
+                self._local.conn = None
+                if retry:
+                    raise
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        return response.status, data, response.headers, text
+
+class LoadTest:
+    def __init__(self, client, exam_id, think_seconds=0.0, ramp_seconds=0.0):
+        self.client = client
+        self.exam_id = exam_id
+        self.think_seconds = think_seconds
+        self.ramp_seconds = ramp_seconds
+        self.samples = []
+        self.tokens = {}
+
+    def _call(self, name, method, path, body=None, token=None):
+        started = time.perf_counter()
+        try:
+            status, data, headers, _ = self.client.request(method, path, body, token)
+            queries = headers.get('X-DB-Query-Count')
+        except Exception as e:
+            status, data, queries = None, {'error': str(e)}, None
+        self.samples.append({
+            'endpoint': name,
+            'status': status,
+            'ms': (time.perf_counter() - started) * 1000,
+            'queries': int(queries) if queries is not None else None
+        })
+        return status, data
+
+    def login(self, username):
+        status, data = self._call('login', 'POST', '/api/auth/login', {'username': username, 'password': PASSWORD})
+        if status == 200:
+            self.tokens[username] = data['token']
+
+    def take_exam(self, username):
+        token = self.tokens.get(username)
+        if token is None:
+            return
+        if self.ramp_seconds:
+            time.sleep(random.uniform(0, self.ramp_seconds))
+
+        status, data = self._call('start', 'POST', f'/api/student/exam/{self.exam_id}/start', token=token)
+        if status != 200:
+            return
+        if self.think_seconds:
+            time.sleep(random.uniform(0, self.think_seconds))
+        answers = [
+            {'question_id': question['id'], 'selected_answer': random.choice('ABCDE')}
+            for question in data['questions']
+        ]
+        self._call('submit', 'POST', f'/api/student/exam/{self.exam_id}/submit', {'answers': answers}, token=token)
+
+    def run_phase(self, func, usernames, concurrency):
+        """Verilen adımı tüm öğrenciler için eş zamanlı çalıştır; geçen süreyi döndür"""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(func, usernames))
+        return time.perf_counter() - started
+
+def summarize(samples, phase_seconds):
+    """Uç nokta başına istek sayısı, hata oranı, gecikme yüzdelikleri ve sorgu sayısı"""
+    phases = {'login': 'login', 'start': 'exam', 'submit': 'exam'}
+    report = {}
+    for name in ('login', 'start', 'submit'):
+        rows = [s for s in samples if s['endpoint'] == name]
+        if not rows:
+            continue
+        latencies = np.array([s['ms'] for s in rows])
+        errors = sum(1 for s in rows if s['status'] is None or s['status'] >= 400)
+        queries = [s['queries'] for s in rows if s['queries'] is not None]
+        report[name] = {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4),
+            'throughput_rps': round(len(rows) / phase_seconds[phases[name]], 1),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 1),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+            'max_ms': round(float(latencies.max()), 1),
+            'queries_per_request': round(sum(queries) / len(queries), 1) if queries else None
+        }
+    return report
+
+def print_report(report, phase_seconds, db_queries):
+    print(f"\n{'uç nokta':<8} {'istek':>6} {'hata':>5} {'hata %':>7} {'istek/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'sorgu/istek':>11}")
+    for name, row in report.items():
+        queries = '-' if row['queries_per_request'] is None else row['queries_per_request']
+        print(f"{name:<8} {row['requests']:>6} {row['errors']:>5} {row['error_rate'] * 100:>6.1f}% "
+              f"{row['throughput_rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} "
+              f"{row['max_ms']:>8} {queries:>11}")
+    print(f"\nGiriş aşaması: {phase_seconds['login']:.1f} s, sınav aşaması: {phase_seconds['exam']:.1f} s")
+    if db_queries is not None:
+        print(f"Toplam veritabanı sorgusu: {db_queries}")
+
+def scrape_query_total(client):
+    """/metrics'ten db_queries_total değerini oku (yoksa None)"""
+    try:
+        status, _, _, text = client.request('GET', '/metrics')
+    except Exception:
+        return None
+    if status != 200:
+        return None
+    for line in text.splitlines():
+        if line.startswith('db_queries_total '):
+            return float(line.split()[1])
+    return None
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--embedded', action='store_true', help='geçici yerel PostgreSQL (pgserver) kullan')
+    target.add_argument('--allow-db-writes', action='store_true',
+                        help='DB_* ile gösterilen veritabanına test verisi yaz')
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--ramp', type=float, default=0.0, help='worker başlatmalarının yayıldığı süre (saniye)')
+    parser.add_argument('--think', type=float, default=0.0, help='cevaplar arasındaki bekleme (saniye)')
+    parser.add_argument('--url', help='çalışan sunucunun adresi (verilmezse süreç içi istemci)')
+    parser.add_argument('--keep', action='store_true', help='test verisini silme')
+    parser.add_argument('--json', dest='report_path', help='raporu bu JSON dosyasına da yaz')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    if args.students < 1 or args.concurrency < 1:
+        parser.error('--students ve --concurrency en az 1 olmalıdır')
+    if args.url and args.embedded:
+        parser.error('--embedded yalnızca süreç içi istemciyle kullanılabilir')
+
+    students = args.students
+    concurrency = args.concurrency
+    url = args.url
+    report_path = args.report_path
+    server = start_embedded_postgres() if args.embedded else None
+
+    # Veritabanı ayarları (DB_*) models import edilirken okunur
+    from config import Config
+    from models import init_db
+
+    if url:
+        client = HttpClient(url)
+        init_db()
+    else:
+        import logging
+        from app import create_app
+        Config.QUERY_STATS_HEADERS = True
+        app = create_app()
+        logging.getLogger('utils.query_stats').setLevel(logging.WARNING)
+        client = InProcessClient(app)
+
+    print(f"{students} öğrenci oluşturuluyor...")
+    cohort = seed_cohort(students)
+    print(f"Sınav {cohort['exam_id']}, {'HTTP ' + url if url else 'süreç içi istemci'}, "
+          f"{concurrency} eş zamanlı worker")
+
+    try:
+        test = LoadTest(client, cohort['exam_id'], think_seconds=args.think, ramp_seconds=args.ramp)
+        queries_before = scrape_query_total(client)
+        phase_seconds = {
+            'login': test.run_phase(test.login, cohort['usernames'], concurrency),
+            'exam': test.run_phase(test.take_exam, cohort['usernames'], concurrency)
+        }
+        queries_after = scrape_query_total(client)
+    finally:
+        if not args.keep:
+            cleanup_cohort(cohort['prefix'])
+        if server is not None:
+            server.cleanup()
+
+    db_queries = None
+    if queries_before is not None and queries_after is not None:
+        db_queries = int(queries_after - queries_before)
+    report = summarize(test.samples, phase_seconds)
+    print_report(report, phase_seconds, db_queries)
+
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump({
+                'students': students,
+                'concurrency': concurrency,
+                'phase_seconds': phase_seconds,
+                'db_queries': db_queries,
+                'endpoints': report
+            }, f, indent=2)
+
+    worst = max((row['error_rate'] for row in report.values()), default=1.0)
+    if worst > args.max_error_rate:
+        print(f"\nHata oranı {worst:.1%} > izin verilen {args.max_error_rate:.1%}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
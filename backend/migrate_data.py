@@ -0,0 +1,66 @@
+"""
+Büyük tablolarda parça parça, kaldığı yerden devam edebilen veri taşıma işleri
+Kullanım: python migrate_data.py list
+          python migrate_data.py run İŞ [--chunk-size N] [--pause SANİYE] [--dry-run]
+          python migrate_data.py reset İŞ
+
+- Satırlar id sırasıyla parça parça güncellenir; her parça kendi transaction'ında
+  ilerleme kaydıyla (migration_checkpoints) birlikte commit edilir.
+- Yarıda kalan bir iş aynı komutla tekrar çalıştırıldığında kaldığı yerden devam eder.
+- --dry-run hiçbir şeyi değiştirmeden güncellenecek satır ve parça sayısını gösterir.
+- reset ilerleme kaydını siler; iş bir sonraki çalıştırmada baştan uygulanır.
+"""
+
+import argparse
+import sys
+from models import init_db
+from utils.migrations import JOBS, run_job, reset_job, list_checkpoints
+
+def list_jobs():
+    checkpoints = {c['job_name']: c for c in list_checkpoints()}
+    for name, job in JOBS.items():
+        checkpoint = checkpoints.get(name)
+        state = 'çalıştırılmadı' if checkpoint is None else \
+            f"{checkpoint['status']}, {checkpoint['rows_done']} satır, son id {checkpoint['last_id']}/{checkpoint['max_id']}"
+        print(f"  {name} ({job.table}): {job.description}\n    durum: {state}")
+    return 0
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError('en az 1 olmalıdır')
+    return number
+
+def non_negative_float(value):
+    number = float(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError('negatif olamaz')
+    return number
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='tanımlı işleri ve ilerlemelerini göster')
+    run_parser = commands.add_parser('run', help='işi çalıştır ya da kaldığı yerden devam ettir')
+    run_parser.add_argument('job', choices=list(JOBS))
+    run_parser.add_argument('--chunk-size', type=positive_int, help='parça başına satır sayısı')
+    run_parser.add_argument('--pause', type=non_negative_float, help='parçalar arasındaki bekleme (saniye)')
+    run_parser.add_argument('--dry-run', action='store_true', help='değiştirmeden satır ve parça sayısını göster')
+    reset_parser = commands.add_parser('reset', help='işin ilerleme kaydını sil')
+    reset_parser.add_argument('job', choices=list(JOBS))
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.command == 'list':
+        return list_jobs()
+
+    job = JOBS[args.job]
+    if args.command == 'reset':
+        print(f"{job.name} ilerleme kaydı silindi" if reset_job(job.name) else f"{job.name} için kayıt yok")
+        return 0
+
+    run_job(job, chunk_size=args.chunk_size, pause=args.pause, dry_run=args.dry_run)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,9 +1,22 @@
 import psycopg2
 import psycopg2.extras
-from datetime import datetime
+import psycopg2.errors
+import psycopg2.pool
+import psycopg2.extensions
+from datetime import datetime, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
+import uuid
+import logging
+import threading
 from contextlib import contextmanager
+from config import Config
+from utils.cache import statistics_cache, question_pool_cache, exam_schedule_cache
+from utils.minhash import text_signature
+from utils.query_stats import InstrumentedCursor
+from utils.metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
 
 # PostgreSQL bağlantı ayarları
 DB_CONFIG = {
@@ -11,9 +24,71 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', '5432')),
     'database': os.getenv('DB_NAME', 'exam_system'),
     'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', 'postgres')
+    'password': os.getenv('DB_PASSWORD', 'postgres'),
+    # TIMESTAMPTZ değerleri oturum saat diliminde döner; her bağlantı UTC çalışır
+    'options': '-c timezone=UTC'
+}
+
+# Büyük listeler sunucu tarafı cursor ile bu boyutta parçalar halinde okunur
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', '1000'))
+
+# Tetikleyicilerle güncel tutulan sayaç kolonları:
+# (sayılan tablo, yabancı anahtar, sayaç tablosu, sayaç kolonu)
+COUNTER_COLUMNS = [
+    ('questions', 'exam_id', 'exams', 'question_count'),
+    ('enrollments', 'course_id', 'courses', 'student_count'),
+    ('exams', 'course_id', 'courses', 'exam_count'),
+]
+
+# Saat dilimli (TIMESTAMPTZ) zaman kolonları; eski kurulumlarda TIMESTAMP olarak
+# oluşturulmuşlarsa init_db() değerleri UTC kabul ederek dönüştürür
+TIMESTAMPTZ_COLUMNS = {
+    'exams': ('start_time', 'end_time'),
+    'exam_attempts': ('start_time', 'end_time'),
 }
 
+# Soru metni özeti: boşlukları teklenmiş, kırpılmış, Türkçe katlanmış metnin md5'i.
+# questions.text_digest kolonu ve Question.text_digests aynı SQL ifadesini kullanır;
+# Python'da hesaplanmaz (str.split/lower bazı karakterlerde PostgreSQL'den farklı davranır)
+TEXT_DIGEST_SQL = "md5(tr_fold(btrim(regexp_replace({}, '[[:space:]]+', ' ', 'g'))))"
+
+# Eklenecek soru satırları (v) için tekrar kontrolü. Benzersiz indeks varken ON CONFLICT
+# yeterlidir; eski veride tekrarlar yüzünden yalnızca düz indeks kurulabildiyse bu koşul
+# aynı sınavdaki aynı özeti indeks üzerinden arar
+NEW_QUESTION_COLUMNS = ('v(exam_id, question_text, option_a, option_b, option_c, option_d, option_e, '
+                        'correct_answer, topic, difficulty, minhash, lsh_bands)')
+QUESTION_NOT_DUPLICATE_SQL = f'''
+    NOT EXISTS (
+        SELECT 1 FROM questions q
+        WHERE q.exam_id = v.exam_id AND q.text_digest = {TEXT_DIGEST_SQL.format('v.question_text')}
+    )
+'''
+
+# SQL tarafındaki tr_fold() fonksiyonunun Python karşılığı
+_TR_FOLD_TABLE = str.maketrans('İIıŞşĞğÜüÖöÇç', 'iiissgguuoocc')
+
+def tr_fold(text):
+    """Türkçe harfleri katlayarak küçük harfe çevir (İ/I/ı -> i, ş -> s, ...)"""
+    return text.translate(_TR_FOLD_TABLE).lower()
+
+def normalize_question_text(text):
+    """Soru metnini karşılaştırma için normalize et: boşlukları tekle, kırp, Türkçe katla"""
+    return tr_fold(' '.join(text.split()))
+
+def utc_isoformat(dt):
+    """Zamanı UTC'ye çevirip 'Z' son ekli ISO formatında döndür (saat dilimsiz zaman UTC kabul edilir)"""
+    if not isinstance(dt, datetime):
+        return str(dt)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    else:
+        dt = dt.astimezone(timezone.utc)
+    return dt.isoformat()[:-6] + 'Z'
+
+def escape_like(text):
+    """LIKE kalıbındaki özel karakterleri kaçır"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
 def get_db_connection():
     """Veritabanı bağlantısı oluştur"""
     try:
@@ -40,15 +115,113 @@ def create_database():
         cur.close()
         conn.close()
 
+# Sunucu (serve.py) her worker'da init_pool() çağırır; havuz yoksa her cursor
+# için yeni bağlantı açılır (geliştirme sunucusu, betikler)
+_pool = None
+# Havuzun boş bağlantı slotları: psycopg2 havuzu tükenince beklemeden PoolError
+# verir, bu semafor ise bir bağlantı geri gelene kadar bekletir
+_pool_slots = None
+
+# Havuzun açık ve kullanımdaki bağlantı sayıları (metrikler için)
+_pool_counts_lock = threading.Lock()
+_pool_counts = {'open': 0, 'in_use': 0}
+
+def _count_pool(key, delta):
+    with _pool_counts_lock:
+        _pool_counts[key] += delta
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Havuzun açtığı bağlantı; açılış ve kapanışlarını kendisi sayar"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counted = True
+        _count_pool('open', 1)
+        metrics.inc('db_connections_opened_total')
+
+    def close(self):
+        if getattr(self, '_counted', False):
+            self._counted = False
+            _count_pool('open', -1)
+        super().close()
+
+def init_pool(minconn, maxconn):
+    """Bu süreç için thread-safe bağlantı havuzu kur (minconn bağlantı hemen açılır)"""
+    global _pool, _pool_slots
+    close_pool()
+    _pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, connection_factory=PooledConnection, **DB_CONFIG)
+    _pool_slots = threading.BoundedSemaphore(maxconn)
+    return _pool
+
+def close_pool():
+    """Havuzdaki tüm bağlantıları kapat"""
+    global _pool, _pool_slots
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+        _pool_slots = None
+
+def _pool_collector():
+    pool = _pool
+    if pool is not None and not pool.closed:
+        with _pool_counts_lock:
+            open_connections, in_use = _pool_counts['open'], _pool_counts['in_use']
+        yield 'gauge', 'db_pool_connections', {}, open_connections
+        yield 'gauge', 'db_pool_idle_connections', {}, max(open_connections - in_use, 0)
+        yield 'gauge', 'db_pool_max_connections', {}, pool.maxconn
+
+metrics.collectors.append(_pool_collector)
+
 @contextmanager
-def get_db_cursor():
-    """Context manager ile veritabanı cursor'ı"""
-    conn = get_db_connection()
+def get_db_cursor(name=None):
+    """Context manager ile veritabanı cursor'ı (name verilirse sunucu tarafı cursor)"""
+    pool, slots = _pool, _pool_slots
+    if pool is not None:
+        # Tüm bağlantılar kullanımdaysa (uzun akışlar, arka plan yenilemeleri) hata
+        # vermek yerine DB_POOL_TIMEOUT süresince bir bağlantının geri gelmesini bekle
+        if not slots.acquire(timeout=Config.DB_POOL_TIMEOUT):
+            raise psycopg2.pool.PoolError(
+                f'{Config.DB_POOL_TIMEOUT:g} saniye içinde boş veritabanı bağlantısı bulunamadı')
+        try:
+            conn = pool.getconn()
+        except Exception:
+            slots.release()
+            raise
+        _count_pool('in_use', 1)
+    else:
+        conn = get_db_connection()
+        metrics.inc('db_connections_opened_total')
+    metrics.add_gauge('db_connections_in_use', 1)
     try:
-        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        # Sorgular istek başına istatistikler (sayı, süre, N+1) için zamanlanır
+        with conn.cursor(name=name, cursor_factory=InstrumentedCursor) as cur:
             yield conn, cur
     finally:
-        conn.close()
+        metrics.add_gauge('db_connections_in_use', -1)
+        if pool is None:
+            conn.close()
+        else:
+            try:
+                if conn.closed:
+                    pool.putconn(conn, close=True)
+                else:
+                    # Commit edilmemiş işlem havuza geri dönmesin
+                    try:
+                        conn.rollback()
+                        pool.putconn(conn)
+                    except psycopg2.Error:
+                        pool.putconn(conn, close=True)
+            finally:
+                _count_pool('in_use', -1)
+                slots.release()
+
+def iter_query(query, params=None, batch_size=STREAM_BATCH_SIZE):
+    """Sorgu sonucunu sunucu tarafı cursor ile batch_size'lık parçalar halinde satır satır döndür"""
+    with get_db_cursor(name=f'stream_{uuid.uuid4().hex}') as (conn, cur):
+        cur.itersize = batch_size
+        cur.execute(query, params)
+        for row in cur:
+            yield row
 
 def init_db():
     """Veritabanı tablolarını oluştur"""
@@ -124,8 +297,8 @@ def init_db():
                 course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
                 exam_type VARCHAR(20) NOT NULL,
                 weight_percentage INTEGER NOT NULL CHECK (weight_percentage >= 0 AND weight_percentage <= 100),
-                start_time TIMESTAMP NOT NULL,
-                end_time TIMESTAMP NOT NULL,
+                start_time TIMESTAMPTZ NOT NULL,
+                end_time TIMESTAMPTZ NOT NULL,
                 duration_minutes INTEGER DEFAULT 10,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
@@ -153,8 +326,8 @@ def init_db():
                 id SERIAL PRIMARY KEY,
                 student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE,
                 exam_id INTEGER NOT NULL REFERENCES exams(id) ON DELETE CASCADE,
-                start_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                end_time TIMESTAMP,
+                start_time TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+                end_time TIMESTAMPTZ,
                 score FLOAT,
                 is_completed BOOLEAN DEFAULT FALSE
             )
@@ -172,13 +345,268 @@ def init_db():
             )
         ''')
 
+        # Cevap benzerliği (kopya taraması) bulguları
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS answer_similarity_flags (
+                id SERIAL PRIMARY KEY,
+                exam_id INTEGER NOT NULL REFERENCES exams(id) ON DELETE CASCADE,
+                attempt_a_id INTEGER NOT NULL REFERENCES exam_attempts(id) ON DELETE CASCADE,
+                attempt_b_id INTEGER NOT NULL REFERENCES exam_attempts(id) ON DELETE CASCADE,
+                shared_questions INTEGER NOT NULL,
+                identical_answers INTEGER NOT NULL,
+                identical_wrong INTEGER NOT NULL,
+                expected_identical_wrong FLOAT NOT NULL,
+                p_value FLOAT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(exam_id, attempt_a_id, attempt_b_id)
+            )
+        ''')
+
+        # Parça parça çalışan veri taşıma işlerinin (utils/migrations.py) ilerleme kayıtları
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS migration_checkpoints (
+                job_name VARCHAR(100) PRIMARY KEY,
+                table_name VARCHAR(63) NOT NULL,
+                last_id BIGINT NOT NULL DEFAULT 0,
+                max_id BIGINT NOT NULL,
+                rows_done BIGINT NOT NULL DEFAULT 0,
+                status VARCHAR(10) NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'done')),
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+
+        # Ders/sınav bazlı gruplanmış sorgular için indeksler
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_enrollments_course_id ON enrollments(course_id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_exams_course_id ON exams(course_id)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_exam_attempts_exam_student ON exam_attempts(exam_id, student_id)')
+
+        # Türkçe harf katlama fonksiyonu (İ/I/ı -> i, ş -> s, ...), arama indeksleri bunu kullanır
+        cur.execute('''
+            CREATE OR REPLACE FUNCTION tr_fold(text) RETURNS text
+            LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+            AS $$ SELECT lower(translate($1, 'İIıŞşĞğÜüÖöÇç', 'iiissgguuoocc')) $$
+        ''')
+
+        # Normalize edilmiş soru metninin özeti (boşluklar teklenmiş, kırpılmış, Türkçe katlanmış);
+        # aynı sınavda tekrar eden soru kontrolü bu kolon üzerindeki indeksle yapılır
+        cur.execute(f'''
+            ALTER TABLE questions ADD COLUMN IF NOT EXISTS text_digest TEXT
+            GENERATED ALWAYS AS ({TEXT_DIGEST_SQL.format('question_text')}) STORED
+        ''')
+
+        # Yakın kopya soru tespiti: MinHash imzası ve LSH bant anahtarları;
+        # aynı bant anahtarını paylaşan sorular GIN indeksiyle (&&) bulunur
+        cur.execute('ALTER TABLE questions ADD COLUMN IF NOT EXISTS minhash BIGINT[]')
+        cur.execute('ALTER TABLE questions ADD COLUMN IF NOT EXISTS lsh_bands BIGINT[]')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_questions_lsh_bands ON questions USING gin (lsh_bands)')
+
+        # Soru havuzu etiketleri ve sınav planı (blueprint): örn. 2 kolay cebir, 2 orta, 1 zor
+        cur.execute('ALTER TABLE questions ADD COLUMN IF NOT EXISTS topic VARCHAR(80)')
+        cur.execute('''
+            ALTER TABLE questions ADD COLUMN IF NOT EXISTS difficulty VARCHAR(10)
+            CHECK (difficulty IN ('easy', 'medium', 'hard'))
+        ''')
+        cur.execute('ALTER TABLE exams ADD COLUMN IF NOT EXISTS blueprint JSONB')
+
+        # Eski TIMESTAMP zaman kolonlarını TIMESTAMPTZ'ye çevir (saklanan değerler UTC);
+        # bir tablonun kolonları tek ALTER ile dönüştürülür ki tablo bir kez yeniden yazılsın
+        for table, columns in TIMESTAMPTZ_COLUMNS.items():
+            cur.execute('''
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = %s AND column_name = ANY(%s)
+                  AND data_type = 'timestamp without time zone'
+                ORDER BY column_name
+            ''', (table, list(columns)))
+            naive_columns = [row[0] for row in cur.fetchall()]
+            if naive_columns:
+                cur.execute(f'ALTER TABLE {table} ' + ', '.join(
+                    f"ALTER COLUMN {column} TYPE TIMESTAMPTZ USING {column} AT TIME ZONE 'UTC'"
+                    for column in naive_columns
+                ))
+
+        # Sayaç kolonları ve onları INSERT/DELETE ile birlikte güncelleyen tetikleyiciler
+        for source, fk, target, column in COUNTER_COLUMNS:
+            cur.execute('''
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = %s AND column_name = %s
+            ''', (target, column))
+            is_new_column = cur.fetchone() is None
+
+            if is_new_column:
+                cur.execute(f'ALTER TABLE {target} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+
+            # Tetikleyiciler yalnızca eksikse kurulur: DROP/CREATE TRIGGER tabloyu kilitler,
+            # her açılışta sık kullanılan tablolarda çalıştırılmamalı
+            triggers = {f'{source}_{column}_insert', f'{source}_{column}_delete'}
+            cur.execute('''
+                SELECT tgname FROM pg_trigger
+                WHERE tgrelid = %s::regclass AND tgname = ANY(%s)
+            ''', (source, list(triggers)))
+            missing = triggers - {row[0] for row in cur.fetchall()}
+            if missing:
+                cur.execute(f'''
+                    CREATE OR REPLACE FUNCTION maintain_{target}_{column}() RETURNS trigger
+                    LANGUAGE plpgsql AS $$
+                    BEGIN
+                        IF TG_OP = 'INSERT' THEN
+                            UPDATE {target} t SET {column} = t.{column} + d.n
+                            FROM (SELECT {fk}, COUNT(*) AS n FROM new_rows GROUP BY {fk}) d
+                            WHERE t.id = d.{fk};
+                        ELSE
+                            UPDATE {target} t SET {column} = t.{column} - d.n
+                            FROM (SELECT {fk}, COUNT(*) AS n FROM old_rows GROUP BY {fk}) d
+                            WHERE t.id = d.{fk};
+                        END IF;
+                        RETURN NULL;
+                    END $$
+                ''')
+            # Transition table'lı tetikleyiciler tek olay destekler: INSERT ve DELETE ayrı
+            if f'{source}_{column}_insert' in missing:
+                cur.execute(f'''
+                    CREATE TRIGGER {source}_{column}_insert AFTER INSERT ON {source}
+                    REFERENCING NEW TABLE AS new_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION maintain_{target}_{column}()
+                ''')
+            if f'{source}_{column}_delete' in missing:
+                cur.execute(f'''
+                    CREATE TRIGGER {source}_{column}_delete AFTER DELETE ON {source}
+                    REFERENCING OLD TABLE AS old_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION maintain_{target}_{column}()
+                ''')
+
+            # Kolon yeni eklendiyse mevcut veriden doldur
+            if is_new_column:
+                recount_counter(cur, source, fk, target, column)
+
         conn.commit()
+
+        # Aynı sınavda aynı soru metni bir kez bulunabilir. Eski veride tekrarlar varsa
+        # benzersiz indeks oluşturulamaz; o durumda düz indeks kurulur ve tekrar kontrolünü
+        # INSERT'lerdeki NOT EXISTS koşulu yapar. Tekrarlar temizlenince sonraki açılışta
+        # benzersiz indekse geçilir
+        cur.execute("SELECT to_regclass('idx_questions_exam_text_digest') IS NOT NULL AS found")
+        if not cur.fetchone()[0]:
+            cur.execute('''
+                SELECT 1 FROM questions
+                GROUP BY exam_id, text_digest
+                HAVING COUNT(*) > 1
+                LIMIT 1
+            ''')
+            if cur.fetchone() is None:
+                cur.execute('''
+                    CREATE UNIQUE INDEX idx_questions_exam_text_digest
+                    ON questions(exam_id, text_digest)
+                ''')
+                cur.execute('DROP INDEX IF EXISTS idx_questions_exam_text_digest_nonunique')
+            else:
+                logger.warning('Bazı sınavlarda tekrar eden soru metinleri var, benzersiz indeks '
+                               'oluşturulamadı; tekrar kontrolü düz indeksle yapılıyor')
+                cur.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_questions_exam_text_digest_nonunique
+                    ON questions(exam_id, text_digest)
+                ''')
+            conn.commit()
+
+        # Kullanıcı/öğrenci araması için trigram indeksleri
+        # pg_trgm kurulu değilse arama indekssiz LIKE sorgusuna düşer
+        try:
+            cur.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cur.execute('''
+                CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm
+                ON users USING gin (tr_fold(full_name) gin_trgm_ops)
+            ''')
+            cur.execute('''
+                CREATE INDEX IF NOT EXISTS idx_users_username_trgm
+                ON users USING gin (tr_fold(username) gin_trgm_ops)
+            ''')
+            # Öğrenci numarası da katlanarak aranır (LT... gibi büyük harfli numaralar)
+            cur.execute('DROP INDEX IF EXISTS idx_students_student_number_trgm')
+            cur.execute('''
+                CREATE INDEX IF NOT EXISTS idx_students_student_number_fold_trgm
+                ON students USING gin (tr_fold(student_number) gin_trgm_ops)
+            ''')
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+
         cur.close()
         conn.close()
 
     except Exception as e:
         pass
 
+# Notlara sayılan deneme: exam_attempts'ta (student_id, exam_id) tekil değil, aynı sınavda
+# birden çok tamamlanmış deneme varsa yalnızca en son başlatılanı sayılır ("ea" takma adına uygulanır)
+GRADED_ATTEMPT_SQL = '''
+    ea.is_completed = TRUE AND ea.score IS NOT NULL
+    AND NOT EXISTS (
+        SELECT 1 FROM exam_attempts later
+        WHERE later.exam_id = ea.exam_id AND later.student_id = ea.student_id
+          AND later.is_completed = TRUE AND later.score IS NOT NULL
+          AND later.id > ea.id
+    )
+'''
+
+# Öğrenci başına ders notu: sayılan denemelerin ağırlıklı toplamı
+# (en az bir ağırlıklı sınava girilmemişse not yok)
+COURSE_GRADES_SQL = f'''
+    SELECT en.student_id, en.course_id,
+           ROUND((SUM(ea.score * ex.weight_percentage) / 100)::numeric, 2)::float AS grade
+    FROM enrollments en
+    JOIN exams ex ON ex.course_id = en.course_id
+    JOIN exam_attempts ea ON ea.exam_id = ex.id AND ea.student_id = en.student_id
+    WHERE {GRADED_ATTEMPT_SQL}
+    GROUP BY en.student_id, en.course_id
+    HAVING SUM(ex.weight_percentage) > 0
+'''
+
+def recount_counter(cur, source, fk, target, column):
+    """Sayaç kolonunu gerçek sayımdan yeniden hesapla, düzeltilen satır sayısını döndür"""
+    cur.execute(f'''
+        WITH actual AS (
+            SELECT t.id, COUNT(s.{fk}) AS n
+            FROM {target} t
+            LEFT JOIN {source} s ON s.{fk} = t.id
+            GROUP BY t.id
+        )
+        UPDATE {target} t SET {column} = actual.n
+        FROM actual
+        WHERE t.id = actual.id AND t.{column} <> actual.n
+    ''')
+    return cur.rowcount
+
+def find_counter_mismatches():
+    """Sayaç kolonları ile gerçek sayımlar arasındaki farkları listele"""
+    mismatches = []
+    with get_db_cursor() as (conn, cur):
+        for source, fk, target, column in COUNTER_COLUMNS:
+            cur.execute(f'''
+                SELECT t.id, t.{column} AS stored, COUNT(s.{fk}) AS actual
+                FROM {target} t
+                LEFT JOIN {source} s ON s.{fk} = t.id
+                GROUP BY t.id
+                HAVING t.{column} <> COUNT(s.{fk})
+                ORDER BY t.id
+            ''')
+            for row in cur.fetchall():
+                mismatches.append({'table': target, 'column': column, **dict(row)})
+    return mismatches
+
+def recount_counters():
+    """Tüm sayaç kolonlarını tek transaction içinde düzelt"""
+    fixed = {}
+    with get_db_cursor() as (conn, cur):
+        try:
+            for source, fk, target, column in COUNTER_COLUMNS:
+                fixed[f'{target}.{column}'] = recount_counter(cur, source, fk, target, column)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return fixed
+
 
 class User:
     """User modeli"""
@@ -263,7 +691,77 @@ class User:
                     user_dict['created_at'] = user_dict['created_at'].isoformat()
                 users.append(user_dict)
             return users
-    
+
+    @staticmethod
+    def iter_all():
+        """Tüm kullanıcıları sunucu tarafı cursor ile tek tek döndür"""
+        rows = iter_query('''
+            SELECT id, username, role, full_name, created_at
+            FROM users
+            ORDER BY created_at DESC
+        ''')
+        for row in rows:
+            user_dict = dict(row)
+            if user_dict.get('created_at'):
+                user_dict['created_at'] = user_dict['created_at'].isoformat()
+            yield user_dict
+
+    @staticmethod
+    def search(query, limit=20):
+        """Ad, kullanıcı adı veya öğrenci numarasına göre kullanıcı ara (benzerliğe göre sıralı)"""
+        term = tr_fold(query.strip())
+        params = {'term': term, 'pattern': f'%{escape_like(term)}%', 'limit': limit}
+        with get_db_cursor() as (conn, cur):
+            try:
+                # Her dal kendi trigram indeksini kullanır, sonuçlar UNION ile birleştirilir
+                cur.execute('''
+                    WITH matches AS (
+                        SELECT id AS user_id FROM users
+                        WHERE tr_fold(full_name) LIKE %(pattern)s OR tr_fold(full_name) %% %(term)s
+                           OR tr_fold(username) LIKE %(pattern)s OR tr_fold(username) %% %(term)s
+                        UNION
+                        SELECT user_id FROM students
+                        WHERE tr_fold(student_number) LIKE %(pattern)s OR tr_fold(student_number) %% %(term)s
+                    )
+                    SELECT u.id, u.username, u.full_name, u.role,
+                           s.id AS student_id, s.student_number,
+                           GREATEST(
+                               similarity(tr_fold(u.full_name), %(term)s),
+                               similarity(tr_fold(u.username), %(term)s),
+                               COALESCE(similarity(tr_fold(s.student_number), %(term)s), 0)
+                           ) AS score
+                    FROM matches m
+                    JOIN users u ON u.id = m.user_id
+                    LEFT JOIN students s ON s.user_id = u.id
+                    ORDER BY score DESC, u.full_name
+                    LIMIT %(limit)s
+                ''', params)
+            except psycopg2.errors.UndefinedFunction:
+                # pg_trgm kurulu değil: indekssiz LIKE araması, önek eşleşmeleri önde
+                conn.rollback()
+                params['prefix'] = f'{escape_like(term)}%'
+                cur.execute('''
+                    SELECT u.id, u.username, u.full_name, u.role,
+                           s.id AS student_id, s.student_number,
+                           CASE WHEN tr_fold(u.full_name) LIKE %(prefix)s
+                                  OR tr_fold(u.username) LIKE %(prefix)s
+                                  OR tr_fold(s.student_number) LIKE %(prefix)s
+                                THEN 1.0 ELSE 0.5 END AS score
+                    FROM users u
+                    LEFT JOIN students s ON s.user_id = u.id
+                    WHERE tr_fold(u.full_name) LIKE %(pattern)s
+                       OR tr_fold(u.username) LIKE %(pattern)s
+                       OR tr_fold(s.student_number) LIKE %(pattern)s
+                    ORDER BY score DESC, u.full_name
+                    LIMIT %(limit)s
+                ''', params)
+            results = []
+            for row in cur.fetchall():
+                row_dict = dict(row)
+                row_dict['score'] = round(float(row_dict['score']), 3)
+                results.append(row_dict)
+            return results
+
     @staticmethod
     def update(user_id, username=None, password=None, full_name=None, role=None):
         """Kullanıcı bilgilerini güncelle"""
@@ -319,6 +817,8 @@ class User:
                 # Kullanıcıyı sil
                 cur.execute('DELETE FROM users WHERE id = %s', (user_id,))
                 conn.commit()
+                # Öğretim üyesiyse dersleri ve sınavları da silinmiş olabilir
+                exam_schedule_cache.invalidate()
                 
                 # Silme işleminin başarılı olduğunu doğrula
                 cur.execute('SELECT id FROM users WHERE id = %s', (user_id,))
@@ -413,6 +913,25 @@ class Student:
             ''')
             return [dict(row) for row in cur.fetchall()]
     
+    @staticmethod
+    def iter_with_grades():
+        """Öğrencileri kayıtlı oldukları dersler, ders notları ve genel ortalamalarıyla
+        öğrenci sırasına göre satır satır döndür"""
+        rows = iter_query(f'''
+            WITH course_grades AS ({COURSE_GRADES_SQL})
+            SELECT s.id, s.user_id, s.student_number, u.full_name, u.username,
+                   e.course_id, c.code as course_code, c.name as course_name, g.grade,
+                   ROUND(AVG(g.grade) OVER (PARTITION BY s.id)::numeric, 2)::float as overall_average
+            FROM students s
+            JOIN users u ON s.user_id = u.id
+            LEFT JOIN enrollments e ON e.student_id = s.id
+            LEFT JOIN courses c ON e.course_id = c.id
+            LEFT JOIN course_grades g ON g.student_id = e.student_id AND g.course_id = e.course_id
+            ORDER BY s.student_number, c.code
+        ''')
+        for row in rows:
+            yield dict(row)
+    
     @staticmethod
     def delete(student_id):
         """Öğrenci sil - CASCADE DELETE ile user da silinir"""
@@ -429,6 +948,7 @@ class Student:
                 # User'ı sil (CASCADE DELETE ile students, enrollments, exam_attempts vb. de silinir)
                 cur.execute('DELETE FROM users WHERE id = %s', (user_id,))
                 conn.commit()
+                statistics_cache.invalidate()
                 
                 # Silme işleminin başarılı olduğunu doğrula
                 cur.execute('SELECT id FROM students WHERE id = %s', (student_id,))
@@ -510,6 +1030,7 @@ class Instructor:
                 # User'ı sil (CASCADE DELETE ile instructors, courses vb. de silinir)
                 cur.execute('DELETE FROM users WHERE id = %s', (user_id,))
                 conn.commit()
+                exam_schedule_cache.invalidate()
                 
                 # Silme işleminin başarılı olduğunu doğrula
                 cur.execute('SELECT id FROM instructors WHERE id = %s', (instructor_id,))
@@ -604,7 +1125,8 @@ class Course:
         """ID ile ders bul"""
         with get_db_cursor() as (conn, cur):
             cur.execute('''
-                SELECT c.id, c.code, c.name, c.instructor_id, u.full_name as instructor_name
+                SELECT c.id, c.code, c.name, c.instructor_id, u.full_name as instructor_name,
+                       c.exam_count, c.student_count
                 FROM courses c
                 JOIN instructors i ON c.instructor_id = i.id
                 JOIN users u ON i.user_id = u.id
@@ -624,30 +1146,23 @@ class Course:
                     c.name, 
                     c.instructor_id, 
                     u.full_name as instructor_name,
-                    (SELECT COUNT(*) FROM exams WHERE course_id = c.id) as exam_count,
-                    (SELECT COUNT(*) FROM enrollments WHERE course_id = c.id) as student_count
+                    c.exam_count,
+                    c.student_count
                 FROM courses c
                 JOIN instructors i ON c.instructor_id = i.id
                 JOIN users u ON i.user_id = u.id
                 WHERE c.instructor_id = %s
                 ORDER BY c.code
             ''', (instructor_id,))
-            results = cur.fetchall()
-            courses = []
-            for row in results:
-                course_dict = dict(row)
-                # exam_count ve student_count'u integer'a çevir
-                course_dict['exam_count'] = int(course_dict.get('exam_count', 0) or 0)
-                course_dict['student_count'] = int(course_dict.get('student_count', 0) or 0)
-                courses.append(course_dict)
-            return courses
+            return [dict(row) for row in cur.fetchall()]
     
     @staticmethod
     def get_all():
         """Tüm dersleri getir"""
         with get_db_cursor() as (conn, cur):
             cur.execute('''
-                SELECT c.id, c.code, c.name, c.instructor_id, u.full_name as instructor_name
+                SELECT c.id, c.code, c.name, c.instructor_id, u.full_name as instructor_name,
+                       c.exam_count, c.student_count
                 FROM courses c
                 JOIN instructors i ON c.instructor_id = i.id
                 JOIN users u ON i.user_id = u.id
@@ -655,6 +1170,50 @@ class Course:
             ''')
             return [dict(row) for row in cur.fetchall()]
     
+    @staticmethod
+    def iter_gradebook(course_id):
+        """Dersin not çizelgesini öğrenci başına bir satır olarak döndür:
+        sınav puanları {exam_id: puan} sözlüğü ve ağırlıklı ders notuyla
+        (not ve puanlar, görünümlerle aynı şekilde sayılan denemelerden gelir)"""
+        rows = iter_query(f'''
+            WITH course_grades AS ({COURSE_GRADES_SQL})
+            SELECT s.id as student_id, s.student_number, u.full_name,
+                   jsonb_object_agg(ex.id, ea.score) FILTER (WHERE ea.id IS NOT NULL) as exam_scores,
+                   g.grade
+            FROM enrollments en
+            JOIN students s ON en.student_id = s.id
+            JOIN users u ON s.user_id = u.id
+            LEFT JOIN course_grades g ON g.student_id = en.student_id AND g.course_id = en.course_id
+            LEFT JOIN exams ex ON ex.course_id = en.course_id
+            LEFT JOIN exam_attempts ea ON ea.exam_id = ex.id AND ea.student_id = en.student_id
+                 AND {GRADED_ATTEMPT_SQL}
+            WHERE en.course_id = %s
+            GROUP BY s.id, s.student_number, u.full_name, g.grade
+            ORDER BY s.student_number
+        ''', (course_id,))
+        for row in rows:
+            result_dict = dict(row)
+            result_dict['exam_scores'] = result_dict['exam_scores'] or {}
+            yield result_dict
+    
+    @staticmethod
+    def get_all_with_grades():
+        """Tüm dersleri not ortalamalarıyla getir (tek gruplanmış sorgu)"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute(f'''
+                WITH course_grades AS ({COURSE_GRADES_SQL})
+                SELECT c.id, c.code, c.name, c.instructor_id, u.full_name as instructor_name,
+                       c.exam_count, c.student_count,
+                       ROUND(AVG(g.grade)::numeric, 2)::float as average_grade
+                FROM courses c
+                JOIN instructors i ON c.instructor_id = i.id
+                JOIN users u ON i.user_id = u.id
+                LEFT JOIN course_grades g ON g.course_id = c.id
+                GROUP BY c.id, u.full_name
+                ORDER BY c.code
+            ''')
+            return [dict(row) for row in cur.fetchall()]
+    
     @staticmethod
     def delete(course_id):
         """Ders sil"""
@@ -662,6 +1221,8 @@ class Course:
             cur.execute('DELETE FROM courses WHERE id = %s RETURNING id', (course_id,))
             result = cur.fetchone()
             conn.commit()
+            statistics_cache.invalidate()
+            exam_schedule_cache.invalidate()
             return result is not None
 
 
@@ -679,6 +1240,7 @@ class Enrollment:
             ''', (student_id, course_id))
             result = cur.fetchone()
             conn.commit()
+            statistics_cache.invalidate()
             
             if result:
                 result_dict = dict(result)
@@ -734,6 +1296,21 @@ class Enrollment:
             ''')
             return [dict(row) for row in cur.fetchall()]
     
+    @staticmethod
+    def iter_all():
+        """Tüm kayıtları sunucu tarafı cursor ile tek tek döndür"""
+        rows = iter_query('''
+            SELECT e.id, e.student_id, e.course_id, 
+                   u.full_name as student_name, c.name as course_name, c.code as course_code
+            FROM enrollments e
+            JOIN students s ON e.student_id = s.id
+            JOIN users u ON s.user_id = u.id
+            JOIN courses c ON e.course_id = c.id
+            ORDER BY c.code, s.student_number
+        ''')
+        for row in rows:
+            yield dict(row)
+    
     @staticmethod
     def delete(enrollment_id):
         """Kayıt sil"""
@@ -741,6 +1318,7 @@ class Enrollment:
             cur.execute('DELETE FROM enrollments WHERE id = %s RETURNING id', (enrollment_id,))
             result = cur.fetchone()
             conn.commit()
+            statistics_cache.invalidate()
             return result is not None
 
 
@@ -749,23 +1327,7 @@ class Exam:
     
     @staticmethod
     def create(course_id, exam_type, weight_percentage, start_time, end_time, duration_minutes=10):
-        """Yeni sınav oluştur"""
-        from datetime import timezone
-        
-        # PostgreSQL TIMESTAMP timezone-aware değil, bu yüzden timezone-aware datetime'ları naive UTC'ye çevir
-        # Timezone-aware ise UTC'ye çevir ve timezone bilgisini kaldır
-        if hasattr(start_time, 'tzinfo') and start_time.tzinfo is not None:
-            start_time = start_time.astimezone(timezone.utc).replace(tzinfo=None)
-        elif hasattr(start_time, 'tzinfo') and start_time.tzinfo is None:
-            # Zaten naive, UTC olarak kabul et
-            pass
-        
-        if hasattr(end_time, 'tzinfo') and end_time.tzinfo is not None:
-            end_time = end_time.astimezone(timezone.utc).replace(tzinfo=None)
-        elif hasattr(end_time, 'tzinfo') and end_time.tzinfo is None:
-            # Zaten naive, UTC olarak kabul et
-            pass
-        
+        """Yeni sınav oluştur (start_time/end_time timezone-aware datetime; saat dilimsiz değerler UTC kabul edilir)"""
         with get_db_cursor() as (conn, cur):
             cur.execute('''
                 INSERT INTO exams (course_id, exam_type, weight_percentage, start_time, end_time, duration_minutes)
@@ -774,103 +1336,164 @@ class Exam:
             ''', (course_id, exam_type, weight_percentage, start_time, end_time, duration_minutes))
             result = cur.fetchone()
             conn.commit()
-            
-            if result:
-                result_dict = dict(result)
-                if result_dict.get('start_time'):
-                    result_dict['start_time'] = result_dict['start_time'].isoformat()
-                if result_dict.get('end_time'):
-                    result_dict['end_time'] = result_dict['end_time'].isoformat()
-                if result_dict.get('created_at'):
-                    result_dict['created_at'] = result_dict['created_at'].isoformat()
-                return result_dict
-            return None
+            statistics_cache.invalidate()
+            exam_schedule_cache.invalidate()
+            return dict(result) if result else None
     
     @staticmethod
     def get_by_id(exam_id):
         """ID ile sınav bul"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                SELECT e.*, c.name as course_name, c.code as course_code
+                FROM exams e
+                JOIN courses c ON e.course_id = c.id
+                WHERE e.id = %s
+            ''', (exam_id,))
+            result = cur.fetchone()
+            return dict(result) if result else None
+    
+    @staticmethod
+    def get_windows():
+        """Tüm sınavların yalnızca id, ders ve zaman penceresi bilgisini getir (sınav takvimi indeksi için)"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('SELECT id, course_id, start_time, end_time FROM exams')
+            return [dict(row) for row in cur.fetchall()]
+    
+    @staticmethod
+    def get_by_ids(exam_ids, at=None):
+        """Verilen id'lerdeki sınavları ders bilgisi ile başlangıç zamanı sırasında getir;
+        is_available sınav penceresinin at anında (verilmezse şu anda) açık olup olmadığını gösterir"""
         with get_db_cursor() as (conn, cur):
             cur.execute('''
                 SELECT e.*, c.name as course_name, c.code as course_code,
-                       (SELECT COUNT(*) FROM questions WHERE exam_id = e.id) as question_count
+                       COALESCE(%(at)s, NOW()) BETWEEN e.start_time AND e.end_time as is_available
+                FROM exams e
+                JOIN courses c ON e.course_id = c.id
+                WHERE e.id = ANY(%(exam_ids)s)
+                ORDER BY e.start_time, e.id
+            ''', {'exam_ids': list(exam_ids), 'at': at})
+            return [dict(row) for row in cur.fetchall()]
+    
+    @staticmethod
+    def clone(exam_id, course_id, start_time, end_time, question_ids=None):
+        """Sınavı ve sorularını (ya da verilen soru alt kümesini) sunucu tarafında
+        INSERT ... SELECT ile tek transaction içinde başka bir derse/döneme kopyala"""
+        question_filter = '' if question_ids is None else 'AND id = ANY(%(question_ids)s)'
+        params = {
+            'exam_id': exam_id,
+            'course_id': course_id,
+            'start_time': start_time,
+            'end_time': end_time,
+            'question_ids': list(question_ids or [])
+        }
+        with get_db_cursor() as (conn, cur):
+            try:
+                cur.execute('''
+                    INSERT INTO exams (course_id, exam_type, weight_percentage, start_time, end_time, duration_minutes,
+                                       blueprint)
+                    SELECT %(course_id)s, exam_type, weight_percentage, %(start_time)s, %(end_time)s, duration_minutes,
+                           blueprint
+                    FROM exams WHERE id = %(exam_id)s
+                    RETURNING id, course_id, exam_type, weight_percentage, start_time, end_time, duration_minutes,
+                              blueprint, created_at
+                ''', params)
+                exam = cur.fetchone()
+                if not exam:
+                    conn.rollback()
+                    return None
+                
+                params['new_exam_id'] = exam['id']
+                cur.execute(f'''
+                    INSERT INTO questions (exam_id, question_text, option_a, option_b, option_c, option_d, option_e,
+                                           correct_answer, topic, difficulty, minhash, lsh_bands)
+                    SELECT %(new_exam_id)s, question_text, option_a, option_b, option_c, option_d, option_e,
+                           correct_answer, topic, difficulty, minhash, lsh_bands
+                    FROM questions
+                    WHERE exam_id = %(exam_id)s {question_filter}
+                    ORDER BY id
+                    RETURNING id
+                ''', params)
+                new_question_ids = sorted(row['id'] for row in cur.fetchall())
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        statistics_cache.invalidate()
+        exam_schedule_cache.invalidate()
+        
+        result_dict = dict(exam)
+        result_dict['question_count'] = len(new_question_ids)
+        result_dict['question_ids'] = new_question_ids
+        return result_dict
+    
+    @staticmethod
+    def update_blueprint(exam_id, blueprint):
+        """Sınavın soru seçim planını kaydet (None: plan yok, havuzdan rastgele seçim)"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                UPDATE exams SET blueprint = %s
+                WHERE id = %s
+                RETURNING id, blueprint
+            ''', (psycopg2.extras.Json(blueprint) if blueprint is not None else None, exam_id))
+            result = cur.fetchone()
+            conn.commit()
+            return dict(result) if result else None
+    
+    @staticmethod
+    def get_with_owner(exam_id):
+        """Sınavı, dersin öğretim görevlisinin user_id'si (owner_user_id) ile birlikte tek sorguda getir"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                SELECT e.*, c.code as course_code, i.user_id as owner_user_id
                 FROM exams e
                 JOIN courses c ON e.course_id = c.id
+                LEFT JOIN instructors i ON c.instructor_id = i.id
                 WHERE e.id = %s
             ''', (exam_id,))
             result = cur.fetchone()
-            
-            if result:
-                result_dict = dict(result)
-                if result_dict.get('start_time'):
-                    result_dict['start_time'] = result_dict['start_time'].isoformat()
-                if result_dict.get('end_time'):
-                    result_dict['end_time'] = result_dict['end_time'].isoformat()
-                if result_dict.get('created_at'):
-                    result_dict['created_at'] = result_dict['created_at'].isoformat()
-                return result_dict
-            return None
+            return dict(result) if result else None
     
     @staticmethod
     def get_by_course(course_id):
-        """Dersin sınavlarını getir"""
+        """Dersin sınavlarını getir; is_available sınav penceresinin şu anda açık olup olmadığını gösterir"""
         with get_db_cursor() as (conn, cur):
             cur.execute('''
                 SELECT e.*, c.name as course_name, c.code as course_code,
-                       (SELECT COUNT(*) FROM questions WHERE exam_id = e.id) as question_count
+                       NOW() BETWEEN e.start_time AND e.end_time as is_available
                 FROM exams e
                 JOIN courses c ON e.course_id = c.id
                 WHERE e.course_id = %s
                 ORDER BY e.start_time
             ''', (course_id,))
-            results = cur.fetchall()
-            
-            exams = []
-            for result in results:
-                result_dict = dict(result)
-                if result_dict.get('start_time'):
-                    dt = result_dict['start_time']
-                    from datetime import timezone
-                    # If timezone-aware, convert to UTC
-                    if hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-                        dt = dt.astimezone(timezone.utc)
-                    elif hasattr(dt, 'tzinfo') and dt.tzinfo is None:
-                        # Naive datetime, assume UTC
-                        dt = dt.replace(tzinfo=timezone.utc)
-                    # Format with Z suffix for UTC
-                    if hasattr(dt, 'isoformat'):
-                        iso_str = dt.isoformat()
-                        # Replace +00:00 with Z for UTC
-                        if iso_str.endswith('+00:00'):
-                            iso_str = iso_str[:-6] + 'Z'
-                        elif not iso_str.endswith('Z') and dt.tzinfo == timezone.utc:
-                            iso_str = iso_str + 'Z'
-                        result_dict['start_time'] = iso_str
-                    else:
-                        result_dict['start_time'] = str(dt)
-                if result_dict.get('end_time'):
-                    dt = result_dict['end_time']
-                    from datetime import timezone
-                    # If timezone-aware, convert to UTC
-                    if hasattr(dt, 'tzinfo') and dt.tzinfo is not None:
-                        dt = dt.astimezone(timezone.utc)
-                    elif hasattr(dt, 'tzinfo') and dt.tzinfo is None:
-                        # Naive datetime, assume UTC
-                        dt = dt.replace(tzinfo=timezone.utc)
-                    # Format with Z suffix for UTC
-                    if hasattr(dt, 'isoformat'):
-                        iso_str = dt.isoformat()
-                        # Replace +00:00 with Z for UTC
-                        if iso_str.endswith('+00:00'):
-                            iso_str = iso_str[:-6] + 'Z'
-                        elif not iso_str.endswith('Z') and dt.tzinfo == timezone.utc:
-                            iso_str = iso_str + 'Z'
-                        result_dict['end_time'] = iso_str
-                    else:
-                        result_dict['end_time'] = str(dt)
-                if result_dict.get('created_at'):
-                    result_dict['created_at'] = result_dict['created_at'].isoformat()
-                exams.append(result_dict)
-            return exams
+            return [dict(result) for result in cur.fetchall()]
+    
+    @staticmethod
+    def get_score_stats_by_course(course_id):
+        """Dersin sınavlarını puan istatistikleriyle getir (ortalama, sayı, standart sapma, çeyrekler)"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                SELECT e.id as exam_id, e.exam_type, e.weight_percentage,
+                       COUNT(ea.id) as attempt_count,
+                       ROUND(AVG(ea.score)::numeric, 2)::float as average_score,
+                       ROUND(STDDEV_SAMP(ea.score)::numeric, 2)::float as stddev_score,
+                       MIN(ea.score) as min_score,
+                       MAX(ea.score) as max_score,
+                       percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY ea.score) as quartiles
+                FROM exams e
+                LEFT JOIN exam_attempts ea ON ea.exam_id = e.id AND ea.is_completed = TRUE
+                WHERE e.course_id = %s
+                GROUP BY e.id
+                ORDER BY e.start_time
+            ''', (course_id,))
+            results = []
+            for row in cur.fetchall():
+                result_dict = dict(row)
+                quartiles = result_dict.pop('quartiles') or [None, None, None]
+                for key, value in zip(('p25_score', 'median_score', 'p75_score'), quartiles):
+                    result_dict[key] = round(value, 2) if value is not None else None
+                results.append(result_dict)
+            return results
     
     @staticmethod
     def delete(exam_id):
@@ -879,6 +1502,9 @@ class Exam:
             cur.execute('DELETE FROM exams WHERE id = %s RETURNING id', (exam_id,))
             result = cur.fetchone()
             conn.commit()
+            statistics_cache.invalidate()
+            exam_schedule_cache.invalidate()
+            question_pool_cache.invalidate(exam_id)
             return result is not None
 
 
@@ -886,16 +1512,25 @@ class Question:
     """Question modeli"""
     
     @staticmethod
-    def create(exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer):
-        """Yeni soru oluştur"""
+    def create(exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer,
+               topic=None, difficulty=None):
+        """Yeni soru oluştur; sınavda aynı (normalize edilmiş) soru metni varsa None döner"""
         with get_db_cursor() as (conn, cur):
-            cur.execute('''
-                INSERT INTO questions (exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id, exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer, created_at
-            ''', (exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer))
+            minhash, lsh_bands = text_signature(normalize_question_text(question_text))
+            cur.execute(f'''
+                INSERT INTO questions (exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer,
+                                       topic, difficulty, minhash, lsh_bands)
+                SELECT * FROM (VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::bigint[], %s::bigint[]))
+                    AS {NEW_QUESTION_COLUMNS}
+                WHERE {QUESTION_NOT_DUPLICATE_SQL}
+                ON CONFLICT DO NOTHING
+                RETURNING id, exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer,
+                          topic, difficulty, created_at
+            ''', (exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer,
+                  topic, difficulty, minhash, lsh_bands))
             result = cur.fetchone()
             conn.commit()
+            question_pool_cache.invalidate(exam_id)
             
             if result:
                 result_dict = dict(result)
@@ -910,7 +1545,8 @@ class Question:
         with get_db_cursor() as (conn, cur):
             if include_answer:
                 cur.execute('''
-                    SELECT id, exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer
+                    SELECT id, exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer,
+                           topic, difficulty
                     FROM questions WHERE exam_id = %s
                     ORDER BY id
                 ''', (exam_id,))
@@ -933,29 +1569,163 @@ class Question:
             result = cur.fetchone()
             return dict(result) if result else None
     
+    @staticmethod
+    def get_by_ids(question_ids, include_answer=False):
+        """Verilen id'lerdeki soruları, id listesindeki sırayla getir"""
+        columns = 'id, exam_id, question_text, option_a, option_b, option_c, option_d, option_e'
+        if include_answer:
+            columns += ', correct_answer'
+        with get_db_cursor() as (conn, cur):
+            cur.execute(f'''
+                SELECT {columns}
+                FROM questions WHERE id = ANY(%s)
+            ''', (list(question_ids),))
+            by_id = {row['id']: dict(row) for row in cur.fetchall()}
+            return [by_id[question_id] for question_id in question_ids if question_id in by_id]
+    
+    @staticmethod
+    def get_tags_by_exam(exam_id):
+        """Sınavdaki soruların yalnızca id, konu ve zorluk bilgisini getir"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                SELECT id, topic, difficulty FROM questions
+                WHERE exam_id = %s
+                ORDER BY id
+            ''', (exam_id,))
+            return [dict(row) for row in cur.fetchall()]
+    
+    @staticmethod
+    def update_tags(question_id, topic, difficulty):
+        """Sorunun konu ve zorluk etiketlerini güncelle"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                UPDATE questions SET topic = %s, difficulty = %s
+                WHERE id = %s
+                RETURNING id, exam_id, topic, difficulty
+            ''', (topic, difficulty, question_id))
+            result = cur.fetchone()
+            conn.commit()
+            if result:
+                question_pool_cache.invalidate(result['exam_id'])
+            return dict(result) if result else None
+    
     @staticmethod
     def count_by_exam(exam_id):
         """Bir sınavdaki soru sayısını döndür"""
         with get_db_cursor() as (conn, cur):
             cur.execute('''
-                SELECT COUNT(*) as count
-                FROM questions WHERE exam_id = %s
+                SELECT question_count FROM exams WHERE id = %s
             ''', (exam_id,))
             result = cur.fetchone()
-            if result and 'count' in result:
-                return int(result['count'])
-            return 0
+            return result['question_count'] if result else 0
+    
+    @staticmethod
+    def text_digests(texts):
+        """Soru metinlerinin özetlerini questions.text_digest ile aynı ifadeyle, veritabanında hesapla (sırayla)"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute(f'''
+                SELECT {TEXT_DIGEST_SQL.format('t.text')} as digest
+                FROM unnest(%s::text[]) WITH ORDINALITY AS t(text, n)
+                ORDER BY t.n
+            ''', (list(texts),))
+            return [row['digest'] for row in cur.fetchall()]
     
     @staticmethod
-    def check_duplicate_question_text(exam_id, question_text):
-        """Aynı sınavda aynı soru metninin olup olmadığını kontrol et"""
+    def get_existing_digests(exam_id, digests):
+        """Verilen metin özetlerinden sınavda zaten bulunanları getir (indeks üzerinden)"""
         with get_db_cursor() as (conn, cur):
             cur.execute('''
-                SELECT id FROM questions 
-                WHERE exam_id = %s AND LOWER(TRIM(question_text)) = LOWER(TRIM(%s))
-            ''', (exam_id, question_text))
-            result = cur.fetchone()
-            return result is not None
+                SELECT text_digest FROM questions
+                WHERE exam_id = %s AND text_digest = ANY(%s)
+            ''', (exam_id, list(digests)))
+            return {row['text_digest'] for row in cur.fetchall()}
+    
+    @staticmethod
+    def bulk_create(exam_id, questions):
+        """Birden fazla soruyu tek bir çok satırlı INSERT ile ekle; sınavda zaten
+        bulunan (normalize edilmiş) soru metinleri atlanır, yalnızca eklenenler döner"""
+        with get_db_cursor() as (conn, cur):
+            values = []
+            for q in questions:
+                minhash, lsh_bands = text_signature(normalize_question_text(q['question_text']))
+                values.append((exam_id, q['question_text'], q['option_a'], q['option_b'], q['option_c'],
+                               q['option_d'], q['option_e'], q['correct_answer'], q.get('topic'), q.get('difficulty'),
+                               minhash, lsh_bands))
+            rows = psycopg2.extras.execute_values(cur, f'''
+                INSERT INTO questions (exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer,
+                                       topic, difficulty, minhash, lsh_bands)
+                SELECT * FROM (VALUES %s) AS {NEW_QUESTION_COLUMNS}
+                WHERE {QUESTION_NOT_DUPLICATE_SQL}
+                ON CONFLICT DO NOTHING
+                RETURNING id, exam_id, question_text, option_a, option_b, option_c, option_d, option_e, correct_answer,
+                          topic, difficulty
+            ''', values, template='(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::bigint[], %s::bigint[])',
+               page_size=max(len(questions), 1), fetch=True)
+            conn.commit()
+            question_pool_cache.invalidate(exam_id)
+            return [dict(row) for row in rows]
+    
+    @staticmethod
+    def backfill_signatures(exam_ids):
+        """İmzası olmayan (özellik eklenmeden önce oluşturulmuş) soruların MinHash imzalarını hesapla"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                SELECT id, question_text FROM questions
+                WHERE exam_id = ANY(%s) AND minhash IS NULL
+            ''', (list(exam_ids),))
+            rows = cur.fetchall()
+            if not rows:
+                return 0
+            values = [(row['id'], *text_signature(normalize_question_text(row['question_text']))) for row in rows]
+            psycopg2.extras.execute_values(cur, '''
+                UPDATE questions q SET minhash = v.minhash, lsh_bands = v.lsh_bands
+                FROM (VALUES %s) AS v(id, minhash, lsh_bands)
+                WHERE q.id = v.id
+            ''', values, template='(%s, %s::bigint[], %s::bigint[])')
+            conn.commit()
+            return len(rows)
+    
+    @staticmethod
+    def get_lsh_candidates(exam_ids):
+        """Aynı LSH bandına düşen soru gruplarını ve bu soruların imzalarını getir.
+        Sorular ikili karşılaştırılmaz; yalnızca ortak bant anahtarı olanlar aday olur"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                SELECT array_agg(q.id) as ids
+                FROM questions q, unnest(q.lsh_bands) AS band
+                WHERE q.exam_id = ANY(%s)
+                GROUP BY band
+                HAVING COUNT(*) > 1
+            ''', (list(exam_ids),))
+            buckets = [row['ids'] for row in cur.fetchall()]
+            
+            candidate_ids = sorted({question_id for bucket in buckets for question_id in bucket})
+            cur.execute('''
+                SELECT id, exam_id, question_text, minhash
+                FROM questions WHERE id = ANY(%s)
+            ''', (candidate_ids,))
+            questions = {row['id']: dict(row) for row in cur.fetchall()}
+            return buckets, questions
+    
+    @staticmethod
+    def find_similar(question_id, exam_ids, threshold):
+        """Bir soruyla en az bir LSH bandını paylaşan (GIN indeksi, &&) ve tahmini
+        benzerliği eşiğin üzerinde olan soruları getir"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                SELECT id, exam_id, question_text, similarity
+                FROM (
+                    SELECT other.id, other.exam_id, other.question_text,
+                           (SELECT COUNT(*) FROM unnest(q.minhash, other.minhash) AS m(a, b) WHERE a = b)::float
+                               / cardinality(q.minhash) as similarity
+                    FROM questions q
+                    JOIN questions other ON other.lsh_bands && q.lsh_bands AND other.id <> q.id
+                    WHERE q.id = %s AND other.exam_id = ANY(%s)
+                ) candidates
+                WHERE similarity >= %s
+                ORDER BY similarity DESC
+            ''', (question_id, list(exam_ids), threshold))
+            return [dict(row) for row in cur.fetchall()]
     
     @staticmethod
     def check_duplicate_options(option_a, option_b, option_c, option_d, option_e):
@@ -990,9 +1760,11 @@ class Question:
     def delete(question_id):
         """Soru sil"""
         with get_db_cursor() as (conn, cur):
-            cur.execute('DELETE FROM questions WHERE id = %s RETURNING id', (question_id,))
+            cur.execute('DELETE FROM questions WHERE id = %s RETURNING id, exam_id', (question_id,))
             result = cur.fetchone()
             conn.commit()
+            if result:
+                question_pool_cache.invalidate(result['exam_id'])
             return result is not None
 
 
@@ -1010,15 +1782,7 @@ class ExamAttempt:
             ''', (student_id, exam_id))
             result = cur.fetchone()
             conn.commit()
-            
-            if result:
-                result_dict = dict(result)
-                if result_dict.get('start_time'):
-                    result_dict['start_time'] = result_dict['start_time'].isoformat()
-                if result_dict.get('end_time'):
-                    result_dict['end_time'] = result_dict['end_time'].isoformat() if result_dict['end_time'] else None
-                return result_dict
-            return None
+            return dict(result) if result else None
     
     @staticmethod
     def get_by_id(attempt_id):
@@ -1029,15 +1793,7 @@ class ExamAttempt:
                 FROM exam_attempts WHERE id = %s
             ''', (attempt_id,))
             result = cur.fetchone()
-            
-            if result:
-                result_dict = dict(result)
-                if result_dict.get('start_time'):
-                    result_dict['start_time'] = result_dict['start_time'].isoformat()
-                if result_dict.get('end_time'):
-                    result_dict['end_time'] = result_dict['end_time'].isoformat() if result_dict['end_time'] else None
-                return result_dict
-            return None
+            return dict(result) if result else None
     
     @staticmethod
     def get_by_student_and_exam(student_id, exam_id):
@@ -1048,15 +1804,7 @@ class ExamAttempt:
                 FROM exam_attempts WHERE student_id = %s AND exam_id = %s
             ''', (student_id, exam_id))
             result = cur.fetchone()
-            
-            if result:
-                result_dict = dict(result)
-                if result_dict.get('start_time'):
-                    result_dict['start_time'] = result_dict['start_time'].isoformat()
-                if result_dict.get('end_time'):
-                    result_dict['end_time'] = result_dict['end_time'].isoformat() if result_dict['end_time'] else None
-                return result_dict
-            return None
+            return dict(result) if result else None
     
     @staticmethod
     def get_by_exam(exam_id):
@@ -1068,17 +1816,22 @@ class ExamAttempt:
                 WHERE ea.exam_id = %s AND ea.is_completed = TRUE
                 ORDER BY ea.end_time DESC
             ''', (exam_id,))
-            results = cur.fetchall()
-            
-            attempts = []
-            for result in results:
-                result_dict = dict(result)
-                if result_dict.get('start_time'):
-                    result_dict['start_time'] = result_dict['start_time'].isoformat()
-                if result_dict.get('end_time'):
-                    result_dict['end_time'] = result_dict['end_time'].isoformat() if result_dict['end_time'] else None
-                attempts.append(result_dict)
-            return attempts
+            return [dict(result) for result in cur.fetchall()]
+    
+    @staticmethod
+    def iter_results(exam_id):
+        """Sınavın tamamlanmış denemelerini öğrenci bilgileriyle tek sorguda, satır satır döndür"""
+        rows = iter_query('''
+            SELECT s.id as student_id, u.full_name as student_name, s.student_number,
+                   ea.score, ea.start_time, ea.end_time
+            FROM exam_attempts ea
+            JOIN students s ON ea.student_id = s.id
+            JOIN users u ON s.user_id = u.id
+            WHERE ea.exam_id = %s AND ea.is_completed = TRUE
+            ORDER BY ea.end_time DESC
+        ''', (exam_id,))
+        for row in rows:
+            yield dict(row)
     
     @staticmethod
     def update(attempt_id, end_time, score, is_completed):
@@ -1092,15 +1845,8 @@ class ExamAttempt:
             ''', (end_time, score, is_completed, attempt_id))
             result = cur.fetchone()
             conn.commit()
-            
-            if result:
-                result_dict = dict(result)
-                if result_dict.get('start_time'):
-                    result_dict['start_time'] = result_dict['start_time'].isoformat()
-                if result_dict.get('end_time'):
-                    result_dict['end_time'] = result_dict['end_time'].isoformat() if result_dict['end_time'] else None
-                return result_dict
-            return None
+            statistics_cache.invalidate()
+            return dict(result) if result else None
 
 
 class Answer:
@@ -1138,3 +1884,58 @@ class Answer:
             ''', (attempt_id,))
             return [dict(row) for row in cur.fetchall()]
 
+
+class SimilarityFlag:
+    """Cevap benzerliği bulgusu modeli"""
+    
+    @staticmethod
+    def replace_for_exam(exam_id, flags):
+        """Sınavın önceki bulgularını silip yenilerini tek transaction içinde kaydet"""
+        with get_db_cursor() as (conn, cur):
+            try:
+                cur.execute('DELETE FROM answer_similarity_flags WHERE exam_id = %s', (exam_id,))
+                if flags:
+                    psycopg2.extras.execute_values(cur, '''
+                        INSERT INTO answer_similarity_flags
+                            (exam_id, attempt_a_id, attempt_b_id, shared_questions,
+                             identical_answers, identical_wrong, expected_identical_wrong, p_value)
+                        VALUES %s
+                    ''', [
+                        (exam_id, f['attempt_a_id'], f['attempt_b_id'], f['shared_questions'],
+                         f['identical_answers'], f['identical_wrong'], f['expected_identical_wrong'], f['p_value'])
+                        for f in flags
+                    ])
+                conn.commit()
+                return len(flags)
+            except Exception:
+                conn.rollback()
+                raise
+    
+    @staticmethod
+    def get_by_exam(exam_id):
+        """Sınavın bulgularını öğrenci bilgileriyle, en şüpheliden başlayarak getir"""
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                SELECT f.id, f.exam_id, f.shared_questions, f.identical_answers, f.identical_wrong,
+                       f.expected_identical_wrong, f.p_value, f.created_at,
+                       f.attempt_a_id, sa.id as student_a_id, sa.student_number as student_a_number,
+                       ua.full_name as student_a_name,
+                       f.attempt_b_id, sb.id as student_b_id, sb.student_number as student_b_number,
+                       ub.full_name as student_b_name
+                FROM answer_similarity_flags f
+                JOIN exam_attempts ea ON f.attempt_a_id = ea.id
+                JOIN students sa ON ea.student_id = sa.id
+                JOIN users ua ON sa.user_id = ua.id
+                JOIN exam_attempts eb ON f.attempt_b_id = eb.id
+                JOIN students sb ON eb.student_id = sb.id
+                JOIN users ub ON sb.user_id = ub.id
+                WHERE f.exam_id = %s
+                ORDER BY f.p_value, f.identical_wrong DESC
+            ''', (exam_id,))
+            results = []
+            for row in cur.fetchall():
+                result_dict = dict(row)
+                if result_dict.get('created_at'):
+                    result_dict['created_at'] = result_dict['created_at'].isoformat()
+                results.append(result_dict)
+            return results
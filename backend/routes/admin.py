@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models import User, Student, Instructor, DepartmentHead, Course, Enrollment
 from utils.auth import require_role
+from utils.streaming import json_stream_response
+from config import Config
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -257,9 +259,11 @@ def delete_course(course_id):
 @admin_bp.route('/enrollments', methods=['GET'])
 @require_role('admin')
 def get_enrollments():
-    """Get all enrollments"""
-    enrollments = Enrollment.get_all()
-    return jsonify(enrollments), 200
+    """Get all enrollments (streamed)"""
+    try:
+        return json_stream_response(Enrollment.iter_all())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/students/<int:student_id>/courses', methods=['GET'])
 @require_role('admin')
@@ -319,10 +323,26 @@ def delete_enrollment(enrollment_id):
 @admin_bp.route('/users', methods=['GET'])
 @require_role('admin')
 def get_users():
-    """Get all users"""
+    """Get all users (streamed)"""
+    try:
+        return json_stream_response(User.iter_all())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/search', methods=['GET'])
+@require_role('admin')
+def search_users():
+    """Search users by full name, username or student number"""
+    query = request.args.get('q', '').strip()
+    if len(query) < Config.SEARCH_MIN_QUERY_LENGTH:
+        return jsonify({'error': f'Query must be at least {Config.SEARCH_MIN_QUERY_LENGTH} characters'}), 400
+    
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, Config.SEARCH_MAX_RESULTS))
+    
     try:
-        users = User.get_all()
-        return jsonify(users), 200
+        results = User.search(query, limit=limit)
+        return jsonify(results), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1,11 +1,48 @@
 from flask import Blueprint, request, jsonify
-from models import Instructor, Course, Exam, Question, ExamAttempt, Enrollment, Student
+from models import Instructor, Course, Exam, Question, ExamAttempt, SimilarityFlag, utc_isoformat
 from utils.auth import require_role
-from utils.exam_helpers import get_exam_average, calculate_course_grade, is_exam_available
-from datetime import datetime
+from utils.exam_helpers import get_exam_average, parse_utc_datetime
+from utils.gradebook import Gradebook
+from utils.item_analysis import get_item_analysis
+from utils.collusion import screen_exam
+from utils.streaming import csv_stream_response
+from utils.minhash import near_duplicate_clusters
+from utils.question_pool import DIFFICULTIES, QuestionPoolIndex, validate_blueprint
+from utils.question_import import ImportFormatError, parse_csv, parse_gift, parse_json, row_digests, validate_questions
+from config import Config
+from werkzeug.utils import secure_filename
+from datetime import datetime, timezone
+import json
 
 instructor_bp = Blueprint('instructor', __name__)
 
+def near_duplicate_report(exam_ids):
+    """Near-duplicate question clusters among the given exams' questions"""
+    Question.backfill_signatures(exam_ids)
+    buckets, questions = Question.get_lsh_candidates(exam_ids)
+    clusters, pairs = near_duplicate_clusters(
+        buckets,
+        {question_id: question['minhash'] for question_id, question in questions.items()},
+        Config.NEAR_DUPLICATE_THRESHOLD
+    )
+    
+    report = []
+    for members in clusters:
+        similarities = [similarity for (a, b), similarity in pairs.items() if a in members]
+        report.append({
+            'max_similarity': round(max(similarities), 3),
+            'questions': [
+                {
+                    'id': question_id,
+                    'exam_id': questions[question_id]['exam_id'],
+                    'question_text': questions[question_id]['question_text']
+                }
+                for question_id in members
+            ]
+        })
+    report.sort(key=lambda cluster: (-cluster['max_similarity'], cluster['questions'][0]['id']))
+    return report
+
 @instructor_bp.route('/courses', methods=['GET'])
 @require_role('instructor')
 def get_courses():
@@ -29,18 +66,17 @@ def get_course_students(course_id):
     if not course or course['instructor_id'] != instructor['id']:
         return jsonify({'error': 'Course not found or access denied'}), 403
     
-    enrollments = Enrollment.get_by_course(course_id)
+    gradebook = Gradebook.load(course_id)
     students = []
     
-    for enrollment in enrollments:
-        # Add course grade
-        course_grade = calculate_course_grade(enrollment['student_id'], course_id)
-        
+    for row in gradebook.rows():
         students.append({
-            'id': enrollment['student_id'],
-            'student_number': enrollment['student_number'],
-            'full_name': enrollment['student_name'],
-            'course_grade': course_grade
+            'id': row['student_id'],
+            'student_number': row['student_number'],
+            'full_name': row['full_name'],
+            'course_grade': row['grade'],
+            'projected_grade': row['projected_grade'],
+            'rank': row['rank']
         })
     
     return jsonify(students), 200
@@ -63,42 +99,9 @@ def create_exam():
         return jsonify({'error': 'Course not found or access denied'}), 403
     
     try:
-        # Parse datetime strings from frontend (now in ISO format with timezone)
-        from datetime import timezone
-        
-        # Frontend'den artık ISO formatında UTC datetime geliyor
-        start_time_str = data['start_time']
-        end_time_str = data['end_time']
-        
-        # Parse ISO format datetime strings
-        if start_time_str.endswith('Z'):
-            start_time = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
-        elif '+' in start_time_str or start_time_str.count('-') > 2:
-            start_time = datetime.fromisoformat(start_time_str)
-        else:
-            # No timezone, assume UTC
-            start_time = datetime.fromisoformat(start_time_str)
-            start_time = start_time.replace(tzinfo=timezone.utc)
-        
-        if end_time_str.endswith('Z'):
-            end_time = datetime.fromisoformat(end_time_str.replace('Z', '+00:00'))
-        elif '+' in end_time_str or end_time_str.count('-') > 2:
-            end_time = datetime.fromisoformat(end_time_str)
-        else:
-            # No timezone, assume UTC
-            end_time = datetime.fromisoformat(end_time_str)
-            end_time = end_time.replace(tzinfo=timezone.utc)
-        
-        # Ensure both are timezone-aware UTC
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=timezone.utc)
-        else:
-            start_time = start_time.astimezone(timezone.utc)
-        
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-        else:
-            end_time = end_time.astimezone(timezone.utc)
+        # Frontend'den ISO formatında UTC datetime geliyor
+        start_time = parse_utc_datetime(data['start_time'])
+        end_time = parse_utc_datetime(data['end_time'])
         
         exam = Exam.create(
             course_id=data['course_id'],
@@ -116,6 +119,53 @@ def create_exam():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@instructor_bp.route('/exams/<int:exam_id>/clone', methods=['POST'])
+@require_role('instructor')
+def clone_exam(exam_id):
+    """Copy an exam and its questions (or a subset of them) to a course with new times"""
+    data = request.get_json() or {}
+    
+    required_fields = ['course_id', 'start_time', 'end_time']
+    if not all(field in data for field in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+    
+    exam = Exam.get_with_owner(exam_id)
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    # Both the source exam and the target course must belong to the instructor
+    instructor = Instructor.get_by_user_id(request.user_id)
+    course = Course.get_by_id(data['course_id'])
+    
+    if exam['owner_user_id'] != request.user_id or not course or course['instructor_id'] != instructor['id']:
+        return jsonify({'error': 'Course not found or access denied'}), 403
+    
+    question_ids = data.get('question_ids')
+    if question_ids is not None:
+        if not isinstance(question_ids, list) or not all(isinstance(q, int) for q in question_ids):
+            return jsonify({'error': 'question_ids must be a list of question ids'}), 400
+    
+    try:
+        start_time = parse_utc_datetime(data['start_time'])
+        end_time = parse_utc_datetime(data['end_time'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid start_time or end_time'}), 400
+    
+    if end_time <= start_time:
+        return jsonify({'error': 'end_time must be after start_time'}), 400
+    
+    try:
+        clone = Exam.clone(exam_id, course['id'], start_time, end_time, question_ids)
+        if not clone:
+            return jsonify({'error': 'Failed to clone exam'}), 500
+        
+        if question_ids is not None and len(clone['question_ids']) < len(set(question_ids)):
+            clone['warning'] = 'Some question_ids do not belong to the source exam and were skipped'
+        
+        return jsonify(clone), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @instructor_bp.route('/courses/<int:course_id>/exams', methods=['GET'])
 @require_role('instructor')
 def get_course_exams(course_id):
@@ -185,11 +235,9 @@ def create_question():
     if data['correct_answer'].upper() not in ['A', 'B', 'C', 'D', 'E']:
         return jsonify({'error': 'Correct answer must be A, B, C, D, or E'}), 400
     
-    # Check for duplicate question text in the same exam
-    if Question.check_duplicate_question_text(data['exam_id'], data['question_text']):
-        return jsonify({
-            'error': 'Bu sınavda aynı soru metni zaten mevcut. Lütfen farklı bir soru yazın.'
-        }), 400
+    # Optional pool tags used by exam blueprints
+    if data.get('difficulty') is not None and data['difficulty'] not in DIFFICULTIES:
+        return jsonify({'error': f'Difficulty must be one of {", ".join(DIFFICULTIES)}'}), 400
     
     # Check for duplicate options in the same question
     has_duplicate, duplicate_message = Question.check_duplicate_options(
@@ -200,18 +248,8 @@ def create_question():
         return jsonify({'error': duplicate_message}), 400
     
     # Check if exam has started - if so, don't allow modifications
-    now = datetime.utcnow()
     start_time = exam['start_time']
-    end_time = exam['end_time']
-    
-    # Parse datetime strings if needed
-    if isinstance(start_time, str):
-        start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-    if isinstance(end_time, str):
-        end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-    
-    # Check if exam has started (start_time has passed)
-    if now >= start_time:
+    if datetime.now(timezone.utc) >= start_time:
         return jsonify({
             'error': f'Sınav başladıktan sonra soru eklenemez veya silinemez. Sınav başlangıç zamanı: {start_time.strftime("%Y-%m-%d %H:%M")}'
         }), 400
@@ -225,16 +263,103 @@ def create_question():
             option_c=data['option_c'],
             option_d=data['option_d'],
             option_e=data['option_e'],
-            correct_answer=data['correct_answer'].upper()
+            correct_answer=data['correct_answer'].upper(),
+            topic=(data.get('topic') or '').strip() or None,
+            difficulty=data.get('difficulty')
         )
         
+        # The unique (exam_id, text_digest) index rejects duplicate question texts
         if not question:
-            return jsonify({'error': 'Failed to create question'}), 500
+            return jsonify({
+                'error': 'Bu sınavda aynı soru metni zaten mevcut. Lütfen farklı bir soru yazın.'
+            }), 400
+        
+        # Warn about near-duplicates already in the exam (LSH band overlap, then signature check)
+        question['near_duplicates'] = [
+            {'id': other['id'], 'question_text': other['question_text'], 'similarity': other['similarity']}
+            for other in Question.find_similar(question['id'], [question['exam_id']], Config.NEAR_DUPLICATE_THRESHOLD)
+        ]
         
         return jsonify(question), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@instructor_bp.route('/exams/<int:exam_id>/questions/bulk', methods=['POST'])
+@require_role('instructor')
+def bulk_import_questions(exam_id):
+    """Import many questions at once from JSON, CSV or GIFT-like text.
+    
+    The content is a JSON body, an uploaded file or a raw text body; the format
+    comes from ?format=json|csv|gift, the file extension or the content type.
+    Every row is validated before anything is written. If any row is invalid
+    nothing is inserted, unless ?skip_invalid=true.
+    """
+    exam = Exam.get_with_owner(exam_id)
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    if exam['owner_user_id'] != request.user_id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    # Check if exam has started - if so, don't allow modifications
+    if datetime.now(timezone.utc) >= exam['start_time']:
+        return jsonify({
+            'error': f'Sınav başladıktan sonra soru eklenemez veya silinemez. Sınav başlangıç zamanı: {exam["start_time"].strftime("%Y-%m-%d %H:%M")}'
+        }), 400
+    
+    upload = request.files.get('file')
+    import_format = request.args.get('format')
+    if not import_format:
+        if request.is_json:
+            import_format = 'json'
+        elif upload and upload.filename:
+            extension = upload.filename.rsplit('.', 1)[-1].lower()
+            import_format = {'json': 'json', 'csv': 'csv'}.get(extension, 'gift')
+        else:
+            import_format = 'csv' if request.mimetype == 'text/csv' else 'gift'
+    if import_format not in ('json', 'csv', 'gift'):
+        return jsonify({'error': 'format must be json, csv or gift'}), 400
+    
+    try:
+        if request.is_json:
+            rows = parse_json(request.get_json())
+        else:
+            raw = upload.read() if upload else request.get_data()
+            text = raw.decode('utf-8-sig')
+            if import_format == 'json':
+                rows = parse_json(json.loads(text))
+            elif import_format == 'csv':
+                rows = parse_csv(text)
+            else:
+                rows = parse_gift(text)
+    except (ImportFormatError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not rows:
+        return jsonify({'error': 'No questions to import'}), 400
+    if len(rows) > Config.QUESTION_IMPORT_MAX_ROWS:
+        return jsonify({'error': f'At most {Config.QUESTION_IMPORT_MAX_ROWS} questions can be imported at once'}), 400
+    
+    try:
+        digests = row_digests(rows)
+        existing = Question.get_existing_digests(exam_id, set(digests.values()))
+        valid, errors = validate_questions(rows, digests, existing)
+        skip_invalid = request.args.get('skip_invalid', 'false').lower() == 'true'
+        
+        if errors and not skip_invalid:
+            return jsonify({'created': 0, 'errors': errors}), 400
+        
+        created = Question.bulk_create(exam_id, valid) if valid else []
+        return jsonify({
+            'created': len(created),
+            'questions': created,
+            'errors': errors,
+            # Rows added to the exam concurrently are skipped by ON CONFLICT
+            'skipped_duplicates': len(valid) - len(created)
+        }), 201 if created else 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @instructor_bp.route('/exams/<int:exam_id>/questions', methods=['GET'])
 @require_role('instructor')
 def get_exam_questions(exam_id):
@@ -253,6 +378,95 @@ def get_exam_questions(exam_id):
     questions = Question.get_by_exam(exam_id, include_answer=True)
     return jsonify(questions), 200
 
+@instructor_bp.route('/exams/<int:exam_id>/near-duplicates', methods=['GET'])
+@require_role('instructor')
+def get_exam_near_duplicates(exam_id):
+    """Clusters of near-duplicate questions within an exam"""
+    exam = Exam.get_with_owner(exam_id)
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    if exam['owner_user_id'] != request.user_id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        return jsonify(near_duplicate_report([exam_id])), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@instructor_bp.route('/courses/<int:course_id>/near-duplicates', methods=['GET'])
+@require_role('instructor')
+def get_course_near_duplicates(course_id):
+    """Clusters of near-duplicate questions across all exams of a course"""
+    # Verify instructor owns this course
+    instructor = Instructor.get_by_user_id(request.user_id)
+    course = Course.get_by_id(course_id)
+    
+    if not course or course['instructor_id'] != instructor['id']:
+        return jsonify({'error': 'Course not found or access denied'}), 403
+    
+    try:
+        exam_ids = [exam['id'] for exam in Exam.get_by_course(course_id)]
+        return jsonify(near_duplicate_report(exam_ids)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@instructor_bp.route('/questions/<int:question_id>/tags', methods=['PUT'])
+@require_role('instructor')
+def update_question_tags(question_id):
+    """Set the topic and difficulty tags of a question"""
+    data = request.get_json() or {}
+    
+    question = Question.get_by_id(question_id)
+    if not question:
+        return jsonify({'error': 'Question not found'}), 404
+    
+    exam = Exam.get_with_owner(question['exam_id'])
+    if not exam or exam['owner_user_id'] != request.user_id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    topic = data.get('topic')
+    if topic is not None and not isinstance(topic, str):
+        return jsonify({'error': 'Topic must be a string'}), 400
+    if data.get('difficulty') is not None and data['difficulty'] not in DIFFICULTIES:
+        return jsonify({'error': f'Difficulty must be one of {", ".join(DIFFICULTIES)}'}), 400
+    
+    try:
+        updated = Question.update_tags(question_id, (topic or '').strip() or None, data.get('difficulty'))
+        return jsonify(updated), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@instructor_bp.route('/exams/<int:exam_id>/blueprint', methods=['PUT'])
+@require_role('instructor')
+def update_exam_blueprint(exam_id):
+    """Set how an attempt's questions are drawn from the pool, e.g.
+    [{"topic": "algebra", "difficulty": "easy", "count": 2}, {"difficulty": "hard", "count": 3}];
+    a null blueprint restores plain random selection"""
+    data = request.get_json() or {}
+    
+    exam = Exam.get_with_owner(exam_id)
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    if exam['owner_user_id'] != request.user_id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    blueprint = data.get('blueprint')
+    if blueprint is not None:
+        error = validate_blueprint(blueprint, QuestionPoolIndex.for_exam(exam_id))
+        if error:
+            return jsonify({'error': error}), 400
+        blueprint = [
+            {'topic': entry.get('topic'), 'difficulty': entry.get('difficulty'), 'count': entry['count']}
+            for entry in blueprint
+        ]
+    
+    try:
+        return jsonify(Exam.update_blueprint(exam_id, blueprint)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @instructor_bp.route('/questions/<int:question_id>', methods=['DELETE'])
 @require_role('instructor')
 def delete_question(question_id):
@@ -276,18 +490,8 @@ def delete_question(question_id):
             return jsonify({'error': 'Access denied'}), 403
         
         # Check if exam has started - if so, don't allow modifications
-        now = datetime.utcnow()
         start_time = exam['start_time']
-        end_time = exam['end_time']
-        
-        # Parse datetime strings if needed
-        if isinstance(start_time, str):
-            start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-        if isinstance(end_time, str):
-            end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-        
-        # Check if exam has started (start_time has passed)
-        if now >= start_time:
+        if datetime.now(timezone.utc) >= start_time:
             return jsonify({
                 'error': f'Sınav başladıktan sonra soru eklenemez veya silinemez. Sınav başlangıç zamanı: {start_time.strftime("%Y-%m-%d %H:%M")}'
             }), 400
@@ -323,20 +527,8 @@ def get_exam_results(exam_id):
     if not course or course['instructor_id'] != instructor['id']:
         return jsonify({'error': 'Access denied'}), 403
     
-    # Get all completed attempts
-    attempts = ExamAttempt.get_by_exam(exam_id)
-    
-    results = []
-    for attempt in attempts:
-        student = Student.get_by_id(attempt['student_id'])
-        results.append({
-            'student_id': student['id'],
-            'student_name': student['full_name'],
-            'student_number': student['student_number'],
-            'score': attempt['score'],
-            'start_time': attempt['start_time'],
-            'end_time': attempt['end_time']
-        })
+    # Get all completed attempts with their students
+    results = list(ExamAttempt.iter_results(exam_id))
     
     # Calculate average
     average = get_exam_average(exam_id)
@@ -347,3 +539,121 @@ def get_exam_results(exam_id):
         'average': average,
         'total_attempts': len(results)
     }), 200
+
+@instructor_bp.route('/exams/<int:exam_id>/results/export', methods=['GET'])
+@require_role('instructor')
+def export_exam_results(exam_id):
+    """Download the results of an exam as CSV"""
+    exam = Exam.get_by_id(exam_id)
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    # Verify instructor owns this exam
+    instructor = Instructor.get_by_user_id(request.user_id)
+    course = Course.get_by_id(exam['course_id'])
+    
+    if not course or course['instructor_id'] != instructor['id']:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        rows = (
+            (row['student_number'], row['student_name'], row['score'],
+             utc_isoformat(row['start_time']), utc_isoformat(row['end_time']))
+            for row in ExamAttempt.iter_results(exam_id)
+        )
+        return csv_stream_response(
+            ['student_number', 'full_name', 'score', 'start_time', 'end_time'],
+            rows,
+            secure_filename(f"{course['code']}_{exam['exam_type']}_results.csv")
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@instructor_bp.route('/courses/<int:course_id>/gradebook/export', methods=['GET'])
+@require_role('instructor')
+def export_course_gradebook(course_id):
+    """Download a course gradebook (one column per exam plus the course grade) as CSV"""
+    # Verify instructor owns this course
+    instructor = Instructor.get_by_user_id(request.user_id)
+    course = Course.get_by_id(course_id)
+    
+    if not course or course['instructor_id'] != instructor['id']:
+        return jsonify({'error': 'Course not found or access denied'}), 403
+    
+    try:
+        exams = Exam.get_by_course(course_id)
+        exam_keys = [str(exam['id']) for exam in exams]
+        header = ['student_number', 'full_name']
+        header += [f"{exam['exam_type']} ({exam['weight_percentage']}%)" for exam in exams]
+        header.append('course_grade')
+        
+        rows = (
+            [row['student_number'], row['full_name']]
+            + [row['exam_scores'].get(key) for key in exam_keys]
+            + [row['grade']]
+            for row in Course.iter_gradebook(course_id)
+        )
+        return csv_stream_response(header, rows, secure_filename(f"{course['code']}_gradebook.csv"))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@instructor_bp.route('/exams/<int:exam_id>/item-analysis', methods=['GET'])
+@require_role('instructor')
+def get_exam_item_analysis(exam_id):
+    """Per-question difficulty (p-value), discrimination and option distribution"""
+    exam = Exam.get_by_id(exam_id)
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    # Verify instructor owns this exam
+    instructor = Instructor.get_by_user_id(request.user_id)
+    course = Course.get_by_id(exam['course_id'])
+    
+    if not course or course['instructor_id'] != instructor['id']:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        return jsonify(get_item_analysis(exam_id)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@instructor_bp.route('/exams/<int:exam_id>/similarity-flags', methods=['GET'])
+@require_role('instructor')
+def get_similarity_flags(exam_id):
+    """Attempt pairs flagged by the last collusion screening of an exam"""
+    exam = Exam.get_by_id(exam_id)
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    # Verify instructor owns this exam
+    instructor = Instructor.get_by_user_id(request.user_id)
+    course = Course.get_by_id(exam['course_id'])
+    
+    if not course or course['instructor_id'] != instructor['id']:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        return jsonify(SimilarityFlag.get_by_exam(exam_id)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@instructor_bp.route('/exams/<int:exam_id>/similarity-flags', methods=['POST'])
+@require_role('instructor')
+def run_similarity_screening(exam_id):
+    """Re-run collusion screening for an exam and return the new flags"""
+    exam = Exam.get_by_id(exam_id)
+    if not exam:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    # Verify instructor owns this exam
+    instructor = Instructor.get_by_user_id(request.user_id)
+    course = Course.get_by_id(exam['course_id'])
+    
+    if not course or course['instructor_id'] != instructor['id']:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    try:
+        screen_exam(exam_id)
+        return jsonify(SimilarityFlag.get_by_exam(exam_id)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -4,11 +4,11 @@ from utils.auth import require_role
 from utils.exam_helpers import (
     calculate_score, 
     get_exam_average, 
-    is_exam_available,
-    has_student_attempted,
-    calculate_course_grade
+    has_student_attempted
 )
-from datetime import datetime
+from utils.gradebook import load_student_grades
+from utils.exam_schedule import exam_schedule, parse_schedule_args
+from datetime import datetime, timezone
 
 student_bp = Blueprint('student', __name__)
 
@@ -22,6 +22,7 @@ def get_courses():
         return jsonify({'error': 'Student not found'}), 404
     
     enrollments = Enrollment.get_by_student(student['id'])
+    grades = load_student_grades(student['id'])
     courses = []
     
     for enrollment in enrollments:
@@ -29,13 +30,10 @@ def get_courses():
             'id': enrollment['course_id'],
             'code': enrollment['course_code'],
             'name': enrollment['course_name'],
-            'instructor_name': enrollment.get('instructor_name', '')
+            'instructor_name': enrollment.get('instructor_name', ''),
+            'course_grade': grades.get(enrollment['course_id'])
         }
         
-        # Add course grade
-        course_grade = calculate_course_grade(student['id'], enrollment['course_id'])
-        course_data['course_grade'] = course_grade
-        
         courses.append(course_data)
     
     return jsonify(courses), 200
@@ -70,9 +68,8 @@ def get_course_exams(course_id):
                 # Check if student has attempted
                 attempt = ExamAttempt.get_by_student_and_exam(student['id'], exam['id'])
                 
+                # is_available comes from the query (NOW() BETWEEN start_time AND end_time)
                 exam['has_attempted'] = attempt is not None
-                # Calculate availability - make sure we use the exam dict with string times
-                exam['is_available'] = is_exam_available(exam)
                 
                 if attempt:
                     # Check if there are answers for this attempt
@@ -95,19 +92,11 @@ def get_course_exams(course_id):
                         
                         if answer_count > 0 and not is_completed:
                             from utils.exam_helpers import calculate_score
-                            from datetime import datetime, timezone
                             
                             score = calculate_score(attempt['id'])
                             
                             if score is not None:
-                                end_time = attempt.get('end_time')
-                                if isinstance(end_time, str):
-                                    try:
-                                        end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                                    except:
-                                        end_time = datetime.now(timezone.utc)
-                                elif end_time is None:
-                                    end_time = datetime.now(timezone.utc)
+                                end_time = attempt.get('end_time') or datetime.now(timezone.utc)
                                 
                                 updated = ExamAttempt.update(
                                     attempt_id=attempt['id'],
@@ -125,15 +114,7 @@ def get_course_exams(course_id):
                             
                             if score is not None:
                                 # Update the attempt with the calculated score
-                                from datetime import datetime, timezone
-                                end_time = attempt.get('end_time')
-                                if isinstance(end_time, str):
-                                    try:
-                                        end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                                    except:
-                                        end_time = datetime.now(timezone.utc)
-                                elif end_time is None:
-                                    end_time = datetime.now(timezone.utc)
+                                end_time = attempt.get('end_time') or datetime.now(timezone.utc)
                                 
                                 updated = ExamAttempt.update(
                                     attempt_id=attempt['id'],
@@ -159,6 +140,32 @@ def get_course_exams(course_id):
     except Exception as e:
         return jsonify({'error': f'Sınavlar yüklenirken hata oluştu: {str(e)}'}), 500
 
+@student_bp.route('/exams/schedule', methods=['GET'])
+@require_role('student')
+def get_exam_schedule():
+    """Exams of the student's courses that are open now or open within ?horizon minutes (default 60).
+    
+    ?at=ISO datetime looks at another moment instead of now. Like the course
+    exam list, exams with fewer than 5 questions are left out.
+    """
+    student = Student.get_by_user_id(request.user_id)
+    if not student:
+        return jsonify({'error': 'Student not found'}), 404
+    
+    try:
+        at, horizon = parse_schedule_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        course_ids = {enrollment['course_id'] for enrollment in Enrollment.get_by_student(student['id'])}
+        schedule = exam_schedule(at, horizon, course_ids)
+        for key in ('open', 'upcoming'):
+            schedule[key] = [exam for exam in schedule[key] if (exam.get('question_count') or 0) >= 5]
+        return jsonify(schedule), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @student_bp.route('/exam/<int:exam_id>/start', methods=['POST'])
 @require_role('student')
 def start_exam(exam_id):
@@ -180,35 +187,11 @@ def start_exam(exam_id):
     if exam['course_id'] not in enrolled_course_ids:
         return jsonify({'error': 'Not enrolled in this course'}), 403
     
-    # Check if exam is available (between start_time and end_time)
-    now = datetime.utcnow()
+    # Check if exam is available (between start_time and end_time, both timezone-aware)
+    now = datetime.now(timezone.utc)
     start_time = exam['start_time']
     end_time = exam['end_time']
     
-    # Parse datetime strings if needed
-    if isinstance(start_time, str):
-        if start_time.endswith('Z'):
-            start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-        else:
-            start_time = datetime.fromisoformat(start_time)
-            if start_time.tzinfo is None:
-                from datetime import timezone
-                start_time = start_time.replace(tzinfo=timezone.utc)
-    
-    if isinstance(end_time, str):
-        if end_time.endswith('Z'):
-            end_time = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-        else:
-            end_time = datetime.fromisoformat(end_time)
-            if end_time.tzinfo is None:
-                from datetime import timezone
-                end_time = end_time.replace(tzinfo=timezone.utc)
-    
-    # Make now timezone-aware if needed
-    if now.tzinfo is None:
-        from datetime import timezone
-        now = now.replace(tzinfo=timezone.utc)
-    
     if now < start_time:
         return jsonify({
             'error': f'Sınav henüz başlamadı. Başlangıç zamanı: {start_time.strftime("%Y-%m-%d %H:%M")}'
@@ -231,7 +214,7 @@ def start_exam(exam_id):
     
     # Get 5 random questions from the question pool
     from utils.exam_helpers import get_random_questions
-    questions = get_random_questions(exam_id, count=5)
+    questions = get_random_questions(exam_id, count=5, blueprint=exam.get('blueprint'), question_count=question_count)
     
     try:
         # If there's an incomplete attempt, use it; otherwise create a new one
@@ -309,7 +292,7 @@ def submit_exam(exam_id):
         # Update attempt
         updated_attempt = ExamAttempt.update(
             attempt_id=attempt['id'],
-            end_time=datetime.utcnow(),
+            end_time=datetime.now(timezone.utc),
             score=score,
             is_completed=True
         )
@@ -347,10 +330,6 @@ def get_exam_result(exam_id):
         return jsonify({'error': 'No completed exam attempt found'}), 404
     
     attempt = dict(attempt_result)
-    if attempt.get('start_time'):
-        attempt['start_time'] = attempt['start_time'].isoformat()
-    if attempt.get('end_time'):
-        attempt['end_time'] = attempt['end_time'].isoformat() if attempt['end_time'] else None
     
     # Get exam average
     exam_average = get_exam_average(exam_id)
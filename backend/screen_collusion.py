@@ -0,0 +1,36 @@
+"""
+Tamamlanmış sınav denemelerinde kopya taraması: aynı yanlış cevapları
+beklenenden çok daha fazla paylaşan deneme çiftlerini işaretle
+Kullanım: python screen_collusion.py [--exam-id ID]
+(--exam-id verilmezse süresi dolmuş tüm sınavlar taranır)
+"""
+
+import sys
+from utils.collusion import screen_exam, closed_exam_ids
+
+def screen_collusion(exam_ids):
+    """Verilen sınavları tara ve işaretlenen çiftleri özetle"""
+    if not exam_ids:
+        print("Taranacak sınav yok")
+        return 0
+
+    total = 0
+    for exam_id in exam_ids:
+        flags = screen_exam(exam_id)
+        total += len(flags)
+        print(f"  Sınav {exam_id}: {len(flags)} şüpheli çift")
+        for f in flags:
+            print(f"    deneme {f['attempt_a_id']} - {f['attempt_b_id']}: "
+                  f"{f['identical_wrong']} ortak yanlış (beklenen {f['expected_identical_wrong']:.1f}), "
+                  f"p={f['p_value']:.2g}")
+
+    print(f"\n{len(exam_ids)} sınav tarandı, toplam {total} şüpheli çift kaydedildi")
+    return 0
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--exam-id' in args:
+        exam_ids = [int(args[args.index('--exam-id') + 1])]
+    else:
+        exam_ids = closed_exam_ids()
+    sys.exit(screen_collusion(exam_ids))
@@ -0,0 +1,108 @@
+"""
+Üretim sunucusu: çok süreçli (worker) ve çok thread'li gunicorn
+Kullanım: python serve.py [--bind HOST:PORT] [--workers N] [--threads N]
+Diğer ayarlar config.py'deki SERVER_* ve DB_POOL_SIZE değişkenlerinden okunur.
+
+- Veritabanı tabloları worker'lar başlamadan önce bir kez oluşturulur.
+- Uygulama her worker'da bir kez yüklenir; worker istek kabul etmeden önce
+  bağlantı havuzunu açar ve önbellekleri ısıtır.
+- SIGTERM ile kapanışta worker'lar yeni bağlantı kabul etmez, devam eden
+  istekler (sınav gönderimleri dahil) SERVER_GRACEFUL_TIMEOUT süresince
+  tamamlanır.
+"""
+
+import sys
+import tempfile
+from gunicorn.app.base import BaseApplication
+from config import Config
+
+def prewarm():
+    """Worker istek almadan önce sık kullanılan önbellekleri doldur"""
+    from datetime import datetime, timezone
+    from routes.department_head import compute_statistics
+    from utils.cache import statistics_cache
+    from utils.exam_schedule import ExamWindowIndex
+    from utils.question_pool import QuestionPoolIndex
+
+    statistics_cache.get(compute_statistics)
+    # Yalnızca açık sınavların soru havuzları: başlamamış sınavlarda sorular hâlâ değişebilir
+    exams = ExamWindowIndex.current().open_at(datetime.now(timezone.utc))
+    for exam in exams:
+        QuestionPoolIndex.for_exam(exam['id'])
+    return len(exams)
+
+def post_worker_init(worker):
+    from models import init_pool
+
+    # psycopg2 havuzu minconn'dan fazla boşta bağlantı tutmaz; hepsi baştan açılır
+    # ki yük altında bağlantılar sürekli kapatılıp yeniden açılmasın
+    size = Config.DB_POOL_SIZE or 2 * worker.cfg.threads
+    init_pool(size, size)
+    try:
+        exam_count = prewarm()
+        worker.log.info('Worker %s hazır: havuz %s bağlantı, %s açık sınavın soru havuzu önbellekte',
+                        worker.pid, size, exam_count)
+    except Exception:
+        # Isıtma başarısız olsa da worker istek alabilir; önbellekler ilk istekte dolar
+        worker.log.exception('Önbellek ısıtma başarısız')
+
+def worker_int(worker):
+    worker.log.info('Worker %s kapanıyor, devam eden istekler bekleniyor', worker.pid)
+
+def worker_exit(server, worker):
+    from models import close_pool
+    from utils.metrics import registry
+
+    registry.flush(force=True)
+    close_pool()
+
+class ExamServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # preload_app kapalı: her worker uygulamayı kendi sürecinde bir kez yükler
+        from app import create_app
+        app = create_app(init_database=False)
+        app.debug = False
+        return app
+
+def server_options(bind, workers, threads):
+    return {
+        'bind': bind,
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': threads,
+        'keepalive': Config.SERVER_KEEPALIVE,
+        'timeout': Config.SERVER_TIMEOUT,
+        'graceful_timeout': Config.SERVER_GRACEFUL_TIMEOUT,
+        'preload_app': False,
+        'accesslog': '-',
+        'post_worker_init': post_worker_init,
+        'worker_int': worker_int,
+        'worker_exit': worker_exit,
+    }
+
+def main(args):
+    bind = args[args.index('--bind') + 1] if '--bind' in args else Config.SERVER_BIND
+    workers = int(args[args.index('--workers') + 1]) if '--workers' in args else Config.SERVER_WORKERS
+    threads = int(args[args.index('--threads') + 1]) if '--threads' in args else Config.SERVER_THREADS
+
+    # Tablolar worker'lar çatallanmadan önce tek süreçte oluşturulur
+    from models import init_db
+    init_db()
+
+    # Birden fazla worker'ın /metrics ölçümleri ortak bir dizinde toplanır
+    if workers > 1 and not Config.METRICS_DIR:
+        Config.METRICS_DIR = tempfile.mkdtemp(prefix='exam-metrics-')
+
+    ExamServer(server_options(bind, workers, threads)).run()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
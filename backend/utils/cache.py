@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class StaleWhileRevalidateCache:
+    """Single-value cache with a TTL and explicit invalidation.
+
+    Once the value is older than the TTL or has been invalidated, callers keep
+    getting the previous value while one background thread recomputes it.
+    Only the very first load (or a load after a failed first load) blocks.
+    The cache is per process: invalidations reach the worker that made the
+    change, the TTL bounds how stale the other workers can be.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._value = None
+        self._loaded_at = None
+        self._stale = False
+        self._generation = 0
+        self._refreshing = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, loader):
+        """Return (value, status) where status is 'HIT', 'STALE' or 'MISS'"""
+        with self._lock:
+            if self._loaded_at is not None:
+                self.hits += 1
+                if not self._stale and time.monotonic() - self._loaded_at < self.ttl:
+                    return self._value, 'HIT'
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh, args=(loader,), daemon=True).start()
+                return self._value, 'STALE'
+
+        # Cold cache: load synchronously, letting concurrent callers share one load
+        with self._load_lock:
+            with self._lock:
+                if self._loaded_at is not None:
+                    self.hits += 1
+                    return self._value, 'HIT'
+                self.misses += 1
+            self._load(loader)
+            return self._value, 'MISS'
+
+    def invalidate(self):
+        """Mark the cached value as stale; the next read triggers a background refresh"""
+        with self._lock:
+            self._generation += 1
+            self._stale = True
+
+    def _load(self, loader):
+        with self._lock:
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            self._value = value
+            self._loaded_at = time.monotonic()
+            # An invalidation that arrived while loading keeps the value stale
+            self._stale = generation != self._generation
+
+    def _refresh(self, loader):
+        try:
+            self._load(loader)
+        except Exception:
+            logger.exception('Background cache refresh failed')
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+class KeyedCache:
+    """Bounded, thread-safe LRU mapping for per-key results.
+
+    Without a TTL entries stay until evicted or invalidated. With one, entries
+    older than ttl seconds count as misses; like StaleWhileRevalidateCache,
+    this bounds how stale the workers that did not see an invalidation can be.
+    """
+
+    def __init__(self, max_entries, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value or None"""
+        with self._lock:
+            if key in self._entries:
+                value, stored_at = self._entries[key]
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+# Department head statistics, invalidated by attempt, enrollment and exam changes
+statistics_cache = StaleWhileRevalidateCache(ttl=Config.STATISTICS_CACHE_TTL)
+
+# Item analysis of exams whose window has closed (answers can no longer change)
+item_analysis_cache = KeyedCache(max_entries=Config.ITEM_ANALYSIS_CACHE_SIZE)
+
+# Interval index of all exam windows (a single entry), invalidated when exams are created
+# or deleted so the next read in that worker rebuilds it; the TTL covers the other workers
+exam_schedule_cache = KeyedCache(max_entries=1, ttl=Config.EXAM_SCHEDULE_CACHE_TTL)
+
+# Per-exam topic/difficulty index of question ids, invalidated by question changes
+# (in the worker that made them; the TTL and a question count check cover the others)
+question_pool_cache = KeyedCache(max_entries=Config.QUESTION_POOL_CACHE_SIZE, ttl=Config.QUESTION_POOL_CACHE_TTL)
@@ -0,0 +1,156 @@
+import numpy as np
+from config import Config
+from models import get_db_cursor, SimilarityFlag
+from utils.item_analysis import OPTIONS, build_response_matrix
+
+# Rows of the attempts matrix multiplied against all the others at once
+BLOCK_ROWS = 256
+
+def one_hot_answers(responses, keys):
+    """Encode responses as flat attempts × (questions · options) indicator matrices.
+
+    Returns (answered, wrong, presented): answered has a 1 in the column of every
+    chosen option, wrong only keeps the incorrect choices and presented is the
+    attempts × questions matrix of answered items.
+    """
+    n_attempts, n_questions = responses.shape
+    n_options = len(OPTIONS)
+    presented = responses >= 0
+
+    answered = np.zeros((n_attempts, n_questions * n_options), dtype=np.float32)
+    rows, cols = np.nonzero(presented)
+    answered[rows, cols * n_options + responses[rows, cols]] = 1
+
+    wrong = answered.copy()
+    key_columns = np.arange(n_questions) * n_options + keys
+    wrong[:, key_columns] = 0
+    return answered, wrong, presented.astype(np.float32)
+
+def wrong_match_probabilities(responses, keys):
+    """Chance per question that two independent students pick the same wrong option.
+
+    Uses the observed option proportions: m_q = Σ over wrong options of p(q, o)².
+    """
+    presented = (responses >= 0).sum(axis=0)
+    probabilities = np.zeros(responses.shape[1], dtype=np.float64)
+    for code in range(len(OPTIONS)):
+        chosen = (responses == code).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(presented > 0, chosen / presented, 0.0)
+        probabilities += np.where(keys == code, 0.0, share ** 2)
+    return probabilities
+
+def poisson_tail(counts, expected, max_count):
+    """P(K >= count) for K ~ Poisson(expected), summed over the upper terms in log space
+    so that very small probabilities do not cancel to zero"""
+    support = np.arange(max_count + 1)
+    log_factorial = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, max_count + 1)))))
+    log_expected = np.log(np.maximum(expected, 1e-12))
+    log_terms = (support[np.newaxis, :] * log_expected[:, np.newaxis]
+                 - expected[:, np.newaxis] - log_factorial[np.newaxis, :])
+    terms = np.where(support[np.newaxis, :] >= counts[:, np.newaxis], np.exp(log_terms), 0.0)
+    return np.minimum(terms.sum(axis=1), 1.0)
+
+def similar_pairs(responses, keys, min_identical_wrong, significance, block_rows=BLOCK_ROWS):
+    """Pairs of attempts that share abnormally many identical wrong answers.
+
+    Pairwise counts come from matrix products of the one-hot encodings, done a
+    block of rows at a time over the upper triangle so memory stays at
+    block_rows × attempts. A pair's identical-wrong count k is compared with the
+    count expected by chance on the questions both were shown, E = Σ m_q, using
+    the Poisson tail P(K >= k). The probability is Bonferroni-adjusted for the
+    number of pairs screened, so random agreement in a large class is not flagged.
+
+    Returns a list of (i, j, shared, identical, identical_wrong, expected, p_value) with i < j.
+    """
+    n_attempts, n_questions = responses.shape
+    n_pairs = n_attempts * (n_attempts - 1) // 2
+    answered, wrong, presented = one_hot_answers(responses, keys)
+    expected_basis = presented * wrong_match_probabilities(responses, keys).astype(np.float32)
+
+    # Attempts with fewer wrong answers than the threshold can never be flagged
+    candidates = np.flatnonzero(wrong.sum(axis=1) >= min_identical_wrong)
+    wrong, answered = wrong[candidates], answered[candidates]
+    presented, expected_basis = presented[candidates], expected_basis[candidates]
+
+    pairs = []
+    for start in range(0, len(candidates), block_rows):
+        stop = min(start + block_rows, len(candidates))
+        identical_wrong = wrong[start:stop] @ wrong[start:].T
+        # Keep only j > i inside the block (upper triangle of the full matrix)
+        identical_wrong = np.triu(identical_wrong, k=1)
+        block_i, block_j = np.nonzero(identical_wrong >= min_identical_wrong)
+        if not block_i.size:
+            continue
+
+        rows_i = start + block_i
+        rows_j = start + block_j
+        k = identical_wrong[block_i, block_j].astype(np.int64)
+        expected = np.einsum('ij,ij->i', expected_basis[rows_i], presented[rows_j]).astype(np.float64)
+        p_values = np.minimum(poisson_tail(k, expected, n_questions) * n_pairs, 1.0)
+
+        flagged = p_values <= significance
+        if not flagged.any():
+            continue
+        rows_i, rows_j = rows_i[flagged], rows_j[flagged]
+        shared = np.einsum('ij,ij->i', presented[rows_i], presented[rows_j])
+        identical = np.einsum('ij,ij->i', answered[rows_i], answered[rows_j])
+        for values in zip(candidates[rows_i], candidates[rows_j], shared, identical,
+                          k[flagged], expected[flagged], p_values[flagged]):
+            pairs.append(values)
+    return pairs
+
+def screen_exam(exam_id, min_identical_wrong=None, significance=None):
+    """Screen an exam's completed attempts and replace its stored similarity flags"""
+    if min_identical_wrong is None:
+        min_identical_wrong = Config.COLLUSION_MIN_IDENTICAL_WRONG
+    if significance is None:
+        significance = Config.COLLUSION_SIGNIFICANCE
+
+    with get_db_cursor() as (conn, cur):
+        cur.execute('''
+            SELECT id, correct_answer FROM questions
+            WHERE exam_id = %s
+            ORDER BY id
+        ''', (exam_id,))
+        questions = cur.fetchall()
+
+        cur.execute('''
+            SELECT a.attempt_id, a.question_id, a.selected_answer
+            FROM answers a
+            JOIN exam_attempts ea ON a.attempt_id = ea.id
+            WHERE ea.exam_id = %s AND ea.is_completed = TRUE
+        ''', (exam_id,))
+        answers = cur.fetchall()
+
+    attempt_ids = sorted({answer['attempt_id'] for answer in answers})
+    question_ids = [question['id'] for question in questions]
+    keys = np.array([ord(question['correct_answer']) - ord('A') for question in questions], dtype=np.int64)
+    responses = build_response_matrix(question_ids, answers)
+
+    flags = [
+        {
+            'attempt_a_id': attempt_ids[i],
+            'attempt_b_id': attempt_ids[j],
+            'shared_questions': int(shared),
+            'identical_answers': int(identical),
+            'identical_wrong': int(identical_wrong),
+            'expected_identical_wrong': round(float(expected), 3),
+            'p_value': float(p_value)
+        }
+        for i, j, shared, identical, identical_wrong, expected, p_value in similar_pairs(
+            responses, keys, min_identical_wrong, significance
+        )
+    ]
+    SimilarityFlag.replace_for_exam(exam_id, flags)
+    return flags
+
+def closed_exam_ids():
+    """Exams whose window has closed, the ones worth screening"""
+    with get_db_cursor() as (conn, cur):
+        cur.execute('''
+            SELECT id FROM exams
+            WHERE (end_time + duration_minutes * INTERVAL '1 minute') < NOW()
+            ORDER BY id
+        ''')
+        return [row['id'] for row in cur.fetchall()]
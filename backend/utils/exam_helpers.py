@@ -1,17 +1,22 @@
-import random
-from models import Question, ExamAttempt, Answer, Exam, Enrollment, get_db_cursor
-from datetime import datetime
+from models import Question, ExamAttempt, Answer, Enrollment, get_db_cursor
+from utils.gradebook import Gradebook
+from utils.question_pool import QuestionPoolIndex, sample_question_ids
+from datetime import datetime, timezone
 
-def get_random_questions(exam_id, count=5):
-    """Get random questions from exam question pool (always returns 5 questions)"""
-    questions = Question.get_by_exam(exam_id, include_answer=False)
-    
-    if len(questions) < count:
-        # If there are fewer questions than requested, return all
-        return questions
-    
-    # Return exactly 5 random questions
-    return random.sample(questions, count)
+def get_random_questions(exam_id, count=5, blueprint=None, question_count=None):
+    """Get random questions from exam question pool (always returns 5 questions).
+    
+    Questions are chosen by id from the exam's cached tag index, following the
+    exam blueprint when it has one; only the chosen rows are then fetched.
+    If some chosen questions no longer exist (deleted since the index was
+    cached), the index is rebuilt and the questions are drawn again.
+    """
+    question_ids = sample_question_ids(QuestionPoolIndex.for_exam(exam_id, question_count), blueprint, count)
+    questions = Question.get_by_ids(question_ids, include_answer=False)
+    if len(questions) < len(question_ids):
+        question_ids = sample_question_ids(QuestionPoolIndex.for_exam(exam_id, refresh=True), blueprint, count)
+        questions = Question.get_by_ids(question_ids, include_answer=False)
+    return questions
 
 def calculate_score(attempt_id):
     """Calculate score for an exam attempt (always based on 5 questions)"""
@@ -44,26 +49,25 @@ def calculate_score(attempt_id):
     
     # Create a dict for quick lookup
     question_dict = {q['id']: q['correct_answer'] for q in questions}
+    return score_answers(answers, question_dict)
+
+def score_answers(answers, correct_answers):
+    """Score as a percentage of correct answers, rounded to 2 decimals (0 without answers).
     
-    # Calculate correct answers
-    correct_count = 0
-    total_questions = len(answers)
+    answers: answer rows with question_id and selected_answer
+    correct_answers: {question_id: correct option letter}
+    """
+    if not answers:
+        return 0
     
+    correct_count = 0
     for answer in answers:
-        correct_answer = question_dict.get(answer['question_id'])
-        selected = answer.get('selected_answer', '').upper() if answer.get('selected_answer') else ''
-        correct = correct_answer.upper() if correct_answer else ''
-        
-        if correct_answer and selected == correct:
+        correct = correct_answers.get(answer['question_id'])
+        selected = answer.get('selected_answer')
+        if correct and selected and selected.upper() == correct.upper():
             correct_count += 1
     
-    # Calculate score as percentage (always out of 5 questions)
-    if total_questions > 0:
-        score = (correct_count / total_questions) * 100
-        final_score = round(score, 2)
-        return final_score
-    else:
-        return 0
+    return round((correct_count / len(answers)) * 100, 2)
 
 def get_exam_average(exam_id):
     """Calculate average score for an exam"""
@@ -79,83 +83,13 @@ def get_exam_average(exam_id):
     
     return round(sum(scores) / len(scores), 2)
 
-def is_exam_available(exam):
-    """Check if exam is currently available"""
-    from datetime import timezone
-    
-    now = datetime.now(timezone.utc)  # Always use UTC, timezone-aware
-    
-    # Parse ISO format strings to datetime if needed
-    start_time_str = exam['start_time']
-    end_time_str = exam['end_time']
-    
-    # Parse start_time
-    if isinstance(start_time_str, str):
-        # String format - parse it
-        try:
-            if start_time_str.endswith('Z'):
-                start_time = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
-            elif '+' in start_time_str or start_time_str.count('-') > 2:
-                # Has timezone info
-                start_time = datetime.fromisoformat(start_time_str)
-                if start_time.tzinfo is None:
-                    start_time = start_time.replace(tzinfo=timezone.utc)
-            else:
-                # No timezone, parse and add UTC
-                start_time = datetime.fromisoformat(start_time_str)
-                if start_time.tzinfo is None:
-                    start_time = start_time.replace(tzinfo=timezone.utc)
-        except (ValueError, AttributeError) as e:
-            # Fallback: try parsing as is
-            try:
-                start_time = datetime.fromisoformat(start_time_str)
-                if start_time.tzinfo is None:
-                    start_time = start_time.replace(tzinfo=timezone.utc)
-            except:
-                # Last resort: assume it's a naive datetime string
-                start_time = datetime.fromisoformat(start_time_str.replace('T', ' ').split('.')[0])
-                start_time = start_time.replace(tzinfo=timezone.utc)
-    else:
-        # Already datetime object
-        start_time = start_time_str
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=timezone.utc)
-        else:
-            start_time = start_time.astimezone(timezone.utc)
-    
-    # Parse end_time
-    if isinstance(end_time_str, str):
-        try:
-            if end_time_str.endswith('Z'):
-                end_time = datetime.fromisoformat(end_time_str.replace('Z', '+00:00'))
-            elif '+' in end_time_str or end_time_str.count('-') > 2:
-                end_time = datetime.fromisoformat(end_time_str)
-                if end_time.tzinfo is None:
-                    end_time = end_time.replace(tzinfo=timezone.utc)
-            else:
-                end_time = datetime.fromisoformat(end_time_str)
-                if end_time.tzinfo is None:
-                    end_time = end_time.replace(tzinfo=timezone.utc)
-        except (ValueError, AttributeError) as e:
-            try:
-                end_time = datetime.fromisoformat(end_time_str)
-                if end_time.tzinfo is None:
-                    end_time = end_time.replace(tzinfo=timezone.utc)
-            except:
-                end_time = datetime.fromisoformat(end_time_str.replace('T', ' ').split('.')[0])
-                end_time = end_time.replace(tzinfo=timezone.utc)
-    else:
-        end_time = end_time_str
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-        else:
-            end_time = end_time.astimezone(timezone.utc)
-    
-    # All times should be UTC timezone-aware now
-    # Compare: start_time <= now <= end_time
-    is_available = start_time <= now <= end_time
+def is_exam_available(exam, now=None):
+    """Check if exam is currently available (exam times are timezone-aware datetimes).
     
-    return is_available
+    Exam lists get is_available from SQL; this is for a single exam already in hand.
+    """
+    now = now or datetime.now(timezone.utc)
+    return exam['start_time'] <= now <= exam['end_time']
 
 def has_student_attempted(student_id, exam_id):
     """Check if student has already completed the exam (not just started)"""
@@ -167,41 +101,13 @@ def has_student_attempted(student_id, exam_id):
 
 def calculate_course_grade(student_id, course_id):
     """Calculate final course grade based on exam weights"""
-    # Check if student is enrolled
-    with get_db_cursor() as (conn, cur):
-        cur.execute('''
-            SELECT id FROM enrollments 
-            WHERE student_id = %s AND course_id = %s
-        ''', (student_id, course_id))
-        enrollment = cur.fetchone()
-    
-    if not enrollment:
-        return None
-    
-    # Get all exams for the course
-    exams = Exam.get_by_course(course_id)
-    
-    if not exams:
-        return None
-    
-    total_grade = 0
-    total_weight = 0
-    
-    for exam in exams:
-        # Get student's attempt for this exam
-        with get_db_cursor() as (conn, cur):
-            cur.execute('''
-                SELECT score FROM exam_attempts 
-                WHERE student_id = %s AND exam_id = %s AND is_completed = TRUE
-            ''', (student_id, exam['id']))
-            attempt = cur.fetchone()
-        
-        if attempt and attempt['score'] is not None:
-            weighted_score = (attempt['score'] * exam['weight_percentage']) / 100
-            total_grade += weighted_score
-            total_weight += exam['weight_percentage']
-    
-    if total_weight == 0:
-        return None
-    
-    return round(total_grade, 2)
+    return Gradebook.load(course_id, student_ids=[student_id]).grade_of(student_id)
+
+def parse_utc_datetime(value):
+    """Parse an ISO format datetime string from the frontend as timezone-aware UTC (no timezone = UTC)"""
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
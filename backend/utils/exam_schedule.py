@@ -0,0 +1,114 @@
+import bisect
+from datetime import datetime, timedelta, timezone
+from config import Config
+from models import Exam
+from utils.cache import exam_schedule_cache
+from utils.exam_helpers import parse_utc_datetime
+
+class ExamWindowIndex:
+    """In-memory interval index over exam windows [start_time, end_time].
+
+    Windows are kept sorted by start time and read as an implicit balanced
+    search tree: the middle of every slice is a node, the two halves are its
+    subtrees, and max_end holds the latest end time in each node's subtree.
+    An overlap query only descends into subtrees that can still contain a
+    match, so point and range queries cost O(log n + k) for k results.
+    """
+
+    def __init__(self, windows):
+        windows = sorted(windows, key=lambda window: (window['start_time'], window['id']))
+        self.ids = [window['id'] for window in windows]
+        self.course_ids = [window['course_id'] for window in windows]
+        self.starts = [window['start_time'] for window in windows]
+        self.ends = [window['end_time'] for window in windows]
+        self.max_end = list(self.ends)
+        self._build(0, len(windows))
+
+    @classmethod
+    def current(cls):
+        """Index of all exams; rebuilt after exams are created or deleted (and after the TTL in other workers)"""
+        index = exam_schedule_cache.get('windows')
+        if index is None:
+            index = cls(Exam.get_windows())
+            exam_schedule_cache.set('windows', index)
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        latest = self.ends[mid]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > latest:
+                latest = child
+        self.max_end[mid] = latest
+        return latest
+
+    def _collect(self, lo, hi, start, end, found):
+        # In-order walk, so matches come out sorted by start time
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        if self.max_end[mid] < start:
+            return
+        self._collect(lo, mid, start, end, found)
+        if self.starts[mid] <= end:
+            if self.ends[mid] >= start:
+                found.append(mid)
+            self._collect(mid + 1, hi, start, end, found)
+
+    def _windows(self, positions, course_ids):
+        return [
+            {'id': self.ids[i], 'course_id': self.course_ids[i], 'start_time': self.starts[i], 'end_time': self.ends[i]}
+            for i in positions
+            if course_ids is None or self.course_ids[i] in course_ids
+        ]
+
+    def overlapping(self, start, end, course_ids=None):
+        """Windows that are open at some point between start and end (inclusive), by start time"""
+        found = []
+        self._collect(0, len(self.ids), start, end, found)
+        return self._windows(found, course_ids)
+
+    def open_at(self, moment, course_ids=None):
+        """Windows open at the given moment"""
+        return self.overlapping(moment, moment, course_ids)
+
+    def opening_between(self, after, until, course_ids=None):
+        """Windows starting after `after` and no later than `until`, by start time"""
+        lo = bisect.bisect_right(self.starts, after)
+        hi = bisect.bisect_right(self.starts, until)
+        return self._windows(range(lo, hi), course_ids)
+
+def parse_schedule_args(args):
+    """(at, horizon) from ?at=ISO datetime (default now) and ?horizon=minutes; raises ValueError"""
+    at = parse_utc_datetime(args['at']) if args.get('at') else datetime.now(timezone.utc)
+    horizon = args.get('horizon', Config.EXAM_SCHEDULE_HORIZON_MINUTES)
+    try:
+        horizon = int(horizon)
+    except (TypeError, ValueError):
+        raise ValueError('horizon must be a whole number of minutes')
+    if not 0 <= horizon <= Config.EXAM_SCHEDULE_MAX_HORIZON_MINUTES:
+        raise ValueError(f'horizon must be between 0 and {Config.EXAM_SCHEDULE_MAX_HORIZON_MINUTES} minutes')
+    return at, timedelta(minutes=horizon)
+
+def exam_schedule(at, horizon, course_ids=None):
+    """Exams open at `at` and exams opening within `horizon` after it (optionally only in the given courses).
+
+    The index picks the exam ids; their details (course, question count,
+    is_available at `at`) come from one query so they are never staler than
+    the exam list itself.
+    """
+    index = ExamWindowIndex.current()
+    open_windows = index.open_at(at, course_ids)
+    upcoming_windows = index.opening_between(at, at + horizon, course_ids)
+    exams = {exam['id']: exam for exam in Exam.get_by_ids([w['id'] for w in open_windows + upcoming_windows], at)}
+    return {
+        'at': at,
+        'horizon_minutes': int(horizon.total_seconds() // 60),
+        'open': [exams[w['id']] for w in open_windows if w['id'] in exams],
+        'upcoming': [exams[w['id']] for w in upcoming_windows if w['id'] in exams]
+    }
@@ -0,0 +1,236 @@
+import numpy as np
+from models import GRADED_ATTEMPT_SQL, get_db_cursor
+
+def weighted_grades(scores, mask, weights):
+    """Vectorized course grades for a students × exams score matrix.
+
+    scores:  (n_students, n_exams) float matrix; cells where mask is False are ignored
+    mask:    (n_students, n_exams) bool matrix, True where a completed attempt exists
+    weights: (n_exams,) exam weight percentages
+
+    Returns (grades, weighted_sums, taken_weights). A grade is the weighted sum of
+    the attempted exams, NaN when no weighted exam has been taken yet.
+    """
+    weighted_sums = np.where(mask, scores, 0.0) @ weights / 100
+    taken_weights = mask.astype(weights.dtype) @ weights
+    grades = np.where(taken_weights > 0, np.round(weighted_sums, 2), np.nan)
+    return grades, weighted_sums, taken_weights
+
+def competition_ranks(values):
+    """Rank values descending with ties sharing a rank (1, 2, 2, 4); NaN gets rank 0"""
+    valid = ~np.isnan(values)
+    ascending = -np.sort(values[valid])[::-1]
+    ranks = np.zeros(values.shape, dtype=np.int64)
+    ranks[valid] = np.searchsorted(ascending, -values[valid], side='left') + 1
+    return ranks
+
+def _index_of(ids, values):
+    """Position of each value in the ids array, -1 where it is missing"""
+    if len(ids) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    ordered = ids[order]
+    positions = np.minimum(np.searchsorted(ordered, values), len(ordered) - 1)
+    return np.where(ordered[positions] == values, order[positions], -1)
+
+def _nan_to_none(value):
+    return None if np.isnan(value) else float(value)
+
+class Gradebook:
+    """Students × exams score matrix of one course, with its exam weight vector"""
+
+    def __init__(self, course_id, students, exams, attempts):
+        """students: dicts with id (sorted by the caller's preferred order)
+        exams: dicts with id and weight_percentage
+        attempts: (student_id, exam_id, score) tuples of graded attempts, at most one per
+            student and exam (the loaders keep only the latest, see GRADED_ATTEMPT_SQL)
+        """
+        self.course_id = course_id
+        self.students = students
+        self.exam_ids = np.array([exam['id'] for exam in exams], dtype=np.int64)
+        self.weights = np.array([exam['weight_percentage'] for exam in exams], dtype=np.float64)
+
+        student_ids = np.array([student['id'] for student in students], dtype=np.int64)
+        self.student_ids = student_ids
+        self.scores = np.zeros((len(student_ids), len(self.exam_ids)), dtype=np.float64)
+        self.mask = np.zeros(self.scores.shape, dtype=bool)
+
+        if len(attempts) and len(student_ids) and len(self.exam_ids):
+            attempts = np.asarray(attempts, dtype=np.float64)
+            rows = _index_of(student_ids, attempts[:, 0].astype(np.int64))
+            cols = _index_of(self.exam_ids, attempts[:, 1].astype(np.int64))
+            known = (rows >= 0) & (cols >= 0)
+            self.scores[rows[known], cols[known]] = attempts[known, 2]
+            self.mask[rows[known], cols[known]] = True
+
+        self.grades, self._weighted_sums, self.taken_weights = weighted_grades(
+            self.scores, self.mask, self.weights
+        )
+
+    @classmethod
+    def load(cls, course_id, student_ids=None):
+        """Load a course's enrolled students (optionally only some of them), exams and completed scores"""
+        student_filter = '' if student_ids is None else 'AND e.student_id = ANY(%s)'
+        params = (course_id,) if student_ids is None else (course_id, list(student_ids))
+
+        with get_db_cursor() as (conn, cur):
+            cur.execute('''
+                SELECT id, weight_percentage FROM exams
+                WHERE course_id = %s
+                ORDER BY start_time, id
+            ''', (course_id,))
+            exams = cur.fetchall()
+
+            cur.execute(f'''
+                SELECT e.student_id as id, s.student_number, u.full_name
+                FROM enrollments e
+                JOIN students s ON e.student_id = s.id
+                JOIN users u ON s.user_id = u.id
+                WHERE e.course_id = %s {student_filter}
+                ORDER BY s.student_number
+            ''', params)
+            students = [dict(row) for row in cur.fetchall()]
+
+            cur.execute(f'''
+                SELECT ea.student_id, ea.exam_id, ea.score
+                FROM exam_attempts ea
+                JOIN exams ex ON ea.exam_id = ex.id
+                JOIN enrollments e ON e.student_id = ea.student_id AND e.course_id = ex.course_id
+                WHERE ex.course_id = %s {student_filter}
+                  AND {GRADED_ATTEMPT_SQL}
+            ''', params)
+            attempts = [(row['student_id'], row['exam_id'], row['score']) for row in cur.fetchall()]
+
+        return cls(course_id, students, exams, attempts)
+
+    @property
+    def projected_grades(self):
+        """Grades with the attempted exams' weights renormalized to 100%"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            projected = self._weighted_sums * 100 / self.taken_weights
+        return np.where(self.taken_weights > 0, np.round(projected, 2), np.nan)
+
+    @property
+    def ranks(self):
+        """Class rank of every student by grade (0 for students without a grade)"""
+        return competition_ranks(self.grades)
+
+    def exam_averages(self):
+        """Average score per exam over completed attempts (NaN if nobody took it)"""
+        counts = self.mask.sum(axis=0)
+        sums = np.where(self.mask, self.scores, 0.0).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def average_grade(self):
+        """Class average of the course grades, None when nobody has a grade"""
+        graded = self.grades[~np.isnan(self.grades)]
+        return round(float(graded.mean()), 2) if graded.size else None
+
+    def grade_of(self, student_id):
+        """Course grade of a single student (None if not enrolled or not graded)"""
+        index = _index_of(self.student_ids, np.array([student_id]))[0]
+        return None if index < 0 else _nan_to_none(self.grades[index])
+
+    def rows(self):
+        """Per-student dicts for JSON responses"""
+        ranks = self.ranks
+        projected = self.projected_grades
+        exam_ids = self.exam_ids.tolist()
+        result = []
+        for i, student in enumerate(self.students):
+            taken = self.mask[i]
+            result.append({
+                'student_id': student['id'],
+                'student_number': student.get('student_number'),
+                'full_name': student.get('full_name'),
+                'grade': _nan_to_none(self.grades[i]),
+                'projected_grade': _nan_to_none(projected[i]),
+                'rank': int(ranks[i]) or None,
+                'exam_scores': {
+                    str(exam_id): float(score)
+                    for exam_id, score, was_taken in zip(exam_ids, self.scores[i].tolist(), taken.tolist())
+                    if was_taken
+                }
+            })
+        return result
+
+def load_all_gradebooks():
+    """Gradebooks of every course, built from three table-wide queries"""
+    with get_db_cursor() as (conn, cur):
+        cur.execute('SELECT student_id, course_id FROM enrollments ORDER BY course_id, student_id')
+        enrollments = cur.fetchall()
+
+        cur.execute('SELECT id, course_id, weight_percentage FROM exams ORDER BY course_id, start_time, id')
+        exams = cur.fetchall()
+
+        cur.execute(f'''
+            SELECT ea.student_id, ea.exam_id, ea.score, ex.course_id
+            FROM exam_attempts ea
+            JOIN exams ex ON ea.exam_id = ex.id
+            WHERE {GRADED_ATTEMPT_SQL}
+        ''')
+        attempts = cur.fetchall()
+    return build_gradebooks(enrollments, exams, attempts)
+
+def build_gradebooks(enrollments, exams, attempts):
+    """Group table-wide enrollment, exam and attempt rows into one Gradebook per course"""
+    students_by_course = {}
+    for row in enrollments:
+        students_by_course.setdefault(row['course_id'], []).append({'id': row['student_id']})
+
+    exams_by_course = {}
+    for row in exams:
+        exams_by_course.setdefault(row['course_id'], []).append(row)
+
+    attempts_by_course = {}
+    for row in attempts:
+        attempts_by_course.setdefault(row['course_id'], []).append(
+            (row['student_id'], row['exam_id'], row['score'])
+        )
+
+    return {
+        course_id: Gradebook(
+            course_id, students,
+            exams_by_course.get(course_id, []),
+            attempts_by_course.get(course_id, [])
+        )
+        for course_id, students in students_by_course.items()
+    }
+
+def load_student_grades(student_id):
+    """Course grades of one student across all enrolled courses: {course_id: grade or None}"""
+    with get_db_cursor() as (conn, cur):
+        cur.execute('''
+            SELECT student_id, course_id FROM enrollments
+            WHERE student_id = %s
+            ORDER BY course_id
+        ''', (student_id,))
+        enrollments = cur.fetchall()
+
+        cur.execute('''
+            SELECT ex.id, ex.course_id, ex.weight_percentage
+            FROM exams ex
+            JOIN enrollments e ON e.course_id = ex.course_id
+            WHERE e.student_id = %s
+            ORDER BY ex.course_id, ex.start_time, ex.id
+        ''', (student_id,))
+        exams = cur.fetchall()
+
+        cur.execute(f'''
+            SELECT ea.student_id, ea.exam_id, ea.score, ex.course_id
+            FROM exam_attempts ea
+            JOIN exams ex ON ea.exam_id = ex.id
+            WHERE ea.student_id = %s AND {GRADED_ATTEMPT_SQL}
+        ''', (student_id,))
+        attempts = cur.fetchall()
+
+    gradebooks = build_gradebooks(enrollments, exams, attempts)
+    return {course_id: gradebook.grade_of(student_id) for course_id, gradebook in gradebooks.items()}
+
+def group_means(keys, values):
+    """Mean of values per key (keys need not be sorted): returns (unique_keys, means)"""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=values)
+    counts = np.bincount(inverse)
+    return unique_keys, sums / counts
@@ -0,0 +1,127 @@
+import numpy as np
+from models import get_db_cursor
+from utils.cache import item_analysis_cache
+
+OPTIONS = ('A', 'B', 'C', 'D', 'E')
+
+def build_response_matrix(question_ids, answers):
+    """Encode answers as an attempts × questions matrix of option codes (0-4, -1 = not presented).
+
+    Students get a random subset of the pool, so -1 cells are expected and are
+    excluded from every per-question statistic.
+    """
+    attempt_ids = sorted({answer['attempt_id'] for answer in answers})
+    row_of = {attempt_id: i for i, attempt_id in enumerate(attempt_ids)}
+    col_of = {question_id: j for j, question_id in enumerate(question_ids)}
+
+    responses = np.full((len(attempt_ids), len(question_ids)), -1, dtype=np.int8)
+    if answers:
+        rows = np.fromiter((row_of[a['attempt_id']] for a in answers), dtype=np.int64, count=len(answers))
+        cols = np.fromiter((col_of.get(a['question_id'], -1) for a in answers), dtype=np.int64, count=len(answers))
+        codes = np.fromiter((ord(a['selected_answer']) - ord('A') for a in answers), dtype=np.int8, count=len(answers))
+        known = cols >= 0
+        responses[rows[known], cols[known]] = codes[known]
+    return responses
+
+def item_statistics(responses, keys):
+    """Per-question difficulty, discrimination and option counts.
+
+    responses: attempts × questions option codes (-1 = not presented)
+    keys: correct option code per question
+
+    Returns (presented, correct, p_values, discrimination, option_counts) where
+    discrimination is the point-biserial correlation between answering the item
+    correctly and the rest score (the attempt's other correct answers).
+    """
+    presented = responses >= 0
+    correct = (responses == keys[np.newaxis, :]) & presented
+    correct_f = correct.astype(np.float64)
+    presented_f = presented.astype(np.float64)
+
+    n = presented.sum(axis=0)
+    correct_count = correct.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_values = np.where(n > 0, correct_count / n, np.nan)
+
+        rest = correct_f.sum(axis=1, keepdims=True) - correct_f
+        rest_mean = (rest * presented_f).sum(axis=0) / n
+        x_dev = (correct_f - p_values) * presented_f
+        y_dev = (rest - rest_mean) * presented_f
+        covariance = (x_dev * y_dev).sum(axis=0) / n
+        x_var = (x_dev ** 2).sum(axis=0) / n
+        y_var = (y_dev ** 2).sum(axis=0) / n
+        denominator = np.sqrt(x_var * y_var)
+        discrimination = np.where(denominator > 0, covariance / denominator, np.nan)
+
+    option_counts = np.stack([(responses == code).sum(axis=0) for code in range(len(OPTIONS))])
+    return n, correct_count, p_values, discrimination, option_counts
+
+def _rounded(value, digits=3):
+    return None if np.isnan(value) else round(float(value), digits)
+
+def compute_item_analysis(exam_id):
+    """Item analysis of an exam from its completed attempts; also reports whether its window has closed"""
+    with get_db_cursor() as (conn, cur):
+        cur.execute('''
+            SELECT (end_time + duration_minutes * INTERVAL '1 minute') < NOW() as is_closed
+            FROM exams WHERE id = %s
+        ''', (exam_id,))
+        exam = cur.fetchone()
+
+        cur.execute('''
+            SELECT id, question_text, correct_answer
+            FROM questions WHERE exam_id = %s
+            ORDER BY id
+        ''', (exam_id,))
+        questions = cur.fetchall()
+
+        cur.execute('''
+            SELECT a.attempt_id, a.question_id, a.selected_answer
+            FROM answers a
+            JOIN exam_attempts ea ON a.attempt_id = ea.id
+            WHERE ea.exam_id = %s AND ea.is_completed = TRUE
+        ''', (exam_id,))
+        answers = cur.fetchall()
+
+    question_ids = [question['id'] for question in questions]
+    keys = np.array([ord(question['correct_answer']) - ord('A') for question in questions], dtype=np.int8)
+    responses = build_response_matrix(question_ids, answers)
+    presented, correct, p_values, discrimination, option_counts = item_statistics(responses, keys)
+
+    items = []
+    for j, question in enumerate(questions):
+        shown = int(presented[j])
+        items.append({
+            'question_id': question['id'],
+            'question_text': question['question_text'],
+            'correct_answer': question['correct_answer'],
+            'presented_count': shown,
+            'correct_count': int(correct[j]),
+            'p_value': _rounded(p_values[j]),
+            'discrimination': _rounded(discrimination[j]),
+            'options': {
+                option: {
+                    'count': int(option_counts[k, j]),
+                    'proportion': round(int(option_counts[k, j]) / shown, 3) if shown else None
+                }
+                for k, option in enumerate(OPTIONS)
+            }
+        })
+
+    analysis = {
+        'exam_id': exam_id,
+        'attempt_count': int(responses.shape[0]),
+        'questions': items
+    }
+    return analysis, bool(exam and exam['is_closed'])
+
+def get_item_analysis(exam_id):
+    """Item analysis of an exam, cached once the exam window has closed"""
+    cached = item_analysis_cache.get(exam_id)
+    if cached is not None:
+        return cached
+
+    analysis, is_closed = compute_item_analysis(exam_id)
+    if is_closed:
+        item_analysis_cache.set(exam_id, analysis)
+    return analysis
@@ -0,0 +1,17 @@
+from datetime import datetime
+from flask.json.provider import DefaultJSONProvider
+from models import utc_isoformat
+
+class ApiJSONProvider(DefaultJSONProvider):
+    """JSON provider for API responses.
+
+    Models return native datetimes; they are serialized here, at the response
+    boundary, as UTC ISO 8601 strings with a 'Z' suffix (Flask's default would
+    be an HTTP date), so the frontend can parse every timestamp the same way.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return utc_isoformat(o)
+        return DefaultJSONProvider.default(o)
@@ -0,0 +1,240 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from flask import Response, g, request
+from config import Config
+
+# Latency histogram buckets (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_INFO = {
+    'http_requests_total': ('counter', 'HTTP requests by endpoint and status code'),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint'),
+    'http_requests_in_flight': ('gauge', 'HTTP requests currently being handled'),
+    'db_connections_opened_total': ('counter', 'Database connections opened'),
+    'db_connections_in_use': ('gauge', 'Database connections currently checked out'),
+    'db_pool_connections': ('gauge', 'Connections held by the connection pool'),
+    'db_pool_idle_connections': ('gauge', 'Idle connections in the connection pool'),
+    'db_pool_max_connections': ('gauge', 'Connection pool size limit'),
+    'db_queries_total': ('counter', 'SQL statements executed'),
+    'db_query_seconds_total': ('counter', 'Time spent executing SQL statements'),
+    'cache_hits_total': ('counter', 'Application cache hits'),
+    'cache_misses_total': ('counter', 'Application cache misses'),
+    'cache_hit_ratio': ('gauge', 'Application cache hits / (hits + misses)'),
+}
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+class MetricsRegistry:
+    """Metrics of this process.
+
+    With METRICS_DIR set, every process writes its snapshot to its own
+    metrics_<pid>.json file there (at most once per METRICS_FLUSH_INTERVAL
+    seconds and at exit), and /metrics sums the files of all workers. Counters
+    of exited workers are kept, gauges only count live processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.collectors = []
+        self._last_flush = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_gauge(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        """Plain-data copy of this process's metrics, including collector values"""
+        with self._lock:
+            state = {
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {
+                    key: {'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                    for key, h in self.histograms.items()
+                }
+            }
+        for collect in self.collectors:
+            for kind, name, labels, value in collect():
+                state[kind + 's'][_key(name, labels)] = value
+        return state
+
+    def flush(self, force=False):
+        """Write this process's snapshot to METRICS_DIR (atomically, throttled)"""
+        directory = Config.METRICS_DIR
+        if not directory:
+            return
+        # One writer at a time per process; other threads skip a throttled flush
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and now - self._last_flush < Config.METRICS_FLUSH_INTERVAL:
+                return
+            self._last_flush = now
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+            temporary = f'{path}.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temporary, path)
+        finally:
+            self._flush_lock.release()
+
+    def aggregate(self):
+        """Sum the snapshots of all worker processes (just this one without METRICS_DIR)"""
+        if not Config.METRICS_DIR:
+            return self.snapshot()
+
+        self.flush(force=True)
+        total = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        for path in glob.glob(os.path.join(Config.METRICS_DIR, 'metrics_*.json')):
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+            for key, value in state['counters'].items():
+                total['counters'][key] = total['counters'].get(key, 0) + value
+            if _is_alive(pid):
+                for key, value in state['gauges'].items():
+                    total['gauges'][key] = total['gauges'].get(key, 0) + value
+            for key, h in state['histograms'].items():
+                merged = total['histograms'].setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+                merged['buckets'] = [a + b for a, b in zip(merged['buckets'], h['buckets'])]
+                merged['sum'] += h['sum']
+                merged['count'] += h['count']
+        return total
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render(state):
+    """Prometheus text exposition format (version 0.0.4)"""
+    samples = {}
+    for kind in ('counters', 'gauges'):
+        for key, value in state[kind].items():
+            name, labels = json.loads(key)
+            samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    for key, h in state['histograms'].items():
+        name, labels = json.loads(key)
+        lines = samples.setdefault(name, [])
+        for bound, count in zip(BUCKETS, h['buckets']):
+            lines.append(f'{name}_bucket{_format_labels(labels + [["le", repr(bound)]])} {count}')
+        lines.append(f'{name}_bucket{_format_labels(labels + [["le", "+Inf"]])} {h["count"]}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(h["sum"])}')
+        lines.append(f'{name}_count{_format_labels(labels)} {h["count"]}')
+
+    # Hit ratios are derived from the aggregated counters so they are correct across workers
+    hits = {}
+    misses = {}
+    for key, value in state['counters'].items():
+        name, labels = json.loads(key)
+        if name == 'cache_hits_total':
+            hits[dict(labels)['cache']] = value
+        elif name == 'cache_misses_total':
+            misses[dict(labels)['cache']] = value
+    for cache, hit_count in sorted(hits.items()):
+        lookups = hit_count + misses.get(cache, 0)
+        if lookups:
+            samples.setdefault('cache_hit_ratio', []).append(
+                f'cache_hit_ratio{_format_labels([["cache", cache]])} {_format_value(round(hit_count / lookups, 4))}'
+            )
+
+    output = []
+    for name in sorted(samples):
+        kind, help_text = METRIC_INFO.get(name, ('untyped', name))
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(sorted(samples[name]))
+    return '\n'.join(output) + '\n'
+
+registry = MetricsRegistry()
+
+def _cache_collector():
+    from utils import cache
+    for name in ('statistics_cache', 'item_analysis_cache', 'question_pool_cache', 'exam_schedule_cache'):
+        instance = getattr(cache, name)
+        yield 'counter', 'cache_hits_total', {'cache': name}, instance.hits
+        yield 'counter', 'cache_misses_total', {'cache': name}, instance.misses
+
+registry.collectors.append(_cache_collector)
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_in_flight = True
+    registry.add_gauge('http_requests_in_flight', 1)
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    labels = {
+        'blueprint': request.blueprint or '',
+        'endpoint': request.endpoint or 'unmatched',
+        'method': request.method
+    }
+    registry.observe('http_request_duration_seconds', time.perf_counter() - started, **labels)
+    registry.inc('http_requests_total', status=str(response.status_code), **labels)
+    return response
+
+def _end_request(exc):
+    # Teardown also runs for requests that raised and after streamed bodies finish
+    if g.pop('metrics_in_flight', False):
+        registry.add_gauge('http_requests_in_flight', -1)
+    registry.flush()
+
+def metrics_view():
+    return Response(render(registry.aggregate()), mimetype='text/plain; version=0.0.4')
+
+def init_app(app):
+    """Record request metrics and expose them at /metrics"""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    atexit.register(registry.flush, force=True)
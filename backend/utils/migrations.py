@@ -0,0 +1,174 @@
+import time
+import psycopg2.errors
+from config import Config
+from models import get_db_cursor
+
+# A chunk waits at most this long for row locks held by the application before it is retried
+LOCK_TIMEOUT = '5s'
+MAX_LOCK_RETRIES = 5
+
+# Progress is printed at most this often (seconds)
+PROGRESS_INTERVAL = 5
+
+class MigrationJob:
+    """A bulk UPDATE applied to a table in id-ordered chunks.
+
+    set_sql is the SET list (columns of the migrated table, unqualified; do not
+    reference id), where_sql an optional filter for the rows to change. Only rows
+    that existed when the job first ran are migrated: the highest id at that
+    moment is stored with the checkpoint, so rows the application writes later
+    (already in the new format) are left alone.
+    """
+
+    def __init__(self, name, table, set_sql, where_sql=None, description=''):
+        self.name = name
+        self.table = table
+        self.set_sql = set_sql
+        self.where_sql = where_sql
+        self.description = description
+
+    def _filter(self):
+        return f'AND ({self.where_sql})' if self.where_sql else ''
+
+    def update_chunk(self, cur, last_id, max_id, limit):
+        """Migrate the next chunk after last_id; returns the ids that were updated"""
+        cur.execute(f'''
+            WITH chunk AS (
+                SELECT id FROM {self.table}
+                WHERE id > %s AND id <= %s {self._filter()}
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE
+            )
+            UPDATE {self.table} t SET {self.set_sql}
+            FROM chunk
+            WHERE t.id = chunk.id
+            RETURNING t.id
+        ''', (last_id, max_id, limit))
+        return [row['id'] for row in cur.fetchall()]
+
+    def count_remaining(self, cur, last_id, max_id):
+        cur.execute(f'''
+            SELECT COUNT(*) AS n FROM {self.table}
+            WHERE id > %s AND id <= %s {self._filter()}
+        ''', (last_id, max_id))
+        return cur.fetchone()['n']
+
+def get_checkpoint(cur, job_name):
+    cur.execute('SELECT * FROM migration_checkpoints WHERE job_name = %s', (job_name,))
+    row = cur.fetchone()
+    return dict(row) if row else None
+
+def _start_checkpoint(cur, job):
+    """Checkpoint of a job, created (with the current highest id as its upper bound) on first run"""
+    cur.execute(f'SELECT COALESCE(MAX(id), 0) AS max_id FROM {job.table}')
+    cur.execute('''
+        INSERT INTO migration_checkpoints (job_name, table_name, max_id)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (job_name) DO NOTHING
+    ''', (job.name, job.table, cur.fetchone()['max_id']))
+    return get_checkpoint(cur, job.name)
+
+def run_job(job, chunk_size=None, pause=None, dry_run=False, log=print):
+    """Run (or resume) a job chunk by chunk, committing each chunk with its checkpoint.
+
+    The chunk's UPDATE and the checkpoint advance are one transaction, so after a
+    crash the job resumes exactly after the last committed chunk and no row is
+    migrated twice. pause seconds are slept between chunks to leave room for the
+    application. A dry run only reports how many rows and chunks are left.
+    Returns {'rows': migrated rows, 'chunks': chunks, 'status': ...}.
+    """
+    chunk_size = Config.MIGRATION_CHUNK_SIZE if chunk_size is None else chunk_size
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1')
+    pause = Config.MIGRATION_PAUSE_SECONDS if pause is None else pause
+
+    with get_db_cursor() as (conn, cur):
+        if dry_run:
+            checkpoint = get_checkpoint(cur, job.name)
+            if checkpoint is None:
+                cur.execute(f'SELECT COALESCE(MAX(id), 0) AS max_id FROM {job.table}')
+                checkpoint = {'last_id': 0, 'max_id': cur.fetchone()['max_id'], 'rows_done': 0, 'status': 'new'}
+            remaining = 0 if checkpoint['status'] == 'done' else \
+                job.count_remaining(cur, checkpoint['last_id'], checkpoint['max_id'])
+            conn.rollback()
+            chunks = -(-remaining // chunk_size)
+            log(f"{job.name}: {remaining} satır güncellenecek ({chunks} parça × {chunk_size}), "
+                f"daha önce {checkpoint['rows_done']} satır güncellendi, durum: {checkpoint['status']}")
+            return {'rows': remaining, 'chunks': chunks, 'status': checkpoint['status']}
+
+        checkpoint = _start_checkpoint(cur, job)
+        conn.commit()
+        if checkpoint['status'] == 'done':
+            log(f"{job.name} zaten tamamlanmış ({checkpoint['rows_done']} satır)")
+            return {'rows': 0, 'chunks': 0, 'status': 'done'}
+        if checkpoint['last_id']:
+            log(f"{job.name}: id {checkpoint['last_id']} sonrasından devam ediliyor "
+                f"({checkpoint['rows_done']} satır önceden güncellendi)")
+
+        last_id = checkpoint['last_id']
+        rows = 0
+        chunks = 0
+        retries = 0
+        last_log = time.monotonic()
+        while True:
+            try:
+                cur.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                ids = job.update_chunk(cur, last_id, checkpoint['max_id'], chunk_size)
+                if not ids:
+                    cur.execute('''
+                        UPDATE migration_checkpoints
+                        SET status = 'done', updated_at = NOW(), finished_at = NOW()
+                        WHERE job_name = %s
+                    ''', (job.name,))
+                    conn.commit()
+                    break
+                last_id = max(ids)
+                cur.execute('''
+                    UPDATE migration_checkpoints
+                    SET last_id = %s, rows_done = rows_done + %s, updated_at = NOW()
+                    WHERE job_name = %s
+                ''', (last_id, len(ids), job.name))
+                conn.commit()
+            except psycopg2.errors.LockNotAvailable:
+                # Rows are busy (e.g. an exam being submitted); back off and retry the same chunk
+                conn.rollback()
+                retries += 1
+                if retries > MAX_LOCK_RETRIES:
+                    raise
+                time.sleep(max(pause, 1))
+                continue
+
+            retries = 0
+            rows += len(ids)
+            chunks += 1
+            if time.monotonic() - last_log >= PROGRESS_INTERVAL:
+                last_log = time.monotonic()
+                log(f"  {job.name}: {rows} satır ({chunks} parça), son id {last_id}")
+            if pause:
+                time.sleep(pause)
+
+    log(f"{job.name} tamamlandı: {rows} satır, {chunks} parça")
+    return {'rows': rows, 'chunks': chunks, 'status': 'done'}
+
+def reset_job(job_name):
+    """Forget a job's checkpoint so that the next run starts over (re-applies the change!)"""
+    with get_db_cursor() as (conn, cur):
+        cur.execute('DELETE FROM migration_checkpoints WHERE job_name = %s', (job_name,))
+        conn.commit()
+        return cur.rowcount > 0
+
+def list_checkpoints():
+    with get_db_cursor() as (conn, cur):
+        cur.execute('SELECT * FROM migration_checkpoints ORDER BY started_at')
+        return [dict(row) for row in cur.fetchall()]
+
+JOBS = {
+    job.name: job for job in [
+        MigrationJob(
+            'fix_exam_times', 'exams',
+            set_sql="start_time = start_time - INTERVAL '3 hours', end_time = end_time - INTERVAL '3 hours'",
+            description='Türkiye saati (UTC+3) olarak girilip UTC diye saklanmış sınav zamanlarını 3 saat geri al'
+        ),
+    ]
+}
@@ -0,0 +1,93 @@
+import hashlib
+import re
+import numpy as np
+
+# Signature length and LSH banding: 16 bands × 4 rows puts the 50% candidate
+# probability at a Jaccard similarity of about (1/16) ** (1/4) ≈ 0.5
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // NUM_BANDS
+
+# Character shingle length
+SHINGLE_SIZE = 4
+
+# Universal hash family h(x) = (a·x + b) mod p over 32-bit shingle hashes
+_PRIME = np.uint64(4294967311)
+_random = np.random.RandomState(20240601)
+_A = _random.randint(1, 2 ** 32 - 1, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _random.randint(0, 2 ** 32 - 1, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+def shingles(normalized_text):
+    """Character shingles of a normalized question text with punctuation removed"""
+    text = ' '.join(_PUNCTUATION.sub(' ', normalized_text).split())
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+def _shingle_hashes(items):
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=4).digest(), 'little') for item in items),
+        dtype=np.uint64, count=len(items)
+    )
+
+def signature(normalized_text):
+    """MinHash signature: the minimum of every permutation hash over the text's shingles"""
+    hashes = _shingle_hashes(sorted(shingles(normalized_text)))
+    permuted = ((_A[:, np.newaxis] * hashes[np.newaxis, :]) % _PRIME + _B[:, np.newaxis]) % _PRIME
+    return permuted.min(axis=1).astype(np.int64)
+
+def band_keys(minhash):
+    """One signed 64-bit bucket key per band; two texts are LSH candidates if any key matches"""
+    keys = []
+    for band, rows in enumerate(np.asarray(minhash, dtype=np.int64).reshape(NUM_BANDS, ROWS_PER_BAND)):
+        digest = hashlib.blake2b(bytes([band]) + rows.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+def text_signature(normalized_text):
+    """(minhash, band_keys) as plain int lists, ready to store in BIGINT[] columns"""
+    minhash = signature(normalized_text)
+    return minhash.tolist(), band_keys(minhash)
+
+def estimated_similarity(minhash_a, minhash_b):
+    """Estimated Jaccard similarity: the fraction of matching signature positions"""
+    return float(np.mean(np.asarray(minhash_a) == np.asarray(minhash_b)))
+
+def near_duplicate_clusters(buckets, signatures, threshold):
+    """Group LSH candidates into clusters of near-duplicates.
+
+    buckets: lists of question ids that share at least one band key
+    signatures: {question_id: minhash}
+    Candidate pairs inside a bucket are kept when their estimated similarity
+    reaches the threshold and joined with union-find. Returns (clusters, pairs):
+    clusters are sorted id lists, pairs maps (id_a, id_b) to the similarity.
+    """
+    parent = {}
+
+    def find(question_id):
+        parent.setdefault(question_id, question_id)
+        while parent[question_id] != question_id:
+            parent[question_id] = parent[parent[question_id]]
+            question_id = parent[question_id]
+        return question_id
+
+    pairs = {}
+    checked = set()
+    for bucket in buckets:
+        bucket = sorted(set(bucket))
+        for i, id_a in enumerate(bucket):
+            for id_b in bucket[i + 1:]:
+                if (id_a, id_b) in checked:
+                    continue
+                checked.add((id_a, id_b))
+                similarity = estimated_similarity(signatures[id_a], signatures[id_b])
+                if similarity >= threshold:
+                    pairs[(id_a, id_b)] = similarity
+                    parent[find(id_b)] = find(id_a)
+
+    clusters = {}
+    for question_id in parent:
+        clusters.setdefault(find(question_id), []).append(question_id)
+    return sorted(sorted(members) for members in clusters.values()), pairs
@@ -0,0 +1,150 @@
+import cProfile
+import itertools
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from flask import g, request
+from config import Config
+from utils.auth import decode_token
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+
+METHODS = ('sampler', 'cprofile')
+
+# Keeps file names unique when one thread profiles several requests within a second
+_sequence = itertools.count(1)
+
+class StackSampler:
+    """Low-overhead sampling profiler for a single thread.
+
+    A background thread reads the target thread's current frame every
+    interval seconds and counts the call stacks it sees. The request thread
+    itself runs uninstrumented.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+    def write(self, path):
+        """Collapsed stacks ("root;...;leaf count" per line), as read by flamegraph.pl and speedscope"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+def _frame_label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+def collapse_stack(frame):
+    """One stack as semicolon separated frames, outermost first"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+def _is_admin():
+    auth_header = request.headers.get('Authorization', '')
+    token = auth_header.split(' ')[1] if ' ' in auth_header else None
+    payload = decode_token(token) if token else None
+    return bool(payload) and payload.get('role') == 'admin'
+
+def _requested_method():
+    """Profiling method for this request, or None if it is not profiled"""
+    header = request.headers.get(PROFILE_HEADER)
+    if header and Config.PROFILE_ADMIN_HEADER and _is_admin():
+        return header.lower() if header.lower() in METHODS else Config.PROFILE_METHOD
+
+    if Config.PROFILE_SAMPLE_RATE > 0:
+        endpoints = Config.PROFILE_ENDPOINTS
+        if (not endpoints or request.endpoint in endpoints or request.path in endpoints) \
+                and random.random() < Config.PROFILE_SAMPLE_RATE:
+            return Config.PROFILE_METHOD
+    return None
+
+def _start_request():
+    method = _requested_method()
+    if method is None:
+        return
+
+    if method == 'cprofile':
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process (Python 3.12+)
+            return
+    else:
+        profiler = StackSampler(threading.get_ident(), Config.PROFILE_INTERVAL_MS / 1000)
+        profiler.start()
+
+    endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+    extension = 'prof' if method == 'cprofile' else 'folded'
+    g.profile = {
+        'profiler': profiler,
+        'started': time.perf_counter(),
+        'name': f"{time.strftime('%Y%m%d-%H%M%S')}_{endpoint}_{os.getpid()}-{next(_sequence)}.{extension}"
+    }
+
+def _finish_request(response):
+    profile = g.get('profile')
+    if profile is not None:
+        response.headers['X-Profile-File'] = profile['name']
+    return response
+
+def _end_request(exc):
+    # Stopped at teardown so that streamed response bodies are included
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    profiler = profile['profiler']
+    duration_ms = (time.perf_counter() - profile['started']) * 1000
+
+    if isinstance(profiler, StackSampler):
+        profiler.stop()
+    else:
+        profiler.disable()
+
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(Config.PROFILE_DIR, profile['name'])
+    if isinstance(profiler, StackSampler):
+        profiler.write(path)
+    else:
+        # pstats dump; flameprof or snakeviz turn it into a flame graph
+        profiler.dump_stats(path)
+    logger.info('Profile written: %s (%.1f ms)', path, duration_ms)
+
+def init_app(app):
+    """Profile selected requests; registers nothing (zero overhead) when profiling is off"""
+    if Config.PROFILE_SAMPLE_RATE <= 0 and not Config.PROFILE_ADMIN_HEADER:
+        return
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
@@ -0,0 +1,144 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+import psycopg2.extras
+from flask import current_app, g, has_request_context, request
+from config import Config
+from utils.metrics import registry as metrics
+
+logger = logging.getLogger(__name__)
+
+# Literals and placeholders collapse to '?' so repeated statements compare equal
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s')
+_VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*')
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_statement(query):
+    """SQL text with whitespace collapsed and every literal or parameter replaced by '?'"""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    elif not isinstance(query, str):
+        query = str(query)
+    query = _STRING_LITERAL.sub('?', query)
+    query = _PLACEHOLDER.sub('?', query)
+    query = _NUMBER_LITERAL.sub('?', query)
+    query = _VALUE_LIST.sub('(?)', query)
+    return _WHITESPACE.sub(' ', query).strip()
+
+def redact_params(params):
+    """Describe parameters by type only, so values never reach the logs"""
+    def describe(value):
+        if value is None:
+            return None
+        if isinstance(value, (list, tuple)):
+            return f'<{type(value).__name__} len={len(value)}>'
+        if isinstance(value, str):
+            return f'<str len={len(value)}>'
+        return f'<{type(value).__name__}>'
+
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: describe(value) for key, value in params.items()}
+    return [describe(value) for value in params]
+
+class RequestQueryStats:
+    """Statements executed while handling one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.statements = Counter()
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.total_seconds += seconds
+        self.statements[statement] += 1
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def repeated(self, threshold):
+        """Statements executed more than threshold times (likely N+1 loops)"""
+        return {statement: n for statement, n in self.statements.items() if n > threshold}
+
+def record_query(query, params, seconds):
+    metrics.inc('db_queries_total')
+    metrics.inc('db_query_seconds_total', seconds)
+
+    statement = None
+    if has_request_context():
+        stats = g.get('db_stats')
+        if stats is not None:
+            statement = normalize_statement(query)
+            stats.add(statement, seconds)
+
+    if seconds * 1000 >= Config.SLOW_QUERY_MS:
+        logger.warning(json.dumps({
+            'event': 'slow_query',
+            'duration_ms': round(seconds * 1000, 2),
+            'statement': statement or normalize_statement(query),
+            'params': redact_params(params),
+            'endpoint': request.endpoint if has_request_context() else None
+        }, ensure_ascii=False))
+
+class InstrumentedCursor(psycopg2.extras.RealDictCursor):
+    """RealDictCursor that times every execute() for the per-request statistics"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record_query(query, vars, time.perf_counter() - started)
+
+def _start_request():
+    g.db_stats = RequestQueryStats()
+
+def _finish_request(response):
+    stats = g.pop('db_stats', None)
+    if stats is None:
+        return response
+
+    repeated = stats.repeated(Config.N_PLUS_ONE_THRESHOLD)
+    summary = {
+        'event': 'request_db_stats',
+        'method': request.method,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'query_count': stats.count,
+        'db_time_ms': round(stats.total_seconds * 1000, 2),
+        'slowest_ms': round(stats.slowest_seconds * 1000, 2),
+        'slowest_statement': stats.slowest_statement
+    }
+    if repeated:
+        summary['n_plus_one'] = repeated
+        logger.warning(json.dumps(summary, ensure_ascii=False))
+
+    if current_app.debug or Config.QUERY_STATS_HEADERS:
+        response.headers['X-DB-Query-Count'] = str(stats.count)
+        response.headers['X-DB-Time-Ms'] = f'{stats.total_seconds * 1000:.2f}'
+        if stats.slowest_statement:
+            slowest = stats.slowest_statement[:200].encode('ascii', 'replace').decode('ascii')
+            response.headers['X-DB-Slowest'] = f'{stats.slowest_seconds * 1000:.2f}ms {slowest}'
+        if repeated:
+            response.headers['X-DB-N-Plus-One'] = str(max(repeated.values()))
+    elif not repeated:
+        logger.info(json.dumps(summary, ensure_ascii=False))
+    return response
+
+def init_app(app):
+    """Collect per-request query statistics for every request of the app"""
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
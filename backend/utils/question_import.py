@@ -0,0 +1,132 @@
+import csv
+import io
+import re
+from models import Question
+from utils.question_pool import DIFFICULTIES
+
+QUESTION_FIELDS = ('question_text', 'option_a', 'option_b', 'option_c', 'option_d', 'option_e', 'correct_answer')
+OPTION_FIELDS = QUESTION_FIELDS[1:6]
+TAG_FIELDS = ('topic', 'difficulty')
+
+# GIFT-like block: optional ::title::, question text, then {=correct ~wrong ...}
+_GIFT_QUESTION = re.compile(r'(?:::(?:\\.|[^:\\])*::)?\s*((?:\\.|[^{\\])*)\{((?:\\.|[^}\\])*)\}', re.DOTALL)
+_GIFT_OPTION = re.compile(r'([=~])((?:\\.|[^=~\\])*)')
+_GIFT_ESCAPE = re.compile(r'\\(.)')
+
+class ImportFormatError(ValueError):
+    """The uploaded content could not be parsed at all"""
+
+def parse_json(data):
+    """Accept a list of question objects or {"questions": [...]}"""
+    if isinstance(data, dict):
+        data = data.get('questions')
+    if not isinstance(data, list):
+        raise ImportFormatError('JSON içeriği bir soru listesi olmalıdır')
+    return [row if isinstance(row, dict) else {} for row in data]
+
+def parse_csv(text):
+    """CSV with a header row naming the question fields"""
+    reader = csv.DictReader(io.StringIO(text.lstrip('\ufeff')))
+    missing = [field for field in QUESTION_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ImportFormatError(f'CSV başlığında eksik kolonlar: {", ".join(missing)}')
+    return [{field: row.get(field) for field in QUESTION_FIELDS + TAG_FIELDS} for row in reader]
+
+def _gift_unescape(text):
+    return _GIFT_ESCAPE.sub(r'\1', text).strip()
+
+def parse_gift(text):
+    """GIFT-like text: one question per block, options in A-E order, '=' marks the correct one.
+
+        ::Q1:: Türkiye'nin başkenti neresidir? {
+            =Ankara
+            ~İstanbul
+            ~İzmir
+            ~Bursa
+            ~Antalya
+        }
+    """
+    text = '\n'.join(line for line in text.splitlines() if not line.lstrip().startswith('//'))
+    rows = []
+    for match in _GIFT_QUESTION.finditer(text):
+        options = _GIFT_OPTION.findall(match.group(2))
+        row = {'question_text': _gift_unescape(match.group(1))}
+        for field, (_, option) in zip(OPTION_FIELDS, options):
+            row[field] = _gift_unescape(option)
+        correct = [i for i, (marker, _) in enumerate(options) if marker == '=']
+        if len(options) != len(OPTION_FIELDS) or len(correct) != 1:
+            row['_error'] = 'Her soru tam 5 şık ve tek bir doğru cevap (=) içermelidir'
+        else:
+            row['correct_answer'] = chr(65 + correct[0])
+        rows.append(row)
+    if not rows and text.strip():
+        raise ImportFormatError('GIFT içeriğinde soru bulunamadı')
+    return rows
+
+def validate_questions(rows, digests, existing_digests):
+    """Validate parsed rows in memory.
+
+    digests: text digest of each row's question by row index (see row_digests);
+    existing_digests: the digests among them that already exist in the exam.
+    Returns (valid, errors): valid is a list of cleaned question dicts, errors a
+    list of {'row': n, 'error': message} with 1-based row numbers.
+    """
+    valid = []
+    errors = []
+    seen = {}
+    for number, row in enumerate(rows, start=1):
+        if row.get('_error'):
+            errors.append({'row': number, 'error': row['_error']})
+            continue
+
+        values = {field: row.get(field) for field in QUESTION_FIELDS}
+        if not all(isinstance(values[field], str) and values[field].strip() for field in QUESTION_FIELDS):
+            errors.append({'row': number, 'error': 'Eksik alanlar var'})
+            continue
+
+        values = {field: value.strip() for field, value in values.items()}
+        values['correct_answer'] = values['correct_answer'].upper()
+
+        tags = {field: row.get(field) for field in TAG_FIELDS}
+        if not all(tag is None or isinstance(tag, str) for tag in tags.values()):
+            errors.append({'row': number, 'error': 'Konu ve zorluk metin olmalıdır'})
+            continue
+        values.update({field: (tag or '').strip() or None for field, tag in tags.items()})
+        if values['difficulty'] is not None:
+            values['difficulty'] = values['difficulty'].lower()
+            if values['difficulty'] not in DIFFICULTIES:
+                errors.append({'row': number, 'error': f'Zorluk {", ".join(DIFFICULTIES)} değerlerinden biri olmalıdır'})
+                continue
+        if values['correct_answer'] not in ('A', 'B', 'C', 'D', 'E'):
+            errors.append({'row': number, 'error': 'Doğru cevap A, B, C, D veya E olmalıdır'})
+            continue
+
+        has_duplicate, duplicate_message = Question.check_duplicate_options(
+            *(values[field] for field in OPTION_FIELDS)
+        )
+        if has_duplicate:
+            errors.append({'row': number, 'error': duplicate_message})
+            continue
+
+        digest = digests[number - 1]
+        if digest in existing_digests:
+            errors.append({'row': number, 'error': 'Bu sınavda aynı soru metni zaten mevcut'})
+            continue
+        if digest in seen:
+            errors.append({'row': number, 'error': f'Aynı soru metni dosyada {seen[digest]}. satırda da var'})
+            continue
+
+        seen[digest] = number
+        valid.append(values)
+    return valid, errors
+
+def row_digests(rows):
+    """Text digests of the parsed rows that have a question text, by row index.
+
+    The database computes them with the questions.text_digest expression, so
+    they match the unique index exactly; the text is stripped the same way
+    validate_questions strips it before inserting.
+    """
+    indexes = [i for i, row in enumerate(rows) if isinstance(row.get('question_text'), str)]
+    digests = Question.text_digests([rows[i]['question_text'].strip() for i in indexes])
+    return dict(zip(indexes, digests))
@@ -0,0 +1,107 @@
+import random
+from models import Question
+from utils.cache import question_pool_cache
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+# Every attempt gets this many questions, so a blueprint must add up to it
+QUESTIONS_PER_ATTEMPT = 5
+
+class QuestionPoolIndex:
+    """In-memory tag index of one exam's question pool: (topic, difficulty) -> question ids"""
+
+    def __init__(self, tagged_questions):
+        self.strata = {}
+        for question in tagged_questions:
+            self.strata.setdefault((question['topic'], question['difficulty']), []).append(question['id'])
+        self.question_ids = [question['id'] for question in tagged_questions]
+
+    @classmethod
+    def for_exam(cls, exam_id, question_count=None, refresh=False):
+        """Cached index of an exam; rebuilt from a tags-only query after question changes.
+        
+        question_count (exams.question_count, when the caller has it) is compared
+        with the cached pool size, so questions added or deleted through another
+        worker trigger a rebuild too. refresh=True always rebuilds.
+        """
+        index = None if refresh else question_pool_cache.get(exam_id)
+        if index is not None and question_count is not None and len(index.question_ids) != question_count:
+            index = None
+        if index is None:
+            index = cls(Question.get_tags_by_exam(exam_id))
+            question_pool_cache.set(exam_id, index)
+        return index
+
+    def matching(self, topic=None, difficulty=None):
+        """Ids of questions matching a blueprint entry (None matches any value)"""
+        return [
+            question_id
+            for (stratum_topic, stratum_difficulty), ids in self.strata.items()
+            if (topic is None or stratum_topic == topic) and (difficulty is None or stratum_difficulty == difficulty)
+            for question_id in ids
+        ]
+
+def _allocation_order(index, blueprint):
+    """Fill the most specific and then the scarcest entries first, so broad
+    entries do not use up questions a narrower entry needs"""
+    def key(entry):
+        specificity = (entry.get('topic') is not None) + (entry.get('difficulty') is not None)
+        return (-specificity, len(index.matching(entry.get('topic'), entry.get('difficulty'))))
+    return sorted(blueprint, key=key)
+
+def validate_blueprint(blueprint, index):
+    """Return an error message for an invalid or unsatisfiable blueprint, None if it is usable"""
+    if not isinstance(blueprint, list) or not blueprint:
+        return 'Blueprint must be a non-empty list of {topic, difficulty, count} entries'
+
+    for entry in blueprint:
+        if not isinstance(entry, dict):
+            return 'Blueprint entries must be objects'
+        count = entry.get('count')
+        if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            return 'Each blueprint entry needs a positive integer count'
+        if entry.get('difficulty') is not None and entry['difficulty'] not in DIFFICULTIES:
+            return f'difficulty must be one of {", ".join(DIFFICULTIES)}'
+        if entry.get('topic') is not None and not isinstance(entry['topic'], str):
+            return 'topic must be a string'
+
+    total = sum(entry['count'] for entry in blueprint)
+    if total != QUESTIONS_PER_ATTEMPT:
+        return f'Blueprint counts must add up to {QUESTIONS_PER_ATTEMPT} (got {total})'
+
+    used = set()
+    for entry in _allocation_order(index, blueprint):
+        available = [q for q in index.matching(entry.get('topic'), entry.get('difficulty')) if q not in used]
+        if len(available) < entry['count']:
+            return (f"Not enough questions for topic={entry.get('topic')}, difficulty={entry.get('difficulty')}: "
+                    f"{entry['count']} needed, {len(available)} available")
+        used.update(available[:entry['count']])
+    return None
+
+def sample_question_ids(index, blueprint=None, count=QUESTIONS_PER_ATTEMPT, rng=random):
+    """Pick question ids for one attempt.
+
+    Without a blueprint this is a plain random sample of the pool. With one,
+    each entry draws its count from the matching stratum. If the pool has
+    changed since the blueprint was saved and an entry cannot be met, the
+    shortfall is filled from the remaining pool so the attempt still gets a
+    full set of questions.
+    """
+    if not blueprint:
+        return rng.sample(index.question_ids, min(count, len(index.question_ids)))
+
+    chosen = []
+    used = set()
+    for entry in _allocation_order(index, blueprint):
+        available = [q for q in index.matching(entry.get('topic'), entry.get('difficulty')) if q not in used]
+        picked = rng.sample(available, min(entry['count'], len(available)))
+        chosen.extend(picked)
+        used.update(picked)
+
+    target = sum(entry['count'] for entry in blueprint)
+    if len(chosen) < target:
+        remaining = [q for q in index.question_ids if q not in used]
+        chosen.extend(rng.sample(remaining, min(target - len(chosen), len(remaining))))
+
+    rng.shuffle(chosen)
+    return chosen
@@ -0,0 +1,79 @@
+import csv
+import io
+from flask import Response, current_app, stream_with_context
+
+# Number of rows serialized into a single response chunk
+CHUNK_ROWS = 500
+
+_END = object()
+
+def _iter_json_array(first, rows):
+    """Yield a JSON array piece by piece, starting with an already fetched first row"""
+    dumps = current_app.json.dumps
+    try:
+        if first is _END:
+            yield '[]'
+            return
+
+        chunk = ['[', dumps(first)]
+        for row in rows:
+            chunk.append(',')
+            chunk.append(dumps(row))
+            if len(chunk) >= CHUNK_ROWS * 2:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append(']')
+        yield ''.join(chunk)
+    finally:
+        # Release the database cursor even if the client disconnects mid-stream
+        close = getattr(rows, 'close', None)
+        if close:
+            close()
+
+def json_stream_response(rows, status=200):
+    """Stream an iterable of dicts to the client as a JSON array.
+
+    The first row is fetched eagerly so query errors are raised in the view
+    (and can still be turned into an error response) instead of mid-stream.
+    """
+    rows = iter(rows)
+    first = next(rows, _END)
+    return Response(
+        stream_with_context(_iter_json_array(first, rows)),
+        status=status,
+        mimetype='application/json'
+    )
+
+def _iter_csv(header, first, rows):
+    """Yield CSV text in chunks of CHUNK_ROWS rows, prefixed with a UTF-8 BOM for Excel"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    try:
+        buffer.write('\ufeff')
+        writer.writerow(header)
+        if first is not _END:
+            writer.writerow(first)
+            for count, row in enumerate(rows, start=2):
+                writer.writerow(row)
+                if count % CHUNK_ROWS == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        close = getattr(rows, 'close', None)
+        if close:
+            close()
+
+def csv_stream_response(header, rows, filename):
+    """Stream an iterable of row sequences to the client as a CSV file download.
+
+    Like json_stream_response, the first row is fetched before the response starts.
+    """
+    rows = iter(rows)
+    first = next(rows, _END)
+    return Response(
+        stream_with_context(_iter_csv(header, first, rows)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
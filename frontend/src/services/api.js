@@ -54,6 +54,8 @@ export const adminAPI = {
   getUsers: () => api.get('/admin/users'),
   updateUser: (userId, data) => api.put(`/admin/users/${userId}`, data),
   deleteUser: (userId) => api.delete(`/admin/users/${userId}`),
+  
+  searchUsers: (query, limit) => api.get('/admin/search', { params: { q: query, limit } }),
 };
 
 // Instructor API
@@ -64,12 +66,25 @@ export const instructorAPI = {
   
   createExam: (data) => api.post('/instructor/exams', data),
   deleteExam: (id) => api.delete(`/instructor/exams/${id}`),
+  cloneExam: (id, data) => api.post(`/instructor/exams/${id}/clone`, data),
   
   getExamQuestions: (examId) => api.get(`/instructor/exams/${examId}/questions`),
   createQuestion: (data) => api.post('/instructor/questions', data),
+  importQuestions: (examId, file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post(`/instructor/exams/${examId}/questions/bulk`, formData);
+  },
   deleteQuestion: (id) => api.delete(`/instructor/questions/${id}`),
+  updateQuestionTags: (id, data) => api.put(`/instructor/questions/${id}/tags`, data),
+  updateExamBlueprint: (examId, blueprint) => api.put(`/instructor/exams/${examId}/blueprint`, { blueprint }),
   
   getExamResults: (examId) => api.get(`/instructor/exams/${examId}/results`),
+  exportExamResults: (examId) => api.get(`/instructor/exams/${examId}/results/export`, { responseType: 'blob' }),
+  exportCourseGradebook: (courseId) => api.get(`/instructor/courses/${courseId}/gradebook/export`, { responseType: 'blob' }),
+  getItemAnalysis: (examId) => api.get(`/instructor/exams/${examId}/item-analysis`),
+  getSimilarityFlags: (examId) => api.get(`/instructor/exams/${examId}/similarity-flags`),
+  runSimilarityScreening: (examId) => api.post(`/instructor/exams/${examId}/similarity-flags`),
 };
 
 // Student API